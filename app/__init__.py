@@ -1,87 +1,94 @@
+import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from flask_cors import CORS
 from config import config
+from app.inicializacao import FasesInicializacao
+
+logger = logging.getLogger(__name__)
 
 # Inicialização das extensões
 db = SQLAlchemy()
 login_manager = LoginManager()
-migrate = Migrate()
 
 def create_app(config_name='default'):
     """Factory function para criar a aplicação Flask"""
-    print(f"🔧 RENDER: Iniciando create_app com config: {config_name}")
-    app = Flask(__name__)
-    print("📦 RENDER: Flask app criada")
-    
-    # Configuração da aplicação
-    app.config.from_object(config[config_name])
-    print("⚙️ RENDER: Configurações carregadas")
+    fases = FasesInicializacao()
+    logger.debug('Iniciando create_app com config: %s', config_name)
     
-    # Configuração específica para Render
-    if config_name == 'production':
-        # Garantir que a aplicação aceite conexões de qualquer IP
-        app.config['SERVER_NAME'] = None
-        # Configurar porta do Render
-        import os
-        port = int(os.environ.get('PORT', 10000))
-        print(f"🌐 Flask configurado para produção na porta: {port}")
-        print(f"🚀 RENDER: Aplicação configurada para porta {port}")
-        print(f"🌐 RENDER: Binding configurado para 0.0.0.0:{port}")
+    with fases.fase('configuracao'):
+        app = Flask(__name__)
+        app.config.from_object(config[config_name])
+        
+        # Configuração específica para Render
+        if config_name == 'production':
+            # Garantir que a aplicação aceite conexões de qualquer IP
+            app.config['SERVER_NAME'] = None
     
     # Inicialização das extensões
-    print("🔌 RENDER: Inicializando extensões...")
-    db.init_app(app)
-    print("🗄️ RENDER: SQLAlchemy inicializado")
-    login_manager.init_app(app)
-    print("🔐 RENDER: LoginManager inicializado")
-    migrate.init_app(app, db)
-    print("🔄 RENDER: Migrate inicializado")
-    CORS(app)
-    print("🌐 RENDER: CORS inicializado")
+    with fases.fase('extensoes'):
+        from app import banco
+        banco.configurar_engine(app)
+        db.init_app(app)
+        banco.init_app(app)
+        login_manager.init_app(app)
+        if app.config.get('MIGRACOES_ATIVAS', True):
+            # O Flask-Migrate carrega o Alembic, usado apenas pelos comandos `flask db`
+            from flask_migrate import Migrate
+            Migrate(app, db)
+        CORS(app)
+        from app import (assets, cli, compressao, consultas_lentas, contador_consultas, fragmentos, log_estruturado,
+                         memoria, metricas, perfilador, precompilacao, rastreamento, saude)
+        contador_consultas.init_app(app)
+        consultas_lentas.init_app(app)
+        metricas.init_app(app)
+        saude.init_app(app)
+        log_estruturado.init_app(app)
+        perfilador.init_app(app)
+        rastreamento.init_app(app)
+        memoria.init_app(app)
+        precompilacao.init_app(app)
+        fragmentos.init_app(app)
+        assets.init_app(app)
+        compressao.init_app(app)
+        cli.init_app(app)
     
     # Configuração do Flask-Login
-    print("🔑 RENDER: Configurando Flask-Login...")
-    login_manager.login_view = 'auth.login'
-    login_manager.login_message = 'Por favor, faça login para acessar esta página.'
-    login_manager.login_message_category = 'info'
-    print("✅ RENDER: Flask-Login configurado")
+    with fases.fase('autenticacao'):
+        login_manager.login_view = 'auth.login'
+        login_manager.login_message = 'Por favor, faça login para acessar esta página.'
+        login_manager.login_message_category = 'info'
+        from app.auth import identidade, senhas, limitador
+        identidade.init_app(app)
+        senhas.init_app(app)
+        limitador.init_app(app)
     
     # Registro dos blueprints
-    print("📋 RENDER: Registrando blueprints...")
-    from app.auth import bp as auth_bp
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-    print("🔐 RENDER: Blueprint auth registrado")
-    
-    from app.api import bp as api_bp
-    app.register_blueprint(api_bp, url_prefix='/api')
-    print("🔌 RENDER: Blueprint api registrado")
-# Registrar blueprints
-    from app.main import bp as main_bp
-    app.register_blueprint(main_bp)
-    print("🏠 RENDER: Blueprint main registrado")
-    
-    from app.paciente import bp as paciente_bp
-    app.register_blueprint(paciente_bp, url_prefix='/paciente')
-    print("👤 RENDER: Blueprint paciente registrado")
-    
-    from app.psicologo import bp as psicologo_bp
-    app.register_blueprint(psicologo_bp, url_prefix='/psicologo')
-    print("👨‍⚕️ RENDER: Blueprint psicologo registrado")
-    
-    from app.admin import admin as admin_bp
-    app.register_blueprint(admin_bp, url_prefix='/admin')
-    print("👑 RENDER: Blueprint admin registrado")
+    with fases.fase('blueprints'):
+        from app.auth import bp as auth_bp
+        app.register_blueprint(auth_bp, url_prefix='/auth')
+        
+        from app.api import bp as api_bp
+        app.register_blueprint(api_bp, url_prefix='/api')
+        
+        from app.main import bp as main_bp
+        app.register_blueprint(main_bp)
+        
+        from app.paciente import bp as paciente_bp
+        app.register_blueprint(paciente_bp, url_prefix='/paciente')
+        
+        from app.psicologo import bp as psicologo_bp
+        app.register_blueprint(psicologo_bp, url_prefix='/psicologo')
+        
+        from app.admin import admin as admin_bp
+        app.register_blueprint(admin_bp, url_prefix='/admin')
     
     # Importação dos modelos para que sejam reconhecidos pelo SQLAlchemy
-    print("📊 RENDER: Importando modelos...")
-    from app import models
-    print("✅ RENDER: Modelos importados")
+    with fases.fase('modelos'):
+        from app import models
     
     # Filtros personalizados para tradução
-    print("🎨 RENDER: Configurando filtros personalizados...")
     @app.template_filter('dia_semana_pt')
     def dia_semana_pt(data):
         """Converte dia da semana para português"""
@@ -115,5 +122,5 @@ def create_app(config_name='default'):
         }
         return meses.get(data.strftime('%B'), data.strftime('%B'))
     
-    print("🎉 RENDER: Aplicação Flask criada com sucesso!")
-    return app
\ No newline at end of file
+    fases.finalizar(app)
+    return app
@@ -1,21 +1,196 @@
 import pytz
-from flask import render_template, request, redirect, url_for, flash, jsonify
+from flask import current_app, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
 from flask_login import login_required, current_user
 from app.models import Usuario, Psicologo, Paciente, Agendamento, Admin, db
-from sqlalchemy import func, case, String, cast
-from functools import wraps
-from werkzeug.security import generate_password_hash
+from sqlalchemy import func, case, String, cast, exists, select
+from sqlalchemy.orm import aliased
+from app.auth.perfil import admin_required
+from app.condicional import versao_global
+from app import fragmentos, perfilador
+from app.transmissao import ConsultaTransmitida, transmitir_template
+from datetime import date
 import os
 
-def admin_required(f):
-    """Decorator para verificar se o usuário é admin"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or current_user.tipo_usuario != 'admin':
-            flash('Acesso negado. Apenas administradores podem acessar esta área.', 'error')
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return decorated_function
+def _dados_dashboard():
+    """Estatísticas e séries dos gráficos do dashboard administrativo"""
+    # Estatísticas básicas
+    total_pacientes = db.session.query(Usuario).filter(Usuario.tipo_usuario == 'paciente').count()
+    total_psicologos = db.session.query(Psicologo).join(Usuario, Psicologo.usuario_id == Usuario.id).filter(Usuario.tipo_usuario == 'psicologo').count()
+    total_agendamentos = db.session.query(Agendamento).count()
+    
+    # Dados reais para os gráficos
+    from datetime import datetime, timedelta
+    
+    # Defina o fuso horário para UTC para evitar erros de comparação
+    agora_utc = datetime.now(pytz.utc)
+    data_limite = agora_utc - timedelta(days=180)  # aproximadamente 6 meses
+
+    # Agendamentos por mês (últimos 6 meses)
+    agendamentos_query = db.session.query(
+        func.to_char(Agendamento.data_hora, 'MM').label('mes_num'),
+        func.count(Agendamento.id).label('total')
+    ).filter(
+        Agendamento.data_hora >= data_limite
+    ).group_by(
+        func.to_char(Agendamento.data_hora, 'MM')
+    ).order_by(
+        func.to_char(Agendamento.data_hora, 'MM')
+    ).all()
+    
+    # Converter números dos meses para nomes
+    meses_nomes = {
+        '01': 'Jan', '02': 'Fev', '03': 'Mar', '04': 'Abr',
+        '05': 'Mai', '06': 'Jun', '07': 'Jul', '08': 'Ago',
+        '09': 'Set', '10': 'Out', '11': 'Nov', '12': 'Dez'
+    }
+    
+    agendamentos_por_mes = []
+    for item in agendamentos_query:
+        mes_nome = meses_nomes.get(item.mes_num, item.mes_num)
+        agendamentos_por_mes.append({'mes': mes_nome, 'total': item.total})
+    
+    # 1. Taxa de Retenção de Pacientes (por mês)
+    # Primeiro, obter todos os meses com agendamentos
+    meses_query = db.session.query(
+        func.to_char(Agendamento.data_hora, 'YYYY-MM').label('mes')
+    ).filter(
+        Agendamento.data_hora >= data_limite,
+        Agendamento.status.in_(['realizado', 'confirmado'])
+    ).group_by(
+        func.to_char(Agendamento.data_hora, 'YYYY-MM')
+    ).all()
+    
+    taxa_retencao = []
+    for mes_item in meses_query:
+        mes = mes_item.mes
+    
+        # Total de pacientes únicos no mês
+        total_pacientes_mes = db.session.query(
+            func.count(func.distinct(Agendamento.paciente_id))
+        ).filter(
+            func.to_char(Agendamento.data_hora, 'YYYY-MM') == mes,
+            Agendamento.status.in_(['realizado', 'confirmado'])
+        ).scalar() or 0
+    
+        # Pacientes que tiveram mais de 1 sessão no mês
+        pacientes_multiplas_sessoes = db.session.query(
+            Agendamento.paciente_id
+        ).filter(
+            func.to_char(Agendamento.data_hora, 'YYYY-MM') == mes,
+            Agendamento.status.in_(['realizado', 'confirmado'])
+        ).group_by(
+            Agendamento.paciente_id
+        ).having(
+            func.count(Agendamento.id) >= 2
+        ).count()
+    
+        if total_pacientes_mes > 0:
+            taxa = (pacientes_multiplas_sessoes / total_pacientes_mes) * 100
+            taxa_retencao.append({
+                'mes': mes,
+                'taxa': round(taxa, 1)
+            })
+        else:
+            taxa_retencao.append({
+                'mes': mes,
+                'taxa': 0
+            })
+    
+    # 2. Frequência de Sessões (distribuição)
+    frequencia_query = db.session.query(
+        Agendamento.paciente_id,
+        func.count(Agendamento.id).label('total_sessoes')
+    ).filter(
+        Agendamento.status == 'realizado'
+    ).group_by(Agendamento.paciente_id).all()
+    
+    distribuicao_sessoes = {'1-5': 0, '6-10': 0, '11-15': 0, '16+': 0}
+    for item in frequencia_query:
+        if item.total_sessoes <= 5:
+            distribuicao_sessoes['1-5'] += 1
+        elif item.total_sessoes <= 10:
+            distribuicao_sessoes['6-10'] += 1
+        elif item.total_sessoes <= 15:
+            distribuicao_sessoes['11-15'] += 1
+        else:
+            distribuicao_sessoes['16+'] += 1
+    
+    # 3. Taxa de Ocupação dos Profissionais
+    ocupacao_query = db.session.query(
+        Usuario.nome_completo.label('nome'),
+        func.count(Agendamento.id).label('agendamentos_realizados')
+    ).join(
+        Psicologo, Usuario.id == Psicologo.usuario_id
+    ).outerjoin(
+        Agendamento, Psicologo.id == Agendamento.psicologo_id
+    ).filter(
+        Usuario.tipo_usuario == 'psicologo',
+        Agendamento.data_hora >= data_limite
+    ).group_by(
+        Usuario.nome_completo
+    ).all()
+    
+    # Assumindo 40 horas/semana * 4 semanas * 6 meses = 960 horas disponíveis
+    horas_disponiveis = 960
+    taxa_ocupacao = []
+    for item in ocupacao_query:
+        # Assumindo 1 hora por sessão
+        ocupacao = (item.agendamentos_realizados / horas_disponiveis) * 100
+        taxa_ocupacao.append({
+            'nome': item.nome.split()[0],  # Primeiro nome
+            'ocupacao': round(ocupacao, 1)
+        })
+    
+    # 4. Taxa de No-Show (por mês)
+    noshow_query = db.session.query(
+        func.to_char(Agendamento.data_hora, 'YYYY-MM').label('mes'),
+        func.count(Agendamento.id).label('total_agendamentos'),
+        func.sum(case((Agendamento.status == 'ausencia', 1), else_=0)).label('faltas')
+    ).filter(
+        Agendamento.data_hora >= data_limite
+    ).group_by(
+        func.to_char(Agendamento.data_hora, 'YYYY-MM')
+    ).all()
+    
+    taxa_noshow = []
+    for item in noshow_query:
+        if item.total_agendamentos > 0:
+            taxa = (item.faltas / item.total_agendamentos) * 100
+            mes_formatado = item.mes.split('-')[1] + '/' + item.mes.split('-')[0][-2:]
+            taxa_noshow.append({'mes': mes_formatado, 'taxa': round(taxa, 1)})
+    
+    # 5. Número de Casos Ativos por Profissional
+    casos_ativos_query = db.session.query(
+        Usuario.nome_completo.label('nome'),
+        func.count(func.distinct(Agendamento.paciente_id)).label('casos_ativos')
+    ).join(
+        Psicologo, Usuario.id == Psicologo.usuario_id
+    ).outerjoin(
+        Agendamento, Psicologo.id == Agendamento.psicologo_id
+    ).filter(
+        Usuario.tipo_usuario == 'psicologo',
+        Agendamento.status.in_(['agendado', 'confirmado', 'realizado']),
+        Agendamento.data_hora >= agora_utc - timedelta(days=90)  # últimos 3 meses
+    ).group_by(
+        Usuario.nome_completo
+    ).all()
+    
+    casos_ativos = []
+    for item in casos_ativos_query:
+        casos_ativos.append({
+            'nome': item.nome.split()[0],  # Primeiro nome
+            'casos': item.casos_ativos
+        })
+    
+    return dict(total_pacientes=total_pacientes,
+                total_psicologos=total_psicologos,
+                total_agendamentos=total_agendamentos,
+                agendamentos_por_mes=agendamentos_por_mes,
+                taxa_retencao=taxa_retencao,
+                distribuicao_sessoes=distribuicao_sessoes,
+                taxa_ocupacao=taxa_ocupacao,
+                taxa_noshow=taxa_noshow,
+                casos_ativos=casos_ativos)
 
 def init_routes(admin):
     """Inicializa as rotas do admin"""
@@ -25,186 +200,101 @@ def init_routes(admin):
     @admin_required
     def dashboard():
         """Dashboard administrativo"""
-        # Estatísticas básicas
-        total_pacientes = db.session.query(Usuario).filter(Usuario.tipo_usuario == 'paciente').count()
-        total_psicologos = db.session.query(Psicologo).join(Usuario, Psicologo.usuario_id == Usuario.id).filter(Usuario.tipo_usuario == 'psicologo').count()
-        total_agendamentos = db.session.query(Agendamento).count()
-        
-        # Dados reais para os gráficos
-        from datetime import datetime, timedelta
-        
-        # Defina o fuso horário para UTC para evitar erros de comparação
-        agora_utc = datetime.now(pytz.utc)
-        data_limite = agora_utc - timedelta(days=180)  # aproximadamente 6 meses
-
-        # Agendamentos por mês (últimos 6 meses)
-        agendamentos_query = db.session.query(
-            func.to_char(Agendamento.data_hora, 'MM').label('mes_num'),
-            func.count(Agendamento.id).label('total')
-        ).filter(
-            Agendamento.data_hora >= data_limite
-        ).group_by(
-            func.to_char(Agendamento.data_hora, 'MM')
-        ).order_by(
-            func.to_char(Agendamento.data_hora, 'MM')
-        ).all()
-        
-        # Converter números dos meses para nomes
-        meses_nomes = {
-            '01': 'Jan', '02': 'Fev', '03': 'Mar', '04': 'Abr',
-            '05': 'Mai', '06': 'Jun', '07': 'Jul', '08': 'Ago',
-            '09': 'Set', '10': 'Out', '11': 'Nov', '12': 'Dez'
-        }
-        
-        agendamentos_por_mes = []
-        for item in agendamentos_query:
-            mes_nome = meses_nomes.get(item.mes_num, item.mes_num)
-            agendamentos_por_mes.append({'mes': mes_nome, 'total': item.total})
-        
-        # 1. Taxa de Retenção de Pacientes (por mês)
-        # Primeiro, obter todos os meses com agendamentos
-        meses_query = db.session.query(
-            func.to_char(Agendamento.data_hora, 'YYYY-MM').label('mes')
-        ).filter(
-            Agendamento.data_hora >= data_limite,
-            Agendamento.status.in_(['realizado', 'confirmado'])
-        ).group_by(
-            func.to_char(Agendamento.data_hora, 'YYYY-MM')
-        ).all()
-        
-        taxa_retencao = []
-        for mes_item in meses_query:
-            mes = mes_item.mes
-            
-            # Total de pacientes únicos no mês
-            total_pacientes_mes = db.session.query(
-                func.count(func.distinct(Agendamento.paciente_id))
-            ).filter(
-                func.to_char(Agendamento.data_hora, 'YYYY-MM') == mes,
-                Agendamento.status.in_(['realizado', 'confirmado'])
-            ).scalar() or 0
-            
-            # Pacientes que tiveram mais de 1 sessão no mês
-            pacientes_multiplas_sessoes = db.session.query(
-                Agendamento.paciente_id
-            ).filter(
-                func.to_char(Agendamento.data_hora, 'YYYY-MM') == mes,
-                Agendamento.status.in_(['realizado', 'confirmado'])
-            ).group_by(
-                Agendamento.paciente_id
-            ).having(
-                func.count(Agendamento.id) >= 2
-            ).count()
-            
-            if total_pacientes_mes > 0:
-                taxa = (pacientes_multiplas_sessoes / total_pacientes_mes) * 100
-                taxa_retencao.append({
-                    'mes': mes,
-                    'taxa': round(taxa, 1)
-                })
-            else:
-                taxa_retencao.append({
-                    'mes': mes,
-                    'taxa': 0
-                })
-        
-        # 2. Frequência de Sessões (distribuição)
-        frequencia_query = db.session.query(
-            Agendamento.paciente_id,
-            func.count(Agendamento.id).label('total_sessoes')
-        ).filter(
-            Agendamento.status == 'realizado'
-        ).group_by(Agendamento.paciente_id).all()
-        
-        distribuicao_sessoes = {'1-5': 0, '6-10': 0, '11-15': 0, '16+': 0}
-        for item in frequencia_query:
-            if item.total_sessoes <= 5:
-                distribuicao_sessoes['1-5'] += 1
-            elif item.total_sessoes <= 10:
-                distribuicao_sessoes['6-10'] += 1
-            elif item.total_sessoes <= 15:
-                distribuicao_sessoes['11-15'] += 1
-            else:
-                distribuicao_sessoes['16+'] += 1
-        
-        # 3. Taxa de Ocupação dos Profissionais
-        ocupacao_query = db.session.query(
-            Usuario.nome_completo.label('nome'),
-            func.count(Agendamento.id).label('agendamentos_realizados')
-        ).join(
-            Psicologo, Usuario.id == Psicologo.usuario_id
-        ).outerjoin(
-            Agendamento, Psicologo.id == Agendamento.psicologo_id
-        ).filter(
-            Usuario.tipo_usuario == 'psicologo',
-            Agendamento.data_hora >= data_limite
-        ).group_by(
-            Usuario.nome_completo
-        ).all()
-        
-        # Assumindo 40 horas/semana * 4 semanas * 6 meses = 960 horas disponíveis
-        horas_disponiveis = 960
-        taxa_ocupacao = []
-        for item in ocupacao_query:
-            # Assumindo 1 hora por sessão
-            ocupacao = (item.agendamentos_realizados / horas_disponiveis) * 100
-            taxa_ocupacao.append({
-                'nome': item.nome.split()[0],  # Primeiro nome
-                'ocupacao': round(ocupacao, 1)
-            })
-        
-        # 4. Taxa de No-Show (por mês)
-        noshow_query = db.session.query(
-            func.to_char(Agendamento.data_hora, 'YYYY-MM').label('mes'),
-            func.count(Agendamento.id).label('total_agendamentos'),
-            func.sum(case((Agendamento.status == 'ausencia', 1), else_=0)).label('faltas')
-        ).filter(
-            Agendamento.data_hora >= data_limite
-        ).group_by(
-            func.to_char(Agendamento.data_hora, 'YYYY-MM')
-        ).all()
-        
-        taxa_noshow = []
-        for item in noshow_query:
-            if item.total_agendamentos > 0:
-                taxa = (item.faltas / item.total_agendamentos) * 100
-                mes_formatado = item.mes.split('-')[1] + '/' + item.mes.split('-')[0][-2:]
-                taxa_noshow.append({'mes': mes_formatado, 'taxa': round(taxa, 1)})
-        
-        # 5. Número de Casos Ativos por Profissional
-        casos_ativos_query = db.session.query(
-            Usuario.nome_completo.label('nome'),
-            func.count(func.distinct(Agendamento.paciente_id)).label('casos_ativos')
-        ).join(
-            Psicologo, Usuario.id == Psicologo.usuario_id
-        ).outerjoin(
-            Agendamento, Psicologo.id == Agendamento.psicologo_id
-        ).filter(
-            Usuario.tipo_usuario == 'psicologo',
-            Agendamento.status.in_(['agendado', 'confirmado', 'realizado']),
-            Agendamento.data_hora >= agora_utc - timedelta(days=90)  # últimos 3 meses
-        ).group_by(
-            Usuario.nome_completo
-        ).all()
-        
-        casos_ativos = []
-        for item in casos_ativos_query:
-            casos_ativos.append({
-                'nome': item.nome.split()[0],  # Primeiro nome
-                'casos': item.casos_ativos
-            })
-        
-        return render_template('admin/dashboard.html', 
-                             total_pacientes=total_pacientes,
-                             total_psicologos=total_psicologos,
-                             total_agendamentos=total_agendamentos,
-                             agendamentos_por_mes=agendamentos_por_mes,
-                             taxa_retencao=taxa_retencao,
-                             distribuicao_sessoes=distribuicao_sessoes,
-                             taxa_ocupacao=taxa_ocupacao,
-                             taxa_noshow=taxa_noshow,
-                             casos_ativos=casos_ativos)
+        # Os dados só mudam com usuários, agendamentos ou prontuários (versao_global) e com o dia:
+        # no acerto nenhuma das consultas dos gráficos é executada
+        versao_dados = (versao_global(), date.today())
+        dados = fragmentos.em_cache(('admin:dashboard', versao_dados), _dados_dashboard)
+        return render_template('admin/dashboard.html', versao_dados=versao_dados, **dados)
+    
+    @admin.route('/consultas-lentas')
+    @login_required
+    @admin_required
+    def consultas_lentas():
+        """Últimas consultas SQL lentas deste processo, com o plano de execução"""
+        registro = current_app.extensions.get('consultas_lentas')
+        return render_template('admin/consultas_lentas.html',
+                             registro=registro,
+                             consultas=registro.entradas() if registro else [])
+    
+    @admin.route('/consultas-lentas.json')
+    @login_required
+    @admin_required
+    def consultas_lentas_json():
+        """Exporta as consultas lentas em JSON"""
+        registro = current_app.extensions.get('consultas_lentas')
+        if registro is None:
+            return jsonify({'error': 'Registro de consultas lentas desativado'}), 404
+        registro.aguardar()
+        response = jsonify({
+            'limite_ms': registro.limite_ms,
+            'dialeto': registro.engine.dialect.name,
+            'consultas': registro.entradas()
+        })
+        response.headers['Content-Disposition'] = 'attachment; filename=consultas-lentas.json'
+        return response
+    
+    @admin.route('/perfis')
+    @login_required
+    @admin_required
+    def perfis():
+        """Perfis de requisições gravados (cabeçalho X-Perfil ou amostragem)"""
+        return render_template('admin/perfis.html',
+                             ativo=current_app.config.get('PERFIL_ATIVO', True),
+                             pasta=perfilador.pasta_perfis(current_app),
+                             perfis=perfilador.listar_perfis(current_app))
     
+    @admin.route('/perfis/<nome>')
+    @login_required
+    @admin_required
+    def baixar_perfil(nome):
+        """Baixa um arquivo de perfil (.pstats, .speedscope.json) ou de trace (.json)"""
+        return send_from_directory(perfilador.pasta_perfis(current_app), nome, as_attachment=True)
+
+    @admin.route('/memoria')
+    @login_required
+    @admin_required
+    def memoria():
+        """Snapshots do tracemalloc deste processo: crescimento por local, por tipo e identity maps"""
+        perfil = current_app.extensions.get('memoria')
+        agrupar = 'traceback' if request.args.get('agrupar') == 'traceback' else 'lineno'
+        return render_template('admin/memoria.html',
+                             perfil=perfil,
+                             agrupar=agrupar,
+                             resumo=perfil.resumo(agrupar) if perfil else None)
+
+    @admin.route('/memoria.json')
+    @login_required
+    @admin_required
+    def memoria_json():
+        """Exporta o estado dos snapshots de memória em JSON"""
+        perfil = current_app.extensions.get('memoria')
+        if perfil is None:
+            return jsonify({'error': 'Perfil de memória desativado'}), 404
+        return jsonify(perfil.resumo('traceback' if request.args.get('agrupar') == 'traceback' else 'lineno'))
+
+    @admin.route('/memoria/<acao>', methods=['POST'])
+    @login_required
+    @admin_required
+    def memoria_acao(acao):
+        """Cria a base (opcionalmente com captura após N requisições), captura ou para"""
+        perfil = current_app.extensions.get('memoria')
+        if perfil is None:
+            flash('Perfil de memória desativado (MEMORIA_ATIVO=false).', 'error')
+        elif acao == 'base':
+            requisicoes = request.form.get('requisicoes', type=int)
+            perfil.iniciar(requisicoes if requisicoes and requisicoes > 0 else None)
+            flash('Base criada.' + (f' A captura será feita após {requisicoes} requisições.' if perfil.alvo else ''),
+                  'success')
+        elif acao == 'capturar' and perfil.ativo:
+            perfil.capturar()
+            flash('Snapshot capturado.', 'success')
+        elif acao == 'parar':
+            perfil.parar()
+            flash('Snapshots descartados e tracemalloc desligado.', 'success')
+        else:
+            flash('Crie a base antes de capturar.', 'error')
+        return redirect(url_for('admin.memoria'))
+
     @admin.route('/cadastrar_psicologo', methods=['GET', 'POST'])
     @login_required
     @admin_required
@@ -292,7 +382,7 @@ def init_routes(admin):
                         flash('A senha deve ter pelo menos 6 caracteres.', 'error')
                         return render_template('admin/perfil.html', admin=admin_user)
                     
-                    admin_user.senha_hash = generate_password_hash(nova_senha)
+                    admin_user.set_senha(nova_senha)
                 
                 db.session.commit()
                 flash('Perfil atualizado com sucesso!', 'success')
@@ -314,9 +404,31 @@ def init_routes(admin):
         email_filtro = request.args.get('email', '').strip()
         telefone_filtro = request.args.get('telefone', '').strip()
         
-        # Query base
-        query = db.session.query(Paciente, Usuario).join(
+        # Psicólogo exibido: o responsável ou, sem responsável, o do primeiro agendamento
+        UsuarioResponsavel = aliased(Usuario)
+        UsuarioAgendamento = aliased(Usuario)
+        psicologo_agendamento = select(UsuarioAgendamento.nome_completo).select_from(Agendamento).join(
+            Psicologo, Agendamento.psicologo_id == Psicologo.id
+        ).join(
+            UsuarioAgendamento, Psicologo.usuario_id == UsuarioAgendamento.id
+        ).where(
+            Agendamento.paciente_id == Paciente.id
+        ).order_by(Agendamento.id).limit(1).scalar_subquery()
+        
+        # Query base (apenas colunas, sem consultas extras por linha)
+        query = select(
+            Usuario.nome_completo,
+            Usuario.email,
+            Usuario.telefone,
+            Usuario.data_criacao,
+            func.coalesce(UsuarioResponsavel.nome_completo, psicologo_agendamento).label('psicologo_nome'),
+            exists().where(Agendamento.paciente_id == Paciente.id).label('tem_agendamentos')
+        ).select_from(Paciente).join(
             Usuario, Paciente.usuario_id == Usuario.id
+        ).outerjoin(
+            Psicologo, Paciente.psicologo_id == Psicologo.id
+        ).outerjoin(
+            UsuarioResponsavel, Psicologo.usuario_id == UsuarioResponsavel.id
         )
         
         # Aplicar filtros
@@ -329,7 +441,7 @@ def init_routes(admin):
         if telefone_filtro:
             query = query.filter(Usuario.telefone.ilike(f"%{telefone_filtro}%"))
         
-        pacientes = query.order_by(Usuario.nome_completo).all()
+        pacientes = ConsultaTransmitida(query.order_by(Usuario.nome_completo))
         
         # Criar objeto de filtros para o template
         filtros = {
@@ -338,7 +450,7 @@ def init_routes(admin):
             'telefone': telefone_filtro
         }
 
-        return render_template('admin/listar_pacientes.html', 
+        return transmitir_template('admin/listar_pacientes.html', 
                              pacientes=pacientes,
                              filtros=filtros)
     
@@ -393,16 +505,17 @@ def init_routes(admin):
         data_fim = request.args.get('data_fim')
         
         # Criar aliases para evitar conflitos
-        from sqlalchemy.orm import aliased
         UsuarioPaciente = aliased(Usuario)
         UsuarioPsicologo = aliased(Usuario)
         
-        # Query base
-        query = db.session.query(
-            Agendamento,
+        # Query base (apenas colunas: as linhas são transmitidas sem passar pelo identity map)
+        query = select(
+            Agendamento.data_hora,
+            Agendamento.status,
+            Agendamento.observacoes,
             UsuarioPaciente.nome_completo.label('paciente_nome'),
             UsuarioPsicologo.nome_completo.label('psicologo_nome')
-        ).join(
+        ).select_from(Agendamento).join(
             Paciente, Agendamento.paciente_id == Paciente.id
         ).join(
             UsuarioPaciente, Paciente.usuario_id == UsuarioPaciente.id
@@ -432,11 +545,11 @@ def init_routes(admin):
             data_fim_dt = datetime.strptime(data_fim, '%Y-%m-%d')
             query = query.filter(func.date(Agendamento.data_hora) <= data_fim_dt.date())
         
-        agendamentos = query.order_by(Agendamento.data_hora.desc()).all()
+        agendamentos = ConsultaTransmitida(query.order_by(Agendamento.data_hora.desc()))
         
         status_opcoes = ['agendado', 'confirmado', 'realizado', 'cancelado', 'ausencia']
         
-        return render_template('admin/agendamentos.html', 
+        return transmitir_template('admin/agendamentos.html', 
                              agendamentos=agendamentos,
                              status_opcoes=status_opcoes,
                              filtros={
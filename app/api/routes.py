@@ -1,5 +1,6 @@
-from flask import jsonify, request
+from flask import jsonify, request, current_app
 from . import bp
+from app import banco
 from app.models import Usuario, Paciente, Psicologo, Agendamento
 
 @bp.route('/status')
@@ -8,7 +9,12 @@ def status():
     return jsonify({
         'status': 'ok',
         'message': 'API da Clínica Mentalize funcionando',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'cache_identidade': current_app.extensions['cache_identidade'].estatisticas(),
+        'pool': banco.estatisticas(),
+        'cache_fragmentos': current_app.extensions['cache_fragmentos'].estatisticas()
+        if 'cache_fragmentos' in current_app.extensions else None,
+        'templates': current_app.extensions['tempos_templates'].estatisticas()
     })
 
 # Importar rotas de horários
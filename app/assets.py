@@ -0,0 +1,228 @@
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+from flask import current_app, request, send_from_directory, url_for
+from markupsafe import Markup
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, apenas .gz é gerado
+    brotli = None
+
+# Bibliotecas de terceiros com versão fixa, copiadas para app/static/vendor
+VENDOR = {
+    'bootstrap': ('5.1.3', {
+        'vendor/bootstrap/css/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+        'vendor/bootstrap/js/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+    }),
+    'font-awesome': ('6.0.0', dict(
+        [('vendor/font-awesome/css/all.min.css',
+          'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css')] +
+        [(f'vendor/font-awesome/webfonts/{fonte}.{ext}',
+          f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/{fonte}.{ext}')
+         for fonte in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility')
+         for ext in ('woff2', 'ttf')]
+    )),
+    'chart.js': ('4.4.1', {
+        'vendor/chart.js/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+    }),
+    'emailjs': ('4.4.1', {
+        'vendor/emailjs/email.min.js': 'https://cdn.jsdelivr.net/npm/@emailjs/browser@4.4.1/dist/email.min.js',
+    }),
+}
+
+URLS_CDN = {caminho: url for _, arquivos in VENDOR.values() for caminho, url in arquivos.items()}
+
+# SHA-256 esperado de cada arquivo de VENDOR, conferido a cada download. Ao trocar uma versão, rode
+# `flask assets digests` (com acesso à rede), revise e cole a saída aqui. Arquivo sem digest não é
+# baixado: a página continua usando a CDN para ele, como antes do vendor local.
+SHA256_VENDOR = {
+}
+# Subresource Integrity das tags que ainda apontam para a CDN: o navegador recusa o arquivo se o
+# conteúdo servido mudar. Os de Bootstrap são os publicados na documentação da 5.1.3; os demais
+# saem de `flask assets digests` e, até lá, a tag vai sem `integrity`.
+INTEGRIDADE_CDN = {
+    'vendor/bootstrap/css/bootstrap.min.css':
+        'sha384-1BmE4kWBq78iYhFldvKuhfTAU6auU8tT94WrHftjDbrCEXSU1oBoqyl2QvZ6jIW3',
+    'vendor/bootstrap/js/bootstrap.bundle.min.js':
+        'sha384-ka7Sk0Gln4gmtz2MlQnikT1wXgYsOg+OMhuP+IlRH9sENBO0LRn5q+8nbTov4+1p',
+}
+MANIFESTO = 'manifest.json'
+# woff2, png etc. já são comprimidos
+EXTENSOES_COMPRIMIVEIS = ('.css', '.js', '.svg', '.ttf', '.json', '.map', '.txt')
+CACHE_IMUTAVEL = 31536000  # 1 ano: o nome do arquivo muda quando o conteúdo muda
+
+_URL_CSS = re.compile(rb'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+class DigestDivergente(ValueError):
+    """O conteúdo baixado não confere com o SHA-256 fixado em SHA256_VENDOR"""
+
+def integridade_sri(conteudo):
+    """Valor do atributo `integrity` (SHA-384 em base64) para o conteúdo"""
+    return 'sha384-' + base64.b64encode(hashlib.sha384(conteudo).digest()).decode()
+
+def calcular_digests(abrir_url=urllib.request.urlopen):
+    """SHA-256 e SRI do conteúdo atual de cada URL de VENDOR (para atualizar SHA256_VENDOR e INTEGRIDADE_CDN)"""
+    digests, integridade = {}, {}
+    for caminho, url in URLS_CDN.items():
+        with abrir_url(url) as resposta:
+            conteudo = resposta.read()
+        digests[caminho] = hashlib.sha256(conteudo).hexdigest()
+        integridade[caminho] = integridade_sri(conteudo)
+    return digests, integridade
+
+def baixar_vendor(pasta_static, abrir_url=urllib.request.urlopen, digests=None):
+    """Baixa as bibliotecas fixadas em VENDOR, conferindo o SHA-256 de SHA256_VENDOR
+
+    Levanta DigestDivergente (e não grava nada) se algum arquivo difere do esperado.
+    Retorna os caminhos baixados e os ignorados por não terem digest fixado.
+    """
+    digests = SHA256_VENDOR if digests is None else digests
+    conteudos, sem_digest = {}, []
+    for caminho, url in URLS_CDN.items():
+        esperado = digests.get(caminho)
+        if esperado is None:
+            sem_digest.append(caminho)
+            continue
+        with abrir_url(url) as resposta:
+            conteudo = resposta.read()
+        digest = hashlib.sha256(conteudo).hexdigest()
+        if digest != esperado:
+            raise DigestDivergente(f'SHA-256 de {url} é {digest}, esperado {esperado}')
+        conteudos[caminho] = conteudo
+
+    for caminho, conteudo in conteudos.items():
+        destino = os.path.join(pasta_static, caminho)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, 'wb') as f:
+            f.write(conteudo)
+    return list(conteudos), sem_digest
+
+def _reescrever_urls_css(conteudo, caminho, manifesto):
+    """Aponta os url(...) relativos de um CSS para os nomes com hash"""
+    pasta = posixpath.dirname(caminho)
+
+    def substituir(match):
+        referencia = match.group(2).decode()
+        if referencia.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        # Mantém o sufixo ?#iefix, ?v=... das fontes
+        alvo, separador, sufixo = (re.split(r'([?#])', referencia, maxsplit=1) + ['', ''])[:3]
+        alvo = posixpath.normpath(posixpath.join(pasta, alvo))
+        if alvo not in manifesto:
+            return match.group(0)
+        nova = posixpath.relpath(manifesto[alvo], pasta) + separador + sufixo
+        return f'url({match.group(1).decode()}{nova}{match.group(1).decode()})'.encode()
+
+    return _URL_CSS.sub(substituir, conteudo)
+
+def _comprimir(destino, conteudo):
+    versoes = [('.gz', gzip.compress(conteudo, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        versoes.append(('.br', brotli.compress(conteudo, quality=11)))
+    for extensao, comprimido in versoes:
+        if len(comprimido) < len(conteudo):
+            with open(destino + extensao, 'wb') as f:
+                f.write(comprimido)
+
+def construir(pasta_static, pasta_dist=None):
+    """Copia os arquivos estáticos para dist/ com hash no nome, pré-comprimidos, e grava o manifesto"""
+    pasta_dist = pasta_dist or os.path.join(pasta_static, 'dist')
+    shutil.rmtree(pasta_dist, ignore_errors=True)
+
+    fontes = []
+    for raiz, pastas, arquivos in os.walk(pasta_static):
+        pastas[:] = [p for p in pastas if os.path.join(raiz, p) != pasta_dist]
+        for arquivo in arquivos:
+            fontes.append(os.path.relpath(os.path.join(raiz, arquivo), pasta_static).replace(os.sep, '/'))
+
+    manifesto = {}
+    # CSS por último: as referências (fontes, imagens) já precisam ter nome com hash
+    for caminho in sorted(fontes, key=lambda c: (c.endswith('.css'), c)):
+        with open(os.path.join(pasta_static, caminho), 'rb') as f:
+            conteudo = f.read()
+        if caminho.endswith('.css'):
+            conteudo = _reescrever_urls_css(conteudo, caminho, manifesto)
+
+        raiz, extensao = posixpath.splitext(caminho)
+        nome = f'{raiz}.{hashlib.sha256(conteudo).hexdigest()[:12]}{extensao}'
+        destino = os.path.join(pasta_dist, nome)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, 'wb') as f:
+            f.write(conteudo)
+        if extensao in EXTENSOES_COMPRIMIVEIS:
+            _comprimir(destino, conteudo)
+        manifesto[caminho] = nome
+
+    with open(os.path.join(pasta_dist, MANIFESTO), 'w') as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+    return manifesto
+
+def carregar_manifesto(app):
+    """Lê o manifesto gerado por `flask assets build` (vazio se ainda não houve build)"""
+    pasta_dist = app.config.get('ASSETS_DIST') or os.path.join(app.static_folder, 'dist')
+    manifesto = {}
+    caminho = os.path.join(pasta_dist, MANIFESTO)
+    if os.path.exists(caminho):
+        with open(caminho) as f:
+            manifesto = json.load(f)
+    app.extensions['assets'] = {'pasta': pasta_dist, 'manifesto': manifesto}
+    # Os fragmentos de template guardam URLs de assets
+    cache = app.extensions.get('cache_fragmentos')
+    if cache is not None:
+        cache.limpar()
+
+def asset_url(caminho):
+    """URL de um arquivo de app/static: versão com hash, cópia local sem build ou CDN"""
+    assets = current_app.extensions['assets']
+    nome = assets['manifesto'].get(caminho)
+    if nome:
+        return url_for('assets', arquivo=nome)
+    if _usa_cdn(caminho):
+        # Biblioteca ainda não baixada (`flask assets baixar`)
+        return URLS_CDN[caminho]
+    return url_for('static', filename=caminho)
+
+def _usa_cdn(caminho):
+    return (caminho in URLS_CDN and caminho not in current_app.extensions['assets']['manifesto']
+            and not os.path.exists(os.path.join(current_app.static_folder, caminho)))
+
+def integridade_cdn(caminho):
+    """Atributos `integrity`/`crossorigin` da tag quando asset_url aponta para a CDN (vazio caso contrário)"""
+    sri = INTEGRIDADE_CDN.get(caminho)
+    if sri is None or not _usa_cdn(caminho):
+        return Markup('')
+    return Markup(' integrity="%s" crossorigin="anonymous"') % sri
+
+def servir_asset(arquivo):
+    """Serve um arquivo com hash, escolhendo a versão pré-comprimida aceita pelo navegador"""
+    pasta = current_app.extensions['assets']['pasta']
+    tipo = mimetypes.guess_type(arquivo)[0]
+    codificacao = None
+    for nome, extensao in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[nome] and os.path.isfile(os.path.join(pasta, arquivo + extensao)):
+            codificacao = nome
+            arquivo += extensao
+            break
+
+    response = send_from_directory(pasta, arquivo, mimetype=tipo, max_age=CACHE_IMUTAVEL)
+    if codificacao:
+        response.headers['Content-Encoding'] = codificacao
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_app(app):
+    """Registra a rota /assets e a função asset_url nos templates"""
+    carregar_manifesto(app)
+    app.add_url_rule('/assets/<path:arquivo>', 'assets', servir_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.globals['integridade_cdn'] = integridade_cdn
@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from flask import current_app, g, request, session, has_app_context, has_request_context
+from flask_login import user_logged_in, user_logged_out
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db, log_estruturado, rastreamento
+from app.auth.perfil import carregar_usuario
+
+PERFIS = ('psicologo', 'paciente', 'admin')
+# Versão do usuário no momento do "lembrar-me", assinada; o cookie do Flask-Login só guarda o id
+COOKIE_VERSAO = 'lembrar_versao'
+
+def _copiar_destacado(obj):
+    """Cria uma cópia destacada (sem sessão) com as colunas já carregadas do objeto"""
+    mapper = inspect(obj).mapper
+    copia = mapper.class_manager.new_instance()
+    for coluna in mapper.column_attrs:
+        set_committed_value(copia, coluna.key, getattr(obj, coluna.key))
+    make_transient_to_detached(copia)
+    return copia
+
+class CacheIdentidade:
+    """Cache local ao processo dos usuários autenticados.
+
+    Cada registro guarda uma cópia destacada do usuário (e do seu perfil) junto com
+    a versão em que foi lido. A sessão do navegador carrega a versão vista no login,
+    então o registro só é usado quando as duas coincidem e o TTL não expirou.
+
+    Uma alteração invalida o registro na hora apenas no processo que a fez: com
+    vários workers do gunicorn, os outros podem usar a cópia antiga até o TTL
+    expirar. Por isso o TTL padrão é de poucos segundos.
+    """
+
+    def __init__(self, ttl=5, capacidade=1024):
+        self.ttl = ttl
+        self.capacidade = capacidade
+        self._registros = OrderedDict()
+        self._lock = threading.Lock()
+        self.consultas_evitadas = 0
+        self.consultas_realizadas = 0
+
+    def obter(self, user_id, versao):
+        """Retorna a cópia guardada do usuário se ainda for válida para a versão informada"""
+        agora = time.monotonic()
+        with self._lock:
+            registro = self._registros.get(user_id)
+            if registro is None:
+                return None
+            copia, versao_cache, expira_em = registro
+            if versao_cache != versao or expira_em <= agora:
+                del self._registros[user_id]
+                return None
+            self._registros.move_to_end(user_id)
+            self.consultas_evitadas += 1
+            return copia
+
+    def guardar(self, usuario):
+        """Guarda uma cópia destacada do usuário e do perfil já carregado"""
+        estado = inspect(usuario)
+        copia = _copiar_destacado(usuario)
+        for perfil in PERFIS:
+            # Só copia relacionamentos já carregados pelo JOIN, sem disparar novas consultas
+            if perfil in estado.dict:
+                valor = estado.dict[perfil]
+                set_committed_value(copia, perfil, _copiar_destacado(valor) if valor is not None else None)
+
+        with self._lock:
+            self._registros[usuario.id] = (copia, usuario.versao, time.monotonic() + self.ttl)
+            self._registros.move_to_end(usuario.id)
+            while len(self._registros) > self.capacidade:
+                self._registros.popitem(last=False)
+
+    def registrar_consulta(self):
+        """Conta um carregamento que precisou ir ao banco"""
+        with self._lock:
+            self.consultas_realizadas += 1
+
+    def invalidar(self, user_id):
+        """Remove o usuário do cache"""
+        with self._lock:
+            self._registros.pop(user_id, None)
+
+    def estatisticas(self):
+        """Contadores de uso do cache"""
+        with self._lock:
+            return {
+                'usuarios_em_cache': len(self._registros),
+                'consultas_evitadas': self.consultas_evitadas,
+                'consultas_realizadas': self.consultas_realizadas
+            }
+
+def init_app(app):
+    """Cria o cache de identidade da aplicação"""
+    app.extensions['cache_identidade'] = CacheIdentidade(
+        ttl=app.config.get('CACHE_IDENTIDADE_TTL', 5),
+        capacidade=app.config.get('CACHE_IDENTIDADE_TAMANHO', 1024)
+    )
+    app.after_request(_gravar_versao_lembrada)
+
+def _serializador():
+    return URLSafeSerializer(current_app.secret_key, salt='identidade-versao')
+
+def _versao_lembrada(user_id):
+    """Versão gravada com o cookie "lembrar-me" deste usuário (None se ausente ou adulterada)"""
+    valor = request.cookies.get(COOKIE_VERSAO)
+    if not valor:
+        return None
+    try:
+        dono, versao = _serializador().loads(valor)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    return versao if dono == user_id else None
+
+def _gravar_versao_lembrada(response):
+    if '_versao_lembrada' not in g:
+        return response
+    valor = g.pop('_versao_lembrada')
+    if valor is None:
+        response.delete_cookie(COOKIE_VERSAO)
+        return response
+    duracao = current_app.config.get('REMEMBER_COOKIE_DURATION', timedelta(days=365))
+    response.set_cookie(COOKIE_VERSAO, _serializador().dumps(valor),
+                        max_age=int(getattr(duracao, 'total_seconds', lambda: duracao)()),
+                        secure=current_app.config.get('REMEMBER_COOKIE_SECURE', False),
+                        httponly=True, samesite=current_app.config.get('REMEMBER_COOKIE_SAMESITE'))
+    return response
+
+def carregar_identidade(user_id):
+    """Carrega o usuário da sessão, evitando a consulta quando o cache está válido"""
+    cache = current_app.extensions['cache_identidade']
+    user_id = int(user_id)
+    versao_sessao = session.get('_user_versao')
+    if versao_sessao is None and current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') in request.cookies:
+        # Sessão restaurada pelo cookie "lembrar-me": vale a versão gravada com ele
+        versao_sessao = _versao_lembrada(user_id)
+        if versao_sessao is None:
+            return None
+
+    if versao_sessao is not None:
+        with rastreamento.span('cache identidade', 'cache') as span:
+            copia = cache.obter(user_id, versao_sessao)
+            span.definir(resultado='falha' if copia is None else 'acerto')
+        if copia is not None:
+            usuario = db.session.merge(copia, load=False)
+            log_estruturado.anotar_perfil(usuario)
+            return usuario
+
+    usuario = carregar_usuario(user_id)
+    cache.registrar_consulta()
+
+    if usuario is None or not usuario.ativo:
+        return None
+
+    # Sessão criada antes de uma troca de senha, desativação ou edição de perfil
+    if versao_sessao is not None and versao_sessao != usuario.versao:
+        return None
+
+    session['_user_versao'] = usuario.versao
+    cache.guardar(usuario)
+    log_estruturado.anotar_perfil(usuario)
+    return usuario
+
+def incrementar_versao(mapper, connection, target):
+    """Incrementa a versão do usuário quando dados de identidade mudam"""
+    estado = inspect(target)
+    campos = ('senha_hash', 'ativo', 'email', 'nome_completo', 'telefone', 'tipo_usuario')
+    # Só o hash regerado pelo check_senha é ignorado; se a senha mudou depois dele, a versão sobe
+    rehash = target.__dict__.pop('_rehash_transparente', None)
+    if rehash is not None and rehash == target.senha_hash:
+        campos = campos[1:]
+    if not any(estado.attrs[campo].history.has_changes() for campo in campos):
+        return
+
+    target.versao = (target.versao or 0) + 1
+    if has_app_context() and 'cache_identidade' in current_app.extensions:
+        current_app.extensions['cache_identidade'].invalidar(target.id)
+
+    # A própria sessão de quem fez a alteração continua válida; as demais são rejeitadas
+    if has_request_context() and session.get('_user_id') == str(target.id):
+        session['_user_versao'] = target.versao
+        if COOKIE_VERSAO in request.cookies:
+            g._versao_lembrada = (target.id, target.versao)
+
+@user_logged_in.connect
+def _registrar_versao_login(sender, user, **extra):
+    session['_user_versao'] = user.versao
+    log_estruturado.anotar_perfil(user)
+    if session.get('_remember') == 'set':
+        g._versao_lembrada = (user.id, user.versao)
+
+@user_logged_out.connect
+def _remover_versao_logout(sender, user, **extra):
+    session.pop('_user_versao', None)
+    if COOKIE_VERSAO in request.cookies:
+        g._versao_lembrada = None
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request
+
+class BaldesMemoria:
+    """Token buckets em memória, com número máximo de chaves (descarta as menos usadas)"""
+
+    def __init__(self, capacidade=10000):
+        self.capacidade = capacidade
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, rajada, por_segundo):
+        """Consome um token da chave; retorna False se o balde estiver vazio"""
+        return self.consumir_todos([(chave, rajada, por_segundo)])
+
+    def consumir_todos(self, pedidos):
+        """Consome um token de cada (chave, rajada, por_segundo) só se todos os baldes tiverem token"""
+        agora = time.monotonic()
+        with self._lock:
+            saldos = []
+            for chave, rajada, por_segundo in pedidos:
+                balde = self._baldes.get(chave)
+                if balde is None:
+                    saldos.append(rajada)
+                else:
+                    tokens, atualizado = balde
+                    saldos.append(min(rajada, tokens + (agora - atualizado) * por_segundo))
+                    self._baldes.move_to_end(chave)
+
+            permitido = all(tokens >= 1 for tokens in saldos)
+            for (chave, _, _), tokens in zip(pedidos, saldos):
+                self._baldes[chave] = (tokens - 1 if permitido else tokens, agora)
+            while len(self._baldes) > self.capacidade:
+                # Um balde expulso equivale a um balde cheio: só perde a penalidade
+                self._baldes.popitem(last=False)
+            return permitido
+
+class BaldesSQLite:
+    """Token buckets em um arquivo SQLite compartilhado entre os workers do gunicorn"""
+
+    def __init__(self, caminho, limpeza_a_cada=500):
+        self.caminho = caminho
+        self.limpeza_a_cada = limpeza_a_cada
+        self._local = threading.local()
+        self._operacoes = 0
+        self._recarga = 0
+        self._lock = threading.Lock()
+
+    def _conexao(self):
+        # Uma conexão por thread e por processo (não reaproveitar após o fork)
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None or self._local.pid != os.getpid():
+            conexao = sqlite3.connect(self.caminho, timeout=1, isolation_level=None)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=OFF')
+            conexao.execute('CREATE TABLE IF NOT EXISTS baldes_login ('
+                            'chave TEXT PRIMARY KEY, tokens REAL NOT NULL, atualizado REAL NOT NULL)')
+            self._local.conexao = conexao
+            self._local.pid = os.getpid()
+        return conexao
+
+    def consumir(self, chave, rajada, por_segundo):
+        """Consome um token da chave; retorna False se o balde estiver vazio"""
+        return self.consumir_todos([(chave, rajada, por_segundo)])
+
+    def consumir_todos(self, pedidos):
+        """Consome um token de cada (chave, rajada, por_segundo) só se todos os baldes tiverem token"""
+        agora = time.time()
+        conexao = self._conexao()
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            saldos = []
+            for chave, rajada, por_segundo in pedidos:
+                linha = conexao.execute('SELECT tokens, atualizado FROM baldes_login WHERE chave = ?',
+                                        (chave,)).fetchone()
+                saldos.append(rajada if linha is None else min(rajada, linha[0] + (agora - linha[1]) * por_segundo))
+            permitido = all(tokens >= 1 for tokens in saldos)
+            conexao.executemany('INSERT OR REPLACE INTO baldes_login (chave, tokens, atualizado) VALUES (?, ?, ?)',
+                                [(chave, tokens - 1 if permitido else tokens, agora)
+                                 for (chave, _, _), tokens in zip(pedidos, saldos)])
+
+            # Com workers gthread várias threads do processo chegam aqui ao mesmo tempo
+            with self._lock:
+                self._operacoes += 1
+                self._recarga = max([self._recarga] + [rajada / por_segundo for _, rajada, por_segundo in pedidos])
+                limpar = self._operacoes % self.limpeza_a_cada == 0
+            if limpar:
+                # Remove baldes que já estariam cheios novamente (pelo limite mais lento já visto)
+                conexao.execute('DELETE FROM baldes_login WHERE atualizado < ?', (agora - self._recarga,))
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+        return permitido
+
+class LimitadorLogin:
+    """Limita tentativas de login por IP e por e-mail antes de qualquer consulta ou hash"""
+
+    def __init__(self, baldes, rajada_ip=20, por_minuto_ip=10, rajada_email=5, por_minuto_email=5):
+        self.baldes = baldes
+        self.ip = (rajada_ip, por_minuto_ip / 60)
+        self.email = (rajada_email, por_minuto_email / 60)
+
+    def permitir(self, ip, email=None):
+        # Os dois baldes são conferidos juntos: uma tentativa barrada pelo e-mail não gasta o token do IP
+        pedidos = [(f'ip:{ip}', *self.ip)]
+        if email:
+            pedidos.append((f'email:{email.strip().lower()}', *self.email))
+        return self.baldes.consumir_todos(pedidos)
+
+def init_app(app):
+    """Cria o limitador de tentativas de login da aplicação"""
+    if not app.config.get('LOGIN_LIMITE_ATIVO', True):
+        return
+
+    caminho = app.config.get('LOGIN_LIMITE_SQLITE')
+    baldes = BaldesSQLite(caminho) if caminho else BaldesMemoria(app.config.get('LOGIN_LIMITE_CAPACIDADE', 10000))
+    app.extensions['limitador_login'] = LimitadorLogin(
+        baldes,
+        rajada_ip=app.config.get('LOGIN_LIMITE_RAJADA_IP', 20),
+        por_minuto_ip=app.config.get('LOGIN_LIMITE_POR_MINUTO_IP', 10),
+        rajada_email=app.config.get('LOGIN_LIMITE_RAJADA_EMAIL', 5),
+        por_minuto_email=app.config.get('LOGIN_LIMITE_POR_MINUTO_EMAIL', 5)
+    )
+
+def ip_cliente():
+    """IP do cliente, considerando o número de proxies confiáveis à frente da aplicação"""
+    proxies = current_app.config.get('LOGIN_LIMITE_PROXIES', 0)
+    rota = request.access_route
+    if proxies and len(rota) >= proxies:
+        return rota[-proxies]
+    return request.remote_addr
+
+def tentativa_permitida(email=None):
+    """Verifica se a tentativa de login está dentro do limite"""
+    limitador = current_app.extensions.get('limitador_login')
+    if limitador is None:
+        return True
+    return limitador.permitir(ip_cliente(), email)
@@ -0,0 +1,47 @@
+from functools import wraps
+from flask import g, flash, redirect, url_for
+from flask_login import current_user
+from sqlalchemy.orm import joinedload
+from app import db
+
+def carregar_usuario(user_id):
+    """Busca o usuário junto com seu perfil (psicólogo, paciente ou admin) em uma única consulta"""
+    from app.models import Usuario
+    return db.session.get(Usuario, int(user_id), options=[
+        joinedload(Usuario.psicologo),
+        joinedload(Usuario.paciente),
+        joinedload(Usuario.admin)
+    ])
+
+def perfil_atual():
+    """Retorna o perfil do usuário logado, guardado em flask.g durante a requisição"""
+    if not current_user.is_authenticated:
+        return None
+
+    # A chave inclui o id do usuário porque o g pode sobreviver a mais de uma
+    # requisição quando um contexto de aplicação externo está ativo (ex.: testes)
+    cache = g.get('_perfil_atual')
+    if cache is None or cache[0] != current_user.id:
+        perfil = getattr(current_user, current_user.tipo_usuario, None)
+        cache = g._perfil_atual = (current_user.id, perfil)
+    return cache[1]
+
+def _tipo_required(tipo, mensagem, endpoint):
+    """Cria um decorator que restringe a rota a um tipo de usuário e carrega seu perfil"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated or current_user.tipo_usuario != tipo:
+                flash(mensagem, 'error')
+                return redirect(url_for(endpoint))
+            perfil_atual()
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+admin_required = _tipo_required(
+    'admin', 'Acesso negado. Apenas administradores podem acessar esta área.', 'auth.login')
+psicologo_required = _tipo_required(
+    'psicologo', 'Acesso negado. Área restrita para psicólogos.', 'main.index')
+paciente_required = _tipo_required(
+    'paciente', 'Acesso negado. Área restrita para pacientes.', 'main.index')
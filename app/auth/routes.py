@@ -4,10 +4,20 @@ from . import bp
 from app import db
 from app.models import Usuario, Paciente
 from app.auth.forms import LoginForm, RegistroPacienteForm, AlterarSenhaForm, EditarPerfilForm
+from app.auth.senhas import FilaSenhasCheia
+from app.auth.limitador import tentativa_permitida
+
+MENSAGEM_SOBRECARGA = 'Muitos logins simultâneos. Tente novamente em alguns segundos.'
+MENSAGEM_LIMITE = 'Muitas tentativas de login. Aguarde um minuto e tente novamente.'
 
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Página de login"""
+    # O limite é verificado antes de carregar o usuário da sessão ou calcular hashes
+    if request.method == 'POST' and not tentativa_permitida(request.form.get('email')):
+        flash(MENSAGEM_LIMITE, 'error')
+        return redirect(url_for('auth.login'), code=303)
+    
     if current_user.is_authenticated:
         return redirect(url_for('main.dashboard_redirect'))
     
@@ -18,8 +28,16 @@ def login():
             tipo_usuario=form.tipo_usuario.data
         ).first()
         
-        if usuario and usuario.check_senha(form.senha.data) and usuario.ativo:
+        try:
+            senha_correta = usuario is not None and usuario.check_senha(form.senha.data)
+        except FilaSenhasCheia:
+            flash(MENSAGEM_SOBRECARGA, 'error')
+            return render_template('auth/login.html', form=form), 503
+        
+        if senha_correta and usuario.ativo:
             login_user(usuario)
+            # Persiste o hash atualizado caso os parâmetros tenham mudado
+            db.session.commit()
             next_page = request.args.get('next')
             
             # Redireciona para a área apropriada baseada no tipo de usuário
@@ -82,7 +100,12 @@ def alterar_senha():
     """Alterar senha do usuário logado"""
     form = AlterarSenhaForm()
     if form.validate_on_submit():
-        if current_user.check_senha(form.senha_atual.data):
+        try:
+            senha_correta = current_user.check_senha(form.senha_atual.data)
+        except FilaSenhasCheia:
+            flash(MENSAGEM_SOBRECARGA, 'error')
+            return render_template('auth/alterar_senha.html', form=form), 503
+        if senha_correta:
             current_user.set_senha(form.nova_senha.data)
             db.session.commit()
             flash('Senha alterada com sucesso!', 'success')
@@ -115,7 +138,9 @@ def editar_perfil():
 @bp.route('/api/login', methods=['POST'])
 def api_login():
     """API de login"""
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not tentativa_permitida(data.get('email') if isinstance(data, dict) else None):
+        return jsonify({'error': MENSAGEM_LIMITE}), 429, {'Retry-After': '60'}
     
     if not data or not data.get('email') or not data.get('senha') or not data.get('tipo_usuario'):
         return jsonify({'error': 'E-mail, senha e tipo de usuário são obrigatórios'}), 400
@@ -125,8 +150,14 @@ def api_login():
         tipo_usuario=data['tipo_usuario']
     ).first()
     
-    if usuario and usuario.check_senha(data['senha']) and usuario.ativo:
+    try:
+        senha_correta = usuario is not None and usuario.check_senha(data['senha'])
+    except FilaSenhasCheia:
+        return jsonify({'error': MENSAGEM_SOBRECARGA}), 503, {'Retry-After': '2'}
+    
+    if senha_correta and usuario.ativo:
         login_user(usuario)
+        db.session.commit()
         return jsonify({
             'message': 'Login realizado com sucesso',
             'usuario': {
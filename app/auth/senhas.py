@@ -0,0 +1,81 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+METODO_PADRAO = 'pbkdf2:sha256:600000'
+
+class FilaSenhasCheia(Exception):
+    """Há verificações de senha demais aguardando processamento, ou a verificação demorou demais"""
+
+class VerificadorSenhas:
+    """Executa a verificação de hashes de senha em um pool de threads limitado.
+
+    A thread da requisição continua bloqueada esperando o hash; o pool só limita
+    quantos hashes rodam ao mesmo tempo no processo. Quando a fila passa do
+    limite, ou o resultado não sai em `timeout` segundos, a verificação é
+    recusada (503) em vez de acumular espera.
+    """
+
+    def __init__(self, threads=2, fila_maxima=16, timeout=10):
+        self.threads = threads
+        self.fila_maxima = fila_maxima
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(threads + fila_maxima)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _obter_executor(self):
+        # Criado sob demanda em cada processo: threads não sobrevivem ao fork do gunicorn
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.threads,
+                                                    thread_name_prefix='senhas')
+                self._pid = os.getpid()
+            return self._executor
+
+    def verificar(self, senha_hash, senha):
+        """Verifica a senha, levantando FilaSenhasCheia se não houver vaga na fila ou o tempo esgotar"""
+        if not self._vagas.acquire(blocking=False):
+            raise FilaSenhasCheia()
+        try:
+            futuro = self._obter_executor().submit(check_password_hash, senha_hash, senha)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TempoEsgotado:
+            # O hash continua no pool e libera a vaga ao terminar
+            raise FilaSenhasCheia('verificação de senha excedeu o tempo limite') from None
+
+def init_app(app):
+    """Cria o verificador de senhas da aplicação"""
+    app.extensions['verificador_senhas'] = VerificadorSenhas(
+        threads=app.config.get('SENHA_HASH_THREADS', 2),
+        fila_maxima=app.config.get('SENHA_HASH_FILA_MAXIMA', 16),
+        timeout=app.config.get('SENHA_HASH_TIMEOUT', 10)
+    )
+
+def metodo_hash():
+    """Método de hash configurado para o ambiente atual"""
+    if has_app_context():
+        return current_app.config.get('SENHA_HASH_METODO', METODO_PADRAO)
+    return METODO_PADRAO
+
+def gerar_hash(senha):
+    """Gera o hash da senha com os parâmetros do ambiente"""
+    return generate_password_hash(senha, method=metodo_hash())
+
+def verificar_senha(senha_hash, senha):
+    """Verifica a senha fora da thread da requisição quando há uma aplicação ativa"""
+    if has_app_context() and 'verificador_senhas' in current_app.extensions:
+        return current_app.extensions['verificador_senhas'].verificar(senha_hash, senha)
+    return check_password_hash(senha_hash, senha)
+
+def precisa_rehash(senha_hash):
+    """Indica se o hash foi gerado com parâmetros diferentes dos configurados"""
+    return senha_hash.split('$', 1)[0] != metodo_hash()
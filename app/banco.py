@@ -0,0 +1,145 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import NullPool, QueuePool
+from app import db
+
+class EstatisticasPool:
+    """Contadores de uso do pool de conexões do processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.conexoes_criadas = 0
+        self.pings = 0
+        self.desconexoes = 0
+
+    def registrar_espera(self, segundos):
+        with self._lock:
+            self.esperas += 1
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+
+    def incrementar(self, contador):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def como_dict(self, pool=None):
+        with self._lock:
+            dados = {
+                'checkouts': self.checkouts,
+                'espera_media_ms': round(self.espera_total / self.esperas * 1000, 3) if self.esperas else 0.0,
+                'espera_maxima_ms': round(self.espera_maxima * 1000, 3),
+                'conexoes_criadas': self.conexoes_criadas,
+                'pings': self.pings,
+                'desconexoes': self.desconexoes
+            }
+        if isinstance(pool, QueuePool):
+            dados.update(tamanho=pool.size(), em_uso=pool.checkedout(),
+                         ociosas=pool.checkedin(), overflow=pool.overflow())
+        return dados
+
+estatisticas_pool = EstatisticasPool()
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que mede o tempo de espera por uma conexão"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            estatisticas_pool.registrar_espera(time.perf_counter() - inicio)
+
+def opcoes_engine(config):
+    """Monta SQLALCHEMY_ENGINE_OPTIONS a partir das configurações DB_*"""
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    opcoes = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    opcoes.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', False))
+    opcoes.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 300))
+
+    if not uri.startswith('postgresql'):
+        # SQLite: o Flask-SQLAlchemy escolhe o pool adequado (StaticPool em memória)
+        return opcoes
+
+    if config.get('DB_POOL_MODO') == 'transacao':
+        # PgBouncer em modo transaction: o pooling é feito fora da aplicação
+        opcoes['poolclass'] = NullPool
+    else:
+        opcoes.update(
+            poolclass=QueuePoolMedido,
+            pool_size=config.get('DB_POOL_SIZE', 5),
+            max_overflow=config.get('DB_MAX_OVERFLOW', 5),
+            pool_timeout=config.get('DB_POOL_TIMEOUT', 10)
+        )
+        timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+        if timeout:
+            connect_args = dict(opcoes.get('connect_args', {}))
+            connect_args['options'] = f'-c statement_timeout={int(timeout)}'
+            opcoes['connect_args'] = connect_args
+    return opcoes
+
+def _registrar_devolucao(dbapi_connection, connection_record):
+    connection_record.info['devolvida_em'] = time.monotonic()
+
+def _verificador_conexao_ociosa(segundos):
+    """Faz o ping só em conexões paradas há mais de `segundos` (em vez de em todo checkout)"""
+    def verificar(dbapi_connection, connection_record, connection_proxy):
+        devolvida_em = connection_record.info.get('devolvida_em')
+        if devolvida_em is None or time.monotonic() - devolvida_em < segundos:
+            return
+        estatisticas_pool.incrementar('pings')
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception:
+            # O pool descarta a conexão e tenta outra
+            raise exc.DisconnectionError()
+    return verificar
+
+def _registrar_checkout(dbapi_connection, connection_record, connection_proxy):
+    estatisticas_pool.incrementar('checkouts')
+
+def _tratar_erro(contexto):
+    if contexto.is_disconnect:
+        # O SQLAlchemy invalida o pool inteiro; as próximas requisições abrem conexões novas
+        estatisticas_pool.incrementar('desconexoes')
+
+def _conexao_criada(dbapi_connection, connection_record):
+    estatisticas_pool.incrementar('conexoes_criadas')
+
+def _timeout_por_transacao(timeout):
+    def aplicar(conn):
+        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+    return aplicar
+
+def configurar_engine(app):
+    """Ajusta as opções do engine antes de o Flask-SQLAlchemy criá-lo"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(app.config)
+
+def init_app(app):
+    """Registra os eventos de pool e de erro no engine da aplicação"""
+    with app.app_context():
+        engine = db.engine
+
+    event.listen(engine, 'connect', _conexao_criada)
+    event.listen(engine, 'checkout', _registrar_checkout)
+    event.listen(engine, 'checkin', _registrar_devolucao)
+    event.listen(engine, 'handle_error', _tratar_erro)
+
+    ocioso = app.config.get('DB_PING_OCIOSO', 30)
+    if ocioso and not app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_pre_ping'):
+        event.listen(engine, 'checkout', _verificador_conexao_ociosa(ocioso))
+
+    timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS')
+    if timeout and app.config.get('DB_POOL_MODO') == 'transacao' and engine.dialect.name == 'postgresql':
+        # PgBouncer não repassa parâmetros de inicialização; aplica o timeout em cada transação
+        event.listen(engine, 'begin', _timeout_por_transacao(timeout))
+
+def estatisticas():
+    """Estatísticas do pool do engine da aplicação atual"""
+    return estatisticas_pool.como_dict(db.engine.pool)
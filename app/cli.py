@@ -0,0 +1,170 @@
+import os
+import click
+from flask import current_app
+from app import db
+
+# Dados dos usuários padrão
+USUARIOS_PADRAO = [
+    {
+        'nome_completo': 'Administrativo',
+        'tipo_usuario': 'admin',
+        'email': 'admin@clinicamentalize.com.br',
+        'telefone': '(11) 96331-3561',
+    },
+]
+
+def criar_usuarios_padrao():
+    """Cria os usuários padrão que ainda não existem"""
+    from app.models import Usuario
+    
+    for user_data in USUARIOS_PADRAO:
+        # Verifica se o usuário já existe
+        existing_user = Usuario.query.filter_by(email=user_data['email']).first()
+        
+        if not existing_user:
+            new_user = Usuario(**user_data)
+            new_user.set_senha(os.getenv('DEFAULT_ADMIN_PASSWORD', 'admin123'))
+            db.session.add(new_user)
+            click.echo(f"Usuário criado: {user_data['nome_completo']} ({user_data['email']})")
+        else:
+            click.echo(f"Usuário já existe: {user_data['nome_completo']} ({user_data['email']})")
+    
+    try:
+        db.session.commit()
+        click.echo("Usuários padrão inicializados com sucesso!")
+    except Exception as e:
+        db.session.rollback()
+        raise click.ClickException(f"Erro ao criar usuários padrão: {e}")
+
+@click.command('init-db')
+def init_db():
+    """Inicializa o banco de dados"""
+    db.create_all()
+    click.echo('Banco de dados inicializado.')
+
+@click.command('init-default-users')
+def init_default_users():
+    """Inicializa usuários padrão do sistema"""
+    criar_usuarios_padrao()
+
+@click.command('bootstrap')
+def bootstrap():
+    """Cria as tabelas, as colunas novas e os usuários padrão (nada disso é feito ao importar a aplicação)"""
+    from app.esquema import atualizar_esquema
+    db.create_all()
+    for coluna in atualizar_esquema(db.engine):
+        click.echo(f'Coluna adicionada: {coluna}')
+    criar_usuarios_padrao()
+
+@click.group('assets')
+def assets_cli():
+    """Bibliotecas de terceiros e arquivos estáticos com hash"""
+
+@assets_cli.command('baixar')
+def assets_baixar():
+    """Baixa as versões fixadas das bibliotecas para app/static/vendor"""
+    from app import assets
+    try:
+        baixados, sem_digest = assets.baixar_vendor(current_app.static_folder)
+    except assets.DigestDivergente as erro:
+        # Falha o build: o conteúdo da CDN não é o que foi revisado
+        raise click.ClickException(str(erro))
+    click.echo(f'{len(baixados)} arquivos baixados e conferidos.')
+    if sem_digest:
+        click.echo(f'{len(sem_digest)} arquivos sem SHA-256 fixado continuam na CDN '
+                   '(veja `flask assets digests`).', err=True)
+
+@assets_cli.command('digests')
+def assets_digests():
+    """Mostra o SHA-256 e o SRI atuais de cada arquivo de VENDOR, para revisar e colar em SHA256_VENDOR e INTEGRIDADE_CDN"""
+    from app import assets
+    digests, integridade = assets.calcular_digests()
+    for nome, valores in (('SHA256_VENDOR', digests), ('INTEGRIDADE_CDN', integridade)):
+        click.echo(f'{nome} = {{')
+        for caminho, valor in sorted(valores.items()):
+            click.echo(f"    '{caminho}': '{valor}',")
+        click.echo('}')
+
+@assets_cli.command('build')
+def assets_build():
+    """Gera app/static/dist com nomes por hash e versões .gz/.br"""
+    from app import assets
+    manifesto = assets.construir(current_app.static_folder)
+    if assets.brotli is None:
+        click.echo('Pacote brotli não instalado: apenas versões .gz foram geradas.')
+    click.echo(f'{len(manifesto)} arquivos processados.')
+
+@click.group('templates')
+def templates_cli():
+    """Templates Jinja"""
+
+@templates_cli.command('compilar')
+@click.option('--limpar', is_flag=True, help='Apaga o bytecode existente antes de compilar')
+def templates_compilar(limpar):
+    """Compila todos os templates e grava o bytecode em disco (usado no build)"""
+    from app import precompilacao
+    cache = current_app.jinja_env.bytecode_cache
+    if cache is None:
+        raise click.ClickException('Cache de bytecode desativado (JINJA_BYTECODE_CACHE=false).')
+    if limpar:
+        cache.clear()
+    tempos = precompilacao.carregar_templates(current_app._get_current_object())
+    total = sum(ms for _, ms in tempos)
+    click.echo(f'{len(tempos)} templates compilados em {total:.0f} ms ({cache.directory}).')
+
+@click.command('seed')
+@click.option('--psicologos', type=click.IntRange(min=1), default=20, show_default=True)
+@click.option('--pacientes', type=click.IntRange(min=0), default=1000, show_default=True)
+@click.option('--anos', type=click.IntRange(min=1), default=2, show_default=True,
+              help='Anos de histórico de agendamentos (mais oito semanas no futuro)')
+@click.option('--semente', type=int, default=42, show_default=True, help='Semente do gerador aleatório')
+@click.option('--lote', type=click.IntRange(min=1), default=20000, show_default=True, help='Linhas por INSERT/COPY')
+@click.option('--forcar', is_flag=True, help='Roda mesmo apontando para o banco de produção')
+def seed(psicologos, pacientes, anos, semente, lote, forcar):
+    """Gera dados sintéticos de uma clínica para testes de escala (recusa o banco de produção)"""
+    import time
+    from app import dados_sinteticos
+    if banco_de_producao() and not forcar:
+        raise click.ClickException(
+            f'{db.engine.url.render_as_string(hide_password=True)} é o banco de produção: os dados sintéticos se '
+            'misturariam aos reais. Use --forcar se for isso mesmo.')
+    db.create_all()
+    inicio = time.perf_counter()
+    totais = dados_sinteticos.gerar(psicologos, pacientes, anos, semente=semente, lote=lote, progresso=click.echo)
+    for tabela, total in totais.items():
+        click.echo(f'{tabela}: {total}')
+    click.echo(f'Dados gerados em {time.perf_counter() - inicio:.1f} s.')
+
+def banco_de_producao():
+    """Indica se a aplicação usa o banco de produção: ProductionConfig, ou a DATABASE_URL com FLASK_CONFIG=production"""
+    from sqlalchemy.engine import make_url
+    from config import ProductionConfig
+    if current_app.config.get('BANCO_DE_PRODUCAO'):
+        return True
+    # Ex.: `create_app('development')` num shell do servidor, onde a DATABASE_URL é a de produção
+    url = ProductionConfig.SQLALCHEMY_DATABASE_URI
+    return bool(url) and os.environ.get('FLASK_CONFIG') == 'production' and db.engine.url == make_url(url)
+
+def contexto_shell():
+    """Contexto do shell para facilitar testes e desenvolvimento"""
+    from app.models import Usuario, Psicologo, Paciente, Agendamento, Prontuario, Sessao, HorarioAtendimento
+    return {
+        'db': db,
+        'Usuario': Usuario,
+        'Psicologo': Psicologo,
+        'Paciente': Paciente,
+        'Agendamento': Agendamento,
+        'Prontuario': Prontuario,
+        'Sessao': Sessao,
+        'HorarioAtendimento': HorarioAtendimento
+    }
+
+def init_app(app):
+    """Registra os comandos de manutenção no `flask` CLI"""
+    app.cli.add_command(init_db)
+    app.cli.add_command(init_default_users)
+    app.cli.add_command(bootstrap)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(templates_cli)
+    app.cli.add_command(seed)
+    app.shell_context_processor(contexto_shell)
@@ -0,0 +1,155 @@
+import zlib
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+TIPOS_PADRAO = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml',
+)
+
+class _Gzip:
+    nome = 'gzip'
+
+    def __init__(self, nivel):
+        # wbits=31: cabeçalho e rodapé gzip
+        self._compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, dados):
+        return self._compressor.compress(dados)
+
+    def descarregar(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self):
+        return self._compressor.flush()
+
+class _Brotli:
+    nome = 'br'
+
+    def __init__(self, nivel):
+        self._compressor = brotli.Compressor(quality=nivel)
+
+    def comprimir(self, dados):
+        return self._compressor.process(dados)
+
+    def descarregar(self):
+        return self._compressor.flush()
+
+    def finalizar(self):
+        return self._compressor.finish()
+
+class CompressaoMiddleware:
+    """Comprime respostas WSGI com brotli ou gzip conforme o Accept-Encoding
+
+    Respostas com Content-Length são comprimidas de uma vez (e só acima de
+    `minimo` bytes); respostas em streaming (geradores, sem Content-Length) são
+    comprimidas bloco a bloco, com flush a cada bloco para não atrasar a página.
+    """
+
+    def __init__(self, wsgi_app, nivel=6, nivel_brotli=4, minimo=1024, tipos=TIPOS_PADRAO):
+        self.wsgi_app = wsgi_app
+        self.nivel = nivel
+        self.nivel_brotli = nivel_brotli
+        self.minimo = minimo
+        self.tipos = frozenset(tipos)
+
+    def _escolher_codificacao(self, environ):
+        aceitas = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        if brotli is not None and aceitas['br']:
+            return lambda: _Brotli(self.nivel_brotli)
+        if aceitas['gzip']:
+            return lambda: _Gzip(self.nivel)
+        return None
+
+    def _comprimivel(self, status, headers):
+        if status[:3] in ('204', '206', '304') or int(status[:3]) < 200:
+            return False
+        # Os bytes de um Range se referem à representação original, não à comprimida
+        if 'Content-Range' in headers:
+            return False
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        if headers.get('Content-Type', '').split(';', 1)[0].strip() not in self.tipos:
+            return False
+        tamanho = headers.get('Content-Length')
+        return tamanho is None or int(tamanho) >= self.minimo
+
+    def __call__(self, environ, start_response):
+        fabrica = self._escolher_codificacao(environ)
+        if fabrica is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+
+        estado = {}
+        escritos = []
+
+        def start_response_adiado(status, headers, exc_info=None):
+            if exc_info and estado.get('enviado'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            estado['status'] = status
+            estado['headers'] = Headers(headers)
+            estado['exc_info'] = exc_info
+            return escritos.append
+
+        resultado = self.wsgi_app(environ, start_response_adiado)
+        return self._responder(resultado, estado, escritos, fabrica, start_response)
+
+    def _responder(self, resultado, estado, escritos, fabrica, start_response):
+        try:
+            iterador = iter(resultado)
+            # Geradores só chamam start_response ao produzir o primeiro bloco
+            primeiro = next(iterador, None) if 'status' not in estado else None
+            status, headers = estado['status'], estado['headers']
+            blocos = escritos + ([primeiro] if primeiro is not None else [])
+
+            if not self._comprimivel(status, headers):
+                estado['enviado'] = True
+                start_response(status, headers.to_wsgi_list(), estado['exc_info'])
+                yield from blocos
+                yield from iterador
+                return
+
+            compressor = fabrica()
+            headers['Content-Encoding'] = compressor.nome
+            headers.add('Vary', 'Accept-Encoding')
+            etag = headers.get('ETag')
+            if etag and not etag.startswith('W/'):
+                # A representação comprimida não é idêntica byte a byte à original
+                headers['ETag'] = 'W/' + etag
+
+            if 'Content-Length' in headers:
+                corpo = b''.join(blocos) + b''.join(iterador)
+                corpo = compressor.comprimir(corpo) + compressor.finalizar()
+                headers['Content-Length'] = str(len(corpo))
+                estado['enviado'] = True
+                start_response(status, headers.to_wsgi_list(), estado['exc_info'])
+                yield corpo
+                return
+
+            estado['enviado'] = True
+            start_response(status, headers.to_wsgi_list(), estado['exc_info'])
+            for bloco in blocos:
+                yield compressor.comprimir(bloco) + compressor.descarregar()
+            for bloco in iterador:
+                if bloco:
+                    yield compressor.comprimir(bloco) + compressor.descarregar()
+            yield compressor.finalizar()
+        finally:
+            if hasattr(resultado, 'close'):
+                resultado.close()
+
+def init_app(app):
+    """Envolve o wsgi_app da aplicação com a compressão dinâmica"""
+    if not app.config.get('COMPRESSAO_ATIVA', True):
+        return
+    app.wsgi_app = CompressaoMiddleware(
+        app.wsgi_app,
+        nivel=app.config.get('COMPRESSAO_NIVEL', 6),
+        nivel_brotli=app.config.get('COMPRESSAO_NIVEL_BROTLI', 4),
+        minimo=app.config.get('COMPRESSAO_MINIMO', 1024),
+        tipos=app.config.get('COMPRESSAO_TIPOS') or TIPOS_PADRAO
+    )
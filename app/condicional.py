@@ -0,0 +1,66 @@
+import hashlib
+from flask import current_app, request
+from sqlalchemy import column, func, select, table, update
+from app import db
+
+# Tabelas "leves" (sem importar os modelos) usadas pelos eventos de flush e pelos validadores
+_psicologos = table('psicologos', column('id'), column('usuario_id'), column('versao'))
+_usuarios = table('usuarios', column('id'), column('versao'))
+_prontuarios = table('prontuarios', column('id'), column('psicologo_id'))
+
+def incrementar_versao_psicologo(connection, psicologo_id):
+    """Marca que a agenda, os horários ou os prontuários do psicólogo mudaram"""
+    if psicologo_id is not None:
+        connection.execute(
+            update(_psicologos).where(_psicologos.c.id == psicologo_id).values(versao=_psicologos.c.versao + 1)
+        )
+
+def alteracao_do_psicologo(mapper, connection, target):
+    """Evento de flush de Agendamento, HorarioAtendimento e Prontuario"""
+    incrementar_versao_psicologo(connection, target.psicologo_id)
+    # Registro transferido para outro psicólogo: a versão antiga também muda
+    for anterior in db.inspect(target).attrs.psicologo_id.history.deleted:
+        if anterior != target.psicologo_id:
+            incrementar_versao_psicologo(connection, anterior)
+
+def alteracao_de_sessao(mapper, connection, target):
+    """Evento de flush de Sessao (o psicólogo vem do prontuário)"""
+    psicologo_id = connection.execute(
+        select(_prontuarios.c.psicologo_id).where(_prontuarios.c.id == target.prontuario_id)
+    ).scalar()
+    incrementar_versao_psicologo(connection, psicologo_id)
+
+def versao_psicologo(psicologo_id):
+    """Validador de uma agenda: uma consulta pela chave primária"""
+    return db.session.execute(select(_psicologos.c.versao).where(_psicologos.c.id == psicologo_id)).scalar()
+
+def versao_psicologos():
+    """Validador da lista de psicólogos: quantidade e soma das versões (agenda e cadastro)"""
+    return tuple(db.session.execute(
+        select(func.count(), func.coalesce(func.sum(_psicologos.c.versao), 0), func.coalesce(func.sum(_usuarios.c.versao), 0))
+        .select_from(_psicologos.join(_usuarios, _usuarios.c.id == _psicologos.c.usuario_id))
+    ).one())
+
+def versao_global():
+    """Validador dos dados agregados da clínica: usuários e versões de todos os psicólogos"""
+    usuarios = select(func.count(), func.coalesce(func.sum(_usuarios.c.versao), 0)).select_from(_usuarios)
+    agendas = select(func.coalesce(func.sum(_psicologos.c.versao), 0)).scalar_subquery()
+    return tuple(db.session.execute(usuarios.add_columns(agendas)).one())
+
+def gerar_etag(*partes):
+    return hashlib.sha1(repr(partes).encode()).hexdigest()[:20]
+
+def com_validador(response, etag):
+    """Acrescenta ETag e Cache-Control a uma resposta específica do usuário"""
+    response.set_etag(etag)
+    # private: contém dados do usuário; no-cache: o navegador revalida (e recebe 304) a cada uso
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def nao_modificado(etag):
+    """Resposta 304 se o If-None-Match já tiver o ETag atual, ou None"""
+    # Comparação fraca: a compressão transforma o ETag forte em W/"..."
+    if request.if_none_match.contains_weak(etag):
+        return com_validador(current_app.response_class(status=304), etag)
+    return None
@@ -0,0 +1,167 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from app import db
+from app.contador_consultas import duracao
+
+logger = logging.getLogger(__name__)
+
+# Listas de IN expandidas: (?, ?, ?) e (%(p_1)s, %(p_2)s) viram (...)
+_LISTA_PARAMETROS = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|%s))+\s*\)')
+_EXPLICAVEIS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+def normalizar_sql(sql):
+    return _LISTA_PARAMETROS.sub('(...)', ' '.join(sql.split()))
+
+def formato_parametros(parametros, executemany=False):
+    """Tipos dos parâmetros, sem os valores (que podem conter dados de pacientes)"""
+    if executemany:
+        return {'execucoes': len(parametros), 'parametros': formato_parametros(parametros[0]) if parametros else None}
+    if isinstance(parametros, dict):
+        return {nome: type(valor).__name__ for nome, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        return [type(valor).__name__ for valor in parametros]
+    return type(parametros).__name__
+
+class RegistroConsultasLentas:
+    """Últimas consultas acima do limite, com o plano de execução de cada uma
+
+    Um buffer circular (as mais antigas são descartadas) guarda o SQL
+    normalizado, o formato dos parâmetros, a duração e a rota de origem. O
+    EXPLAIN (EXPLAIN QUERY PLAN no SQLite) roda depois, em uma thread própria,
+    em outra conexão; o plano de um mesmo SQL é reaproveitado. Com StaticPool
+    (SQLite em memória) só existe uma conexão, compartilhada entre as threads:
+    aí o EXPLAIN roda na hora, em um cursor à parte da mesma conexão.
+    """
+
+    def __init__(self, engine, capacidade=100, limite_ms=200, explicar=True):
+        self.engine = engine
+        self.limite_ms = limite_ms
+        self.explicar = explicar
+        self._entradas = deque(maxlen=capacidade)
+        self._planos = OrderedDict()
+        self._capacidade = capacidade
+        self._lock = threading.Lock()
+        self._contador = 0
+        self._executor = None
+        self._pid = None
+        self._pendentes = set()
+        self._conexao_unica = isinstance(engine.pool, StaticPool)
+
+    def _obter_executor(self):
+        # Criado sob demanda em cada processo: threads não sobrevivem ao fork do gunicorn
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+            self._pid = os.getpid()
+            self._pendentes = set()
+        return self._executor
+
+    def registrar(self, sql, parametros, segundos, executemany=False, conexao_dbapi=None):
+        normalizado = normalizar_sql(sql)
+        if has_request_context():
+            rota = f'{request.method} {request.path}'
+            endpoint = request.endpoint
+        else:
+            rota, endpoint = None, None
+        with self._lock:
+            self._contador += 1
+            entrada = {
+                'id': self._contador,
+                'quando': datetime.now().isoformat(timespec='seconds'),
+                'duracao_ms': round(segundos * 1000, 2),
+                'rota': rota,
+                'endpoint': endpoint,
+                'sql': normalizado,
+                'parametros': formato_parametros(parametros, executemany),
+                'plano': self._planos.get(normalizado),
+                'erro_plano': None,
+            }
+            self._entradas.append(entrada)
+            if entrada['plano'] is not None or not self.explicar:
+                return entrada
+            if not normalizado.upper().startswith(_EXPLICAVEIS) or len(self._pendentes) >= self._capacidade:
+                return entrada
+            amostra = parametros[0] if executemany and parametros else parametros
+            explicar_agora = self._conexao_unica and conexao_dbapi is not None
+            if not explicar_agora:
+                futuro = self._obter_executor().submit(self._explicar, sql, amostra, entrada)
+                self._pendentes.add(futuro)
+                futuro.add_done_callback(self._pendentes.discard)
+        if explicar_agora:
+            self._explicar(sql, amostra, entrada, conexao_dbapi)
+        return entrada
+
+    def _explicar(self, sql, parametros, entrada, conexao_dbapi=None):
+        sqlite = self.engine.dialect.name == 'sqlite'
+        explain = ('EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN ') + sql
+        try:
+            if conexao_dbapi is not None:
+                # Cursor direto no driver: sem eventos do engine e sem encerrar a transação em curso
+                cursor = conexao_dbapi.cursor()
+                try:
+                    cursor.execute(explain, parametros or ())
+                    linhas = cursor.fetchall()
+                finally:
+                    cursor.close()
+            else:
+                with self.engine.connect() as conexao:
+                    linhas = conexao.execution_options(consulta_interna=True).exec_driver_sql(
+                        explain, parametros or ()
+                    ).all()
+            # SQLite: (id, pai, _, detalhe); PostgreSQL: uma linha de texto por nó
+            plano = '\n'.join(str(linha[-1] if sqlite else linha[0]) for linha in linhas)
+        except Exception as e:
+            logger.debug('EXPLAIN falhou: %s', e)
+            entrada['erro_plano'] = str(e)
+            return
+        with self._lock:
+            entrada['plano'] = plano
+            self._planos[entrada['sql']] = plano
+            while len(self._planos) > self._capacidade:
+                self._planos.popitem(last=False)
+
+    def aguardar(self, timeout=5):
+        """Espera os EXPLAIN pendentes (usado pelos testes e pela exportação)"""
+        for futuro in list(self._pendentes):
+            futuro.exception(timeout=timeout)
+
+    def entradas(self):
+        """Mais recentes primeiro"""
+        with self._lock:
+            return [dict(entrada) for entrada in reversed(self._entradas)]
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+def _ao_executar(registro):
+    def verificar(conn, cursor, statement, parameters, context, executemany):
+        segundos = duracao(context)
+        if segundos is None or segundos * 1000 < registro.limite_ms:
+            return
+        if context.execution_options.get('consulta_interna'):
+            return
+        registro.registrar(statement, parameters, segundos, executemany, conn.connection.dbapi_connection)
+    return verificar
+
+def init_app(app):
+    """Registra as consultas lentas do engine da aplicação (depois do contador_consultas)"""
+    if not app.config.get('CONSULTAS_LENTAS_ATIVO', True):
+        return
+    with app.app_context():
+        engine = db.engine
+    registro = RegistroConsultasLentas(
+        engine,
+        capacidade=app.config.get('CONSULTAS_LENTAS_CAPACIDADE', 100),
+        limite_ms=app.config.get('CONSULTAS_LENTAS_MS', 200),
+        explicar=app.config.get('CONSULTAS_LENTAS_EXPLAIN', True),
+    )
+    app.extensions['consultas_lentas'] = registro
+    event.listen(engine, 'after_cursor_execute', _ao_executar(registro))
@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger(__name__)
+
+class RegistroConsultas:
+    """Consultas SQL executadas em uma requisição (ou em um bloco `contar`)
+
+    Guarda, por texto de SQL (já com os parâmetros separados pelo driver),
+    quantas vezes ele rodou e com quantos conjuntos de parâmetros diferentes.
+    O mesmo SQL repetido com parâmetros diferentes é o sinal de um N+1: uma
+    consulta por item de uma lista em vez de uma consulta para a lista toda.
+    Um bloco `contar` recebe consultas de qualquer thread, por isso o lock.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+        self._por_sql = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, sql, parametros, segundos):
+        chave = hash(repr(parametros))
+        with self._lock:
+            self.total += 1
+            self.tempo += segundos
+            entrada = self._por_sql.setdefault(sql, [0, set()])
+            entrada[0] += 1
+            entrada[1].add(chave)
+
+    @property
+    def tempo_ms(self):
+        return self.tempo * 1000
+
+    def suspeitas_n_mais_um(self, minimo=5):
+        """[(sql, execuções)] dos SQLs repetidos com pelo menos `minimo` parâmetros diferentes"""
+        with self._lock:
+            por_sql = [(sql, execucoes, len(distintos)) for sql, (execucoes, distintos) in self._por_sql.items()]
+        return sorted(
+            ((sql, execucoes) for sql, execucoes, distintos in por_sql if distintos >= minimo),
+            key=lambda item: -item[1]
+        )
+
+    def resumo(self, minimo_n_mais_um=5):
+        with self._lock:
+            total, tempo_ms = self.total, self.tempo_ms
+        linhas = [f'{total} consultas em {tempo_ms:.1f} ms']
+        for sql, execucoes in self.suspeitas_n_mais_um(minimo_n_mais_um):
+            linhas.append(f'  provável N+1 ({execucoes}x): {" ".join(sql.split())[:200]}')
+        return '\n'.join(linhas)
+
+# Blocos `contar` ativos: usados pelos testes, valem para qualquer thread
+_contadores = []
+_lock_contadores = threading.Lock()
+
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_consulta = time.perf_counter()
+
+def duracao(context):
+    """Segundos desde o início da execução (para outros eventos after_cursor_execute do engine)"""
+    inicio = getattr(context, '_inicio_consulta', None)
+    return None if inicio is None else time.perf_counter() - inicio
+
+def _depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    segundos = duracao(context)
+    if segundos is None:
+        return
+    registro = g.get('_consultas') if has_app_context() else None
+    if registro is not None:
+        registro.registrar(statement, parameters, segundos)
+    if _contadores:
+        with _lock_contadores:
+            contadores = list(_contadores)
+        for contador in contadores:
+            contador.registrar(statement, parameters, segundos)
+
+@contextmanager
+def contar():
+    """Registra todas as consultas executadas dentro do bloco
+
+        with contar() as consultas:
+            client.get('/psicologo/prontuarios')
+        assert consultas.total <= 10
+    """
+    registro = RegistroConsultas()
+    with _lock_contadores:
+        _contadores.append(registro)
+    try:
+        yield registro
+    finally:
+        with _lock_contadores:
+            _contadores.remove(registro)
+
+def _iniciar_requisicao():
+    g._consultas = RegistroConsultas()
+
+def _server_timing(response):
+    registro = g.get('_consultas')
+    if registro is not None:
+        # Consultas feitas depois deste ponto (páginas transmitidas) entram só no log
+        response.headers.add('Server-Timing', f'db;dur={registro.tempo_ms:.1f};desc="{registro.total} consultas"')
+    return response
+
+def _verificar_limites(app):
+    def verificar(exc):
+        registro = g.pop('_consultas', None)
+        if registro is None or not registro.total:
+            return
+        minimo = app.config.get('CONSULTAS_N_MAIS_UM_MINIMO', 5)
+        suspeitas = registro.suspeitas_n_mais_um(minimo)
+        if (suspeitas or registro.total > app.config.get('CONSULTAS_LIMITE_QUANTIDADE', 30)
+                or registro.tempo_ms > app.config.get('CONSULTAS_LIMITE_TEMPO_MS', 500)):
+            logger.warning('%s %s (%s): %s', request.method, request.path, request.endpoint, registro.resumo(minimo))
+    return verificar
+
+def init_app(app):
+    """Conta as consultas e o tempo de banco de cada requisição"""
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _antes_de_executar)
+    event.listen(engine, 'after_cursor_execute', _depois_de_executar)
+
+    app.before_request(_iniciar_requisicao)
+    if app.config.get('CONSULTAS_SERVER_TIMING', False):
+        app.after_request(_server_timing)
+    app.teardown_request(_verificar_limites(app))
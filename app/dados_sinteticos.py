@@ -0,0 +1,229 @@
+import csv
+import io
+import random
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import func, select, text
+from app import db
+from app.auth.senhas import gerar_hash
+from app.models import Usuario, Psicologo, Paciente, Agendamento, Prontuario, Sessao, HorarioAtendimento
+
+NOMES = ['Ana', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Daniela', 'Eduardo', 'Fernanda', 'Gabriel', 'Helena',
+         'Igor', 'Juliana', 'Lucas', 'Larissa', 'Marcos', 'Mariana', 'Natália', 'Otávio', 'Patrícia', 'Paulo',
+         'Rafael', 'Renata', 'Rodrigo', 'Sofia', 'Thiago', 'Vanessa', 'Vinícius', 'Letícia', 'Gustavo', 'Júlia']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa',
+              'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas']
+
+# Turnos semanais típicos (hora de início e de fim de cada bloco)
+TURNOS = [((8, 12), (13, 18)), ((9, 13), (14, 19)), ((13, 21),), ((8, 12),), ((14, 20),), ((8, 12), (14, 18))]
+
+TEMAS = ['ansiedade no trabalho', 'relação com a família', 'qualidade do sono', 'autoestima', 'luto',
+         'conflitos no relacionamento', 'rotina de estudos', 'crises de pânico', 'mudança de cidade', 'limites pessoais']
+EVOLUCOES = ['Paciente relata melhora desde a última sessão.', 'Sem mudanças significativas no período.',
+             'Retomadas as técnicas de respiração combinadas.', 'Paciente trouxe registros da semana.',
+             'Sessão mais difícil, com momentos de choro.', 'Definidas metas para as próximas semanas.']
+OBSERVACOES = ['Prefere atendimento no início do horário.', 'Solicitou recibo para reembolso.',
+               'Primeira consulta: chegar 10 minutos antes.', 'Remarcado a pedido do paciente.']
+
+class _Lote:
+    """Linhas de uma tabela acumuladas em memória e gravadas em lote
+
+    No PostgreSQL a gravação usa COPY (CSV pelo psycopg2); nos demais bancos, um
+    INSERT com executemany. Os ids são gerados aqui, então as linhas de tabelas
+    diferentes podem se referenciar sem ler nada de volta do banco.
+    """
+
+    def __init__(self, conexao, modelo, colunas, tamanho):
+        self.conexao = conexao
+        self.tabela = modelo.__table__
+        self.colunas = colunas
+        self.tamanho = tamanho
+        self.linhas = []
+        self.total = 0
+        self.proximo_id = (conexao.execute(select(func.max(self.tabela.c.id))).scalar() or 0) + 1
+
+    def novo_id(self):
+        self.proximo_id += 1
+        return self.proximo_id - 1
+
+    def adicionar(self, *valores):
+        self.linhas.append(valores)
+        self.total += 1
+
+    def cheio(self):
+        return len(self.linhas) >= self.tamanho
+
+    def gravar(self):
+        if not self.linhas:
+            return
+        if self.conexao.dialect.name == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(self.linhas)
+            buffer.seek(0)
+            cursor = self.conexao.connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY {self.tabela.name} ({', '.join(self.colunas)}) FROM STDIN WITH (FORMAT csv)",
+                                   buffer)
+            finally:
+                cursor.close()
+        else:
+            self.conexao.execute(self.tabela.insert(), [dict(zip(self.colunas, linha)) for linha in self.linhas])
+        self.linhas = []
+
+    def ajustar_sequencia(self):
+        """Sequência do PostgreSQL alinhada aos ids explícitos (os próximos INSERTs não colidem)"""
+        if self.conexao.dialect.name == 'postgresql' and self.total:
+            self.conexao.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{self.tabela.name}', 'id'), (SELECT MAX(id) FROM {self.tabela.name}))"
+            ))
+
+def _nome(aleatorio):
+    return f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}'
+
+def _email(nome, usuario_id):
+    primeiro, ultimo = nome.split()[0], nome.split()[-1]
+    normalizado = f'{primeiro}.{ultimo}'.lower().translate(str.maketrans('áéíóúâêôãõç', 'aeiouaeoaoc'))
+    # O id garante e-mails únicos também ao rodar o seed mais de uma vez no mesmo banco
+    return f'{normalizado}.{usuario_id}@exemplo.com.br'
+
+def _status(aleatorio, data_hora, agora):
+    """Mistura de status parecida com a de produção"""
+    sorteio = aleatorio.random()
+    if data_hora < agora:
+        if sorteio < 0.78:
+            return 'realizado'
+        return 'cancelado' if sorteio < 0.90 else 'ausencia'
+    if sorteio < 0.08:
+        return 'cancelado'
+    # Confirmações se concentram na semana da consulta
+    limite = 0.65 if data_hora - agora < timedelta(days=7) else 0.12
+    return 'confirmado' if sorteio < 0.08 + limite else 'agendado'
+
+def gerar(psicologos, pacientes, anos, semente=42, lote=20000, senha='senha123', progresso=None):
+    """Gera uma clínica sintética determinística e devolve a quantidade de linhas por tabela
+
+    Cada psicólogo tem turnos semanais (HorarioAtendimento) divididos em horários
+    de uma hora. Cada horário é ocupado por uma sequência de tratamentos: um
+    paciente do psicólogo, semanal ou quinzenal, por algumas semanas ou anos,
+    seguido de um intervalo. Assim não há dois agendamentos no mesmo horário.
+    O período vai de `anos` atrás até oito semanas no futuro; consultas
+    realizadas ganham uma Sessao no prontuário do paciente.
+
+    Os pacientes são distribuídos entre os psicólogos; o volume de agendamentos
+    depende principalmente de psicólogos x anos (cerca de 1.500 por psicólogo
+    por ano: 700 psicólogos em 5 anos dão uns 5 milhões). Tudo é gravado em uma
+    única transação.
+    """
+    aleatorio = random.Random(semente)
+    avisar = progresso or (lambda mensagem: None)
+    senha_hash = gerar_hash(senha)
+    agora = datetime.now().replace(minute=0, second=0, microsecond=0)
+    hoje = date.today()
+    inicio = hoje - timedelta(days=365 * anos)
+    inicio -= timedelta(days=inicio.weekday())  # segunda-feira: semana + dia_semana dá a data
+    semanas = (hoje - inicio).days // 7 + 8
+
+    with db.engine.begin() as conexao:
+        usuarios = _Lote(conexao, Usuario, ['id', 'nome_completo', 'email', 'senha_hash', 'telefone', 'tipo_usuario',
+                                            'ativo', 'data_criacao', 'versao'], lote)
+        tabela_psicologos = _Lote(conexao, Psicologo, ['id', 'usuario_id', 'versao'], lote)
+        tabela_pacientes = _Lote(conexao, Paciente, ['id', 'usuario_id', 'psicologo_id'], lote)
+        horarios = _Lote(conexao, HorarioAtendimento, ['id', 'psicologo_id', 'dia_semana', 'hora_inicio', 'hora_fim',
+                                                       'ativo'], lote)
+        prontuarios = _Lote(conexao, Prontuario, ['id', 'paciente_id', 'psicologo_id', 'data_criacao',
+                                                  'observacoes_gerais', 'recorrencia_ativa', 'recorrencia_dia_semana',
+                                                  'recorrencia_horario'], lote)
+        agendamentos = _Lote(conexao, Agendamento, ['id', 'paciente_id', 'psicologo_id', 'data_hora', 'status',
+                                                    'observacoes', 'data_criacao', 'data_atualizacao'], lote)
+        sessoes = _Lote(conexao, Sessao, ['id', 'prontuario_id', 'agendamento_id', 'data_sessao', 'anotacoes',
+                                          'proxima_sessao', 'data_criacao'], lote)
+
+        def novo_usuario(tipo):
+            usuario_id = usuarios.novo_id()
+            nome = _nome(aleatorio)
+            criado = datetime.combine(inicio - timedelta(days=aleatorio.randint(0, 365)), time(aleatorio.randint(8, 20)))
+            usuarios.adicionar(usuario_id, nome, _email(nome, usuario_id), senha_hash,
+                               f'(11) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}',
+                               tipo, aleatorio.random() > 0.02, criado, 1)
+            return usuario_id
+
+        # Cadastros: psicólogos e pacientes (com ou sem psicólogo responsável)
+        ids_psicologos = []
+        for _ in range(psicologos):
+            psicologo_id = tabela_psicologos.novo_id()
+            tabela_psicologos.adicionar(psicologo_id, novo_usuario('psicologo'), 1)
+            ids_psicologos.append(psicologo_id)
+        carteiras = {psicologo_id: [] for psicologo_id in ids_psicologos}
+        for i in range(pacientes):
+            paciente_id = tabela_pacientes.novo_id()
+            psicologo_id = ids_psicologos[i % psicologos]
+            responsavel = psicologo_id if aleatorio.random() < 0.7 else None
+            tabela_pacientes.adicionar(paciente_id, novo_usuario('paciente'), responsavel)
+            carteiras[psicologo_id].append(paciente_id)
+        for tabela in (usuarios, tabela_psicologos, tabela_pacientes):
+            tabela.gravar()
+        avisar(f'{usuarios.total} usuários gravados.')
+
+        def descarregar(forcar=False):
+            # Ordem das chaves estrangeiras: prontuários e agendamentos antes das sessões
+            if forcar or agendamentos.cheio() or sessoes.cheio() or prontuarios.cheio():
+                for tabela in (horarios, prontuarios, agendamentos, sessoes):
+                    tabela.gravar()
+
+        for numero, psicologo_id in enumerate(ids_psicologos, 1):
+            # Turnos semanais: 4 ou 5 dias úteis, às vezes o sábado
+            dias = sorted(aleatorio.sample(range(5), aleatorio.choice([4, 5])))
+            if aleatorio.random() < 0.15:
+                dias.append(5)
+            vagas = []
+            for dia in dias:
+                for hora_inicio, hora_fim in aleatorio.choice(TURNOS):
+                    horarios.adicionar(horarios.novo_id(), psicologo_id, dia, time(hora_inicio), time(hora_fim), True)
+                    vagas += [(dia, hora) for hora in range(hora_inicio, hora_fim)]
+
+            carteira = carteiras[psicologo_id]
+            novos = iter(carteira)
+            prontuario_de = {}
+            for dia, hora in vagas if carteira else []:
+                semana = aleatorio.randint(0, 4)
+                while semana < semanas:
+                    # Pacientes novos primeiro; depois, retornos de quem já foi atendido
+                    paciente_id = next(novos, None) or aleatorio.choice(carteira)
+                    duracao = 4 + int(aleatorio.expovariate(1 / 26))
+                    passo = 2 if aleatorio.random() < 0.2 else 1
+                    fim = min(semana + duracao, semanas)
+                    primeira = datetime.combine(inicio + timedelta(weeks=semana, days=dia), time(hora))
+                    if paciente_id not in prontuario_de:
+                        prontuario_de[paciente_id] = [prontuarios.novo_id(), primeira, None, None]
+                    prontuario = prontuario_de[paciente_id]
+                    if fim == semanas:
+                        # Tratamento em andamento: recorrência ativa no prontuário
+                        prontuario[2], prontuario[3] = dia, time(hora)
+                    for s in range(semana, fim, passo):
+                        data_hora = datetime.combine(inicio + timedelta(weeks=s, days=dia), time(hora))
+                        status = _status(aleatorio, data_hora, agora)
+                        criado = min(data_hora - timedelta(days=aleatorio.randint(1, 30)), agora)
+                        agendamento_id = agendamentos.novo_id()
+                        agendamentos.adicionar(agendamento_id, paciente_id, psicologo_id, data_hora, status,
+                                               aleatorio.choice(OBSERVACOES) if aleatorio.random() < 0.03 else None,
+                                               criado, data_hora if data_hora < agora else criado)
+                        if status == 'realizado':
+                            proxima = data_hora + timedelta(weeks=passo) if s + passo < fim else None
+                            anotacoes = (f'Tema: {aleatorio.choice(TEMAS)}. {aleatorio.choice(EVOLUCOES)} '
+                                         f'{aleatorio.choice(EVOLUCOES)}')
+                            sessoes.adicionar(sessoes.novo_id(), prontuario[0], agendamento_id, data_hora,
+                                              anotacoes, proxima, data_hora + timedelta(hours=1))
+                    semana = fim + aleatorio.randint(0, 6)
+
+            for paciente_id, (prontuario_id, primeira, dia, hora) in prontuario_de.items():
+                prontuarios.adicionar(prontuario_id, paciente_id, psicologo_id, primeira,
+                                      f'Queixa inicial: {aleatorio.choice(TEMAS)}.', dia is not None, dia, hora)
+            descarregar()
+            if numero % 10 == 0 or numero == psicologos:
+                avisar(f'{numero}/{psicologos} psicólogos: {agendamentos.total} agendamentos.')
+        descarregar(forcar=True)
+
+        tabelas = (usuarios, tabela_psicologos, tabela_pacientes, horarios, prontuarios, agendamentos, sessoes)
+        for tabela in tabelas:
+            tabela.ajustar_sequencia()
+    return {tabela.tabela.name: tabela.total for tabela in tabelas}
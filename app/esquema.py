@@ -0,0 +1,30 @@
+import logging
+from sqlalchemy import inspect
+
+logger = logging.getLogger(__name__)
+
+# Colunas acrescentadas a tabelas que já existem em produção. O db.create_all()
+# só cria tabelas novas, então bancos antigos precisam destes ALTERs (idempotentes).
+COLUNAS_ADICIONADAS = [
+    ('usuarios', 'versao', 'INTEGER NOT NULL DEFAULT 1'),
+    ('psicologos', 'versao', 'INTEGER NOT NULL DEFAULT 1'),
+]
+
+def atualizar_esquema(engine):
+    """Acrescenta as colunas de COLUNAS_ADICIONADAS que faltam; retorna as que foram criadas"""
+    criadas = []
+    with engine.begin() as conexao:
+        inspetor = inspect(conexao)
+        for tabela, coluna, definicao in COLUNAS_ADICIONADAS:
+            if not inspetor.has_table(tabela):
+                # Banco novo: o create_all cria a tabela já com a coluna
+                continue
+            if coluna in {c['name'] for c in inspetor.get_columns(tabela)}:
+                continue
+            # IF NOT EXISTS no PostgreSQL cobre dois builds rodando ao mesmo tempo; o SQLite não tem
+            se_nao_existir = 'IF NOT EXISTS ' if engine.dialect.name == 'postgresql' else ''
+            conexao.exec_driver_sql(f'ALTER TABLE {tabela} ADD COLUMN {se_nao_existir}{coluna} {definicao}')
+            criadas.append(f'{tabela}.{coluna}')
+    for nome in criadas:
+        logger.info('Coluna %s adicionada', nome)
+    return criadas
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import before_render_template, current_app, g, template_rendered
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from app import rastreamento
+
+class CacheFragmentosLRU:
+    """Fragmentos de template renderizados, com número máximo de entradas"""
+
+    def __init__(self, capacidade=512):
+        self.capacidade = capacidade
+        self._fragmentos = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            fragmento = self._fragmentos.get(chave)
+            if fragmento is None:
+                self.falhas += 1
+                return None
+            self._fragmentos.move_to_end(chave)
+            self.acertos += 1
+            return fragmento
+
+    def guardar(self, chave, fragmento):
+        with self._lock:
+            self._fragmentos[chave] = fragmento
+            self._fragmentos.move_to_end(chave)
+            if len(self._fragmentos) > self.capacidade:
+                self._fragmentos.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._fragmentos.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'fragmentos_em_cache': len(self._fragmentos),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / total, 3) if total else 0.0
+            }
+
+class CacheFragmentosExtension(Extension):
+    """Tag {% cache 'nome', parte1, parte2 %}...{% endcache %}
+
+    A chave é formada pelo template, pela linha da tag e pelas partes informadas
+    (papel/usuário e versão dos dados); mudar qualquer parte gera um fragmento novo.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [nodes.Const(f'{parser.name}:{lineno}'), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            partes.append(parser.parse_expression())
+        corpo = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_renderizar', [nodes.Tuple(partes, 'load')]),
+                               [], [], corpo).set_lineno(lineno)
+
+    def _renderizar(self, chave, caller):
+        cache = current_app.extensions.get('cache_fragmentos')
+        if cache is None:
+            return caller()
+        with rastreamento.span('cache fragmento', 'cache', chave=str(chave[0])) as span:
+            fragmento = cache.obter(chave)
+            span.definir(resultado='falha' if fragmento is None else 'acerto')
+        if fragmento is None:
+            fragmento = caller()
+            cache.guardar(chave, fragmento)
+        return fragmento
+
+def em_cache(chave, calcular):
+    """Valor calculado guardado no mesmo cache dos fragmentos (a chave deve incluir a versão dos dados)"""
+    cache = current_app.extensions.get('cache_fragmentos')
+    if cache is None:
+        return calcular()
+    with rastreamento.span('cache dados', 'cache', chave=str(chave[0])) as span:
+        valor = cache.obter(chave)
+        span.definir(resultado='falha' if valor is None else 'acerto')
+    if valor is None:
+        valor = calcular()
+        cache.guardar(chave, valor)
+    return valor
+
+def chave_usuario():
+    """Parte da chave de fragmentos que identifica papel, usuário e versão do cadastro"""
+    if not current_user.is_authenticated:
+        return ('anonimo',)
+    return (current_user.tipo_usuario, current_user.id, current_user.versao)
+
+class TemposTemplates:
+    """Tempo de renderização por template (inclui os templates herdados e incluídos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tempos = {}
+
+    def registrar(self, nome, segundos):
+        with self._lock:
+            quantidade, total, maximo = self._tempos.get(nome, (0, 0.0, 0.0))
+            self._tempos[nome] = (quantidade + 1, total + segundos, max(maximo, segundos))
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                nome: {
+                    'renderizacoes': quantidade,
+                    'media_ms': round(total / quantidade * 1000, 3),
+                    'maximo_ms': round(maximo * 1000, 3)
+                }
+                for nome, (quantidade, total, maximo) in sorted(self._tempos.items())
+            }
+
+def _inicio_renderizacao(app, template, context, **extra):
+    g.setdefault('_renderizacoes', []).append(time.perf_counter())
+
+def _fim_renderizacao(app, template, context, **extra):
+    inicios = g.get('_renderizacoes')
+    if inicios:
+        segundos = time.perf_counter() - inicios.pop()
+        app.extensions['tempos_templates'].registrar(template.name, segundos)
+        if not inicios:
+            # Só o template mais externo entra no total da requisição (log de requisições)
+            g._tempo_templates = g.get('_tempo_templates', 0.0) + segundos
+
+def init_app(app):
+    """Registra a tag {% cache %} e a medição do tempo de renderização"""
+    app.jinja_env.add_extension(CacheFragmentosExtension)
+    app.jinja_env.globals['chave_usuario'] = chave_usuario
+    if app.config.get('FRAGMENTOS_CACHE_ATIVO', True):
+        app.extensions['cache_fragmentos'] = CacheFragmentosLRU(app.config.get('FRAGMENTOS_CACHE_TAMANHO', 512))
+
+    app.extensions['tempos_templates'] = TemposTemplates()
+    before_render_template.connect(_inicio_renderizacao, app)
+    template_rendered.connect(_fim_renderizacao, app)
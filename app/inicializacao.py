@@ -0,0 +1,51 @@
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class FasesInicializacao:
+    """Cronometra as fases do create_app para acompanhar o tempo de cold start"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fim = None
+        self.fases = []
+
+    @contextmanager
+    def fase(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases.append((nome, (time.perf_counter() - inicio) * 1000))
+
+    @property
+    def total_ms(self):
+        return ((self.fim or time.perf_counter()) - self.inicio) * 1000
+
+    def resumo(self):
+        fases = ', '.join(f'{nome} {ms:.1f}' for nome, ms in self.fases)
+        return f'{self.total_ms:.1f} ms ({fases})'
+
+    def finalizar(self, app):
+        """Registra as fases na aplicação e avisa se o orçamento de inicialização foi excedido"""
+        self.fim = time.perf_counter()
+        app.extensions['inicializacao'] = self
+        orcamento = app.config.get('INICIALIZACAO_ORCAMENTO_MS')
+        if orcamento and self.total_ms > orcamento:
+            logger.warning('Inicialização acima do orçamento de %d ms: %s', orcamento, self.resumo())
+        else:
+            logger.info('Aplicação inicializada em %s', self.resumo())
+
+def configurar_logging(nivel='INFO', formato='texto'):
+    """Configura o logging dos pontos de entrada (wsgi.py, app.py) se ninguém o fez antes
+
+    `formato` é 'texto' ou 'json' (uma linha JSON por registro). Em ambos a
+    escrita em stderr é feita por uma thread, fora do caminho das requisições.
+    """
+    if not logging.getLogger().handlers:
+        from app import log_estruturado
+        log_estruturado.configurar(nivel, formato)
+        # O Alembic registra cada plugin em INFO ao ser importado
+        logging.getLogger('alembic').setLevel(logging.WARNING)
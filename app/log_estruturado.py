@@ -0,0 +1,226 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+from sqlalchemy import inspect
+
+logger = logging.getLogger('app.requisicoes')
+
+_REQUEST_ID_VALIDO = re.compile(r'^[\w.-]{1,64}$')
+FORMATO_TEXTO = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+# Atributos de todo LogRecord; o que sobrar veio de `extra=` e vai para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class FormatadorJSON(logging.Formatter):
+    """Um objeto JSON por linha, com os campos passados em `extra=`"""
+
+    def format(self, record):
+        dados = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith('_'):
+                dados[chave] = valor
+        if record.exc_info:
+            dados['excecao'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados['excecao'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+class FiltroRequisicao(logging.Filter):
+    """Acrescenta o id da requisição atual a todo registro feito durante ela"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id') and has_request_context():
+            request_id = g.get('_request_id')
+            if request_id is not None:
+                record.request_id = request_id
+        return True
+
+class _Escritor(QueueListener):
+    def enqueue_sentinel(self):
+        # Ao encerrar, espera espaço na fila para o sinal de parada (a fila pode estar cheia)
+        self.queue.put(self._sentinel, timeout=5)
+
+class HandlerFila(QueueHandler):
+    """QueueHandler que nunca bloqueia quem registra
+
+    A formatação acontece na thread que registra; a escrita no destino (stderr)
+    fica com a thread de um QueueListener. Com a fila cheia (saída lenta ou
+    travada) o registro é descartado e contado, em vez de segurar o worker.
+    """
+
+    def __init__(self, destino, capacidade=10000):
+        super().__init__(queue.Queue(capacidade))
+        self.destino = destino
+        self.capacidade = capacidade
+        self.descartados = 0
+        self._listener = None
+        self._pid = None
+        self._lock_inicio = threading.Lock()
+
+    def _iniciar(self):
+        # A thread de escrita não sobrevive ao fork do gunicorn: cada processo cria a sua (e a sua fila)
+        with self._lock_inicio:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.capacidade)
+            self._listener = _Escritor(self.queue, self.destino, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.parar)
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._iniciar()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def parar(self):
+        """Escreve o que ainda está na fila e encerra a thread"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+def configurar(nivel='INFO', formato='texto', capacidade=10000):
+    """Instala no logger raiz a fila não bloqueante, escrevendo em stderr (texto ou JSON)"""
+    destino = logging.StreamHandler(sys.stderr)
+    destino.setFormatter(logging.Formatter('%(message)s'))
+    handler = HandlerFila(destino, capacidade)
+    handler.setFormatter(FormatadorJSON() if formato == 'json' else logging.Formatter(FORMATO_TEXTO))
+    handler.addFilter(FiltroRequisicao())
+    raiz = logging.getLogger()
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel)
+    return handler
+
+class _ContadorBytes:
+    """Conta os bytes de uma resposta transmitida à medida que são enviados
+
+    O teardown da requisição acontece antes do último bloco (ou antes do
+    primeiro, sem stream_with_context): ele deixa os campos aqui e a linha de
+    log sai quando a transmissão termina ou é interrompida.
+    """
+
+    def __init__(self, partes):
+        self.partes = partes
+        self.total = 0
+        self.campos = None
+        self.inicio = None
+
+    def __iter__(self):
+        for parte in self.partes:
+            if isinstance(parte, str):
+                # Codifica aqui o que o Werkzeug codificaria depois, para contar bytes e não caracteres
+                parte = parte.encode('utf-8')
+            self.total += len(parte)
+            yield parte
+        self._registrar()
+
+    def close(self):
+        try:
+            if hasattr(self.partes, 'close'):
+                self.partes.close()
+        finally:
+            self._registrar()
+
+    def _registrar(self):
+        if self.campos is not None:
+            campos, self.campos = self.campos, None
+            campos['bytes'] = self.total
+            _emitir(campos, self.inicio)
+
+def _iniciar_requisicao():
+    g._inicio_log = time.perf_counter()
+    g._tempo_templates = 0.0
+    # Reaproveita o id do proxy (ou do cliente) para correlacionar os logs, se tiver um formato aceitável
+    recebido = request.headers.get('X-Request-ID', '')
+    g._request_id = recebido if _REQUEST_ID_VALIDO.match(recebido) else uuid.uuid4().hex
+
+def _registrar_resposta(response):
+    response.headers['X-Request-ID'] = g._request_id
+    g._status_log = response.status_code
+    if response.content_length is None and response.is_streamed and not response.direct_passthrough:
+        contador = _ContadorBytes(response.response)
+        response.response = contador
+        # Referência fraca: o g não pode manter viva a transmissão (e o contexto que ela guarda)
+        g._bytes_log = weakref.ref(contador)
+    else:
+        g._bytes_log = response.content_length
+    return response
+
+def anotar_perfil(usuario):
+    """Guarda o tipo do usuário enquanto ele está carregado (ao carregar a identidade e no login)"""
+    if has_request_context():
+        g._perfil_log = usuario.tipo_usuario
+
+def _perfil():
+    # Só usa o usuário se a requisição já o carregou: o log não faz consultas
+    tipo = g.pop('_perfil_log', None)
+    usuario = g.get('_login_user')
+    if usuario is None:
+        return None
+    if not usuario.is_authenticated:
+        return 'anonimo'
+    # Depois de um commit o usuário está expirado e ler tipo_usuario faria um SELECT
+    return tipo or inspect(usuario).dict.get('tipo_usuario')
+
+def _emitir(campos, inicio):
+    campos['total_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    logger.info('%s %s %s %.1f ms', campos['metodo'], campos['rota'], campos['status'], campos['total_ms'],
+                extra=campos)
+
+def _registrar(exc):
+    inicio = g.pop('_inicio_log', None)
+    if inicio is None:
+        return
+    status = g.pop('_status_log', 500)
+    if exc is not None:
+        status = 500
+    tamanho = g.pop('_bytes_log', None)
+    # Roda antes do teardown do contador_consultas (registrado antes), que descarta g._consultas
+    consultas = g.get('_consultas')
+    campos = {
+        'request_id': g.get('_request_id'),
+        'metodo': request.method,
+        'rota': request.path,
+        'endpoint': request.endpoint,
+        'perfil': _perfil(),
+        'status': status,
+        'total_ms': None,
+        'db_ms': round(consultas.tempo_ms, 2) if consultas is not None else None,
+        'consultas': consultas.total if consultas is not None else None,
+        'templates_ms': round(g.pop('_tempo_templates', 0.0) * 1000, 2),
+        'bytes': tamanho,
+    }
+    if isinstance(tamanho, weakref.ref):
+        contador = tamanho()
+        if contador is not None:
+            contador.campos, contador.inicio = campos, inicio
+            return
+        campos['bytes'] = None
+    _emitir(campos, inicio)
+
+def init_app(app):
+    """Uma linha de log por requisição, com os tempos de banco e de templates (depois do contador_consultas)"""
+    if not app.config.get('LOG_REQUISICOES', True):
+        return
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_registrar_resposta)
+    app.teardown_request(_registrar)
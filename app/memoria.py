@@ -0,0 +1,222 @@
+import gc
+import os
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from flask import request
+from sqlalchemy.orm import Session
+from app.metricas import rss_bytes
+
+# Ruído do próprio tracemalloc e do import de módulos
+_FILTROS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+def memoria_processo():
+    """RSS, PSS e memória privada do processo em bytes (/proc/self/smaps_rollup)
+
+    Com preload_app os workers compartilham as páginas do master; a memória
+    privada é o que cada worker a mais realmente custa.
+    """
+    campos = {}
+    try:
+        with open('/proc/self/smaps_rollup') as arquivo:
+            for linha in arquivo:
+                partes = linha.split()
+                if len(partes) == 3 and partes[2] == 'kB':
+                    campos[partes[0].rstrip(':')] = int(partes[1]) * 1024
+    except OSError:
+        return {'rss': rss_bytes(), 'pss': None, 'privada': None}
+    return {
+        'rss': campos.get('Rss'),
+        'pss': campos.get('Pss'),
+        'privada': campos.get('Private_Clean', 0) + campos.get('Private_Dirty', 0),
+    }
+
+def contar_tipos():
+    """Quantidade de objetos rastreados pelo gc por tipo (como o objgraph.typestats)"""
+    # Conta por tipo antes de montar os nomes: um texto por tipo, não por objeto
+    return Counter({f'{tipo.__module__}.{tipo.__qualname__}': quantidade
+                    for tipo, quantidade in Counter(map(type, gc.get_objects())).items()})
+
+def mapas_identidade(limite=10):
+    """Sessões do SQLAlchemy vivas no processo, das que têm mais objetos no identity map"""
+    sessoes = []
+    for objeto in gc.get_objects():
+        if isinstance(objeto, Session):
+            classes = Counter(type(instancia).__name__ for instancia in objeto.identity_map.values())
+            sessoes.append({
+                'sessao': f'{type(objeto).__name__} 0x{id(objeto):x}',
+                'objetos': sum(classes.values()),
+                'novos': len(objeto.new),
+                'classes': classes.most_common(5),
+            })
+    sessoes.sort(key=lambda sessao: sessao['objetos'], reverse=True)
+    return sessoes[:limite]
+
+class PerfilMemoria:
+    """Snapshots do tracemalloc deste processo: uma base, uma captura posterior e a diferença
+
+    O tracemalloc só é ligado ao criar a base e é desligado em `parar()`: enquanto
+    está ligado, cada alocação guarda `frames` quadros de pilha (mais memória e
+    CPU). A captura pode ser feita à mão ou automaticamente depois de N requisições;
+    a automática roda numa thread à parte, fora da requisição que atingiu o alvo.
+    """
+
+    def __init__(self, frames=5, top=25):
+        self.frames = frames
+        self.top = top
+        self.base = None
+        self.atual = None
+        self.alvo = None
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+        self._ligou_tracemalloc = False
+        # Incrementada por iniciar/parar: uma captura em andamento de uma base anterior é descartada
+        self._geracao = 0
+        self._thread = None
+
+    @property
+    def ativo(self):
+        return self.base is not None
+
+    def _capturar(self, requisicoes):
+        gc.collect()
+        atual, pico = tracemalloc.get_traced_memory()
+        return {
+            'snapshot': tracemalloc.take_snapshot().filter_traces(_FILTROS),
+            'quando': datetime.now().isoformat(timespec='seconds'),
+            'requisicoes': requisicoes,
+            'processo': memoria_processo(),
+            'rastreada': atual,
+            'pico_rastreado': pico,
+            'tipos': contar_tipos(),
+        }
+
+    def iniciar(self, requisicoes=None):
+        """Liga o tracemalloc (se preciso) e grava a base; com `requisicoes`, captura depois delas"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._ligou_tracemalloc = True
+            self._geracao += 1
+            self.requisicoes = 0
+            self.base = self._capturar(0)
+            self.atual = None
+            self.alvo = requisicoes or None
+
+    def capturar(self):
+        with self._lock:
+            if self.base is None:
+                raise RuntimeError('Crie a base antes de capturar')
+            self.atual = self._capturar(self.requisicoes)
+            self.alvo = None
+
+    def contar_requisicao(self):
+        """Conta a requisição; ao atingir o alvo só agenda a captura, que roda em outra thread"""
+        with self._lock:
+            if self.base is None:
+                return
+            self.requisicoes += 1
+            if self.alvo is None or self.requisicoes < self.alvo:
+                return
+            self.alvo = None
+            self._thread = threading.Thread(target=self._captura_agendada, args=(self._geracao, self.requisicoes),
+                                            name='memoria-captura', daemon=True)
+            thread = self._thread
+        thread.start()
+
+    def _captura_agendada(self, geracao, requisicoes):
+        # gc.collect e take_snapshot fora do lock: as requisições seguintes só esperam o contador
+        try:
+            dados = self._capturar(requisicoes)
+        except RuntimeError:
+            # tracemalloc desligado por parar() no meio da captura
+            return
+        with self._lock:
+            if self._geracao == geracao and self.base is not None:
+                self.atual = dados
+
+    def aguardar_captura(self, timeout=None):
+        """Espera a captura automática em andamento, se houver"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def parar(self):
+        """Descarta os snapshots e desliga o tracemalloc, se foi ligado aqui"""
+        with self._lock:
+            self._geracao += 1
+            self.base = self.atual = self.alvo = None
+            self.requisicoes = 0
+            if self._ligou_tracemalloc:
+                tracemalloc.stop()
+                self._ligou_tracemalloc = False
+
+    def crescimento(self, agrupar='lineno'):
+        """Locais que mais cresceram da base para a captura (lineno ou traceback)"""
+        if self.base is None or self.atual is None:
+            return []
+        locais = []
+        diferencas = self.atual['snapshot'].compare_to(self.base['snapshot'], agrupar)
+        for estatistica in sorted(diferencas, key=lambda e: e.size_diff, reverse=True)[:self.top]:
+            if estatistica.size_diff <= 0:
+                break
+            locais.append({
+                'local': f'{estatistica.traceback[0].filename}:{estatistica.traceback[0].lineno}',
+                'pilha': estatistica.traceback.format() if agrupar == 'traceback' else [],
+                'crescimento_kb': round(estatistica.size_diff / 1024, 1),
+                'total_kb': round(estatistica.size / 1024, 1),
+                'blocos': estatistica.count_diff,
+            })
+        return locais
+
+    def tipos_crescimento(self):
+        """Tipos com mais objetos novos desde a base (como o objgraph.growth)"""
+        if self.base is None or self.atual is None:
+            return []
+        diferenca = self.atual['tipos'] - self.base['tipos']
+        return [{'tipo': tipo, 'novos': novos, 'total': self.atual['tipos'][tipo]}
+                for tipo, novos in diferenca.most_common(self.top)]
+
+    def resumo(self, agrupar='lineno'):
+        """Estado para a página e o JSON do admin"""
+        def snapshot(dados):
+            if dados is None:
+                return None
+            return {campo: dados[campo] for campo in ('quando', 'requisicoes', 'processo', 'rastreada', 'pico_rastreado')}
+        # A página do admin mostra a captura automática que acabou de ser agendada
+        self.aguardar_captura()
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'ativo': self.ativo,
+                'frames': self.frames,
+                'requisicoes': self.requisicoes,
+                'alvo': self.alvo,
+                'processo': memoria_processo(),
+                'base': snapshot(self.base),
+                'atual': snapshot(self.atual),
+                'crescimento': self.crescimento(agrupar),
+                'tipos': self.tipos_crescimento(),
+                'mapas_identidade': mapas_identidade(),
+            }
+
+def _contar(perfil):
+    def contar(exc):
+        # As páginas de memória do admin não entram na contagem
+        if perfil.base is not None and not (request.endpoint or '').startswith('admin.memoria'):
+            perfil.contar_requisicao()
+    return contar
+
+def init_app(app):
+    """Cria o perfil de memória do processo (o tracemalloc só é ligado pelo admin)"""
+    if not app.config.get('MEMORIA_ATIVO', True):
+        return
+    perfil = PerfilMemoria(frames=app.config.get('MEMORIA_FRAMES', 5), top=app.config.get('MEMORIA_TOP', 25))
+    app.extensions['memoria'] = perfil
+    app.teardown_request(_contar(perfil))
@@ -0,0 +1,184 @@
+import hmac
+import logging
+import os
+import threading
+import time
+from flask import Response, current_app, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from app import banco
+
+logger = logging.getLogger(__name__)
+
+BALDES_REQUISICAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BALDES_CONSULTAS = (0, 1, 2, 5, 10, 20, 30, 50, 100, 200)
+BALDES_BANCO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+def modo_multiprocesso():
+    """Com PROMETHEUS_MULTIPROC_DIR, cada worker grava suas métricas em arquivos dessa pasta"""
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir'))
+
+def rss_bytes():
+    """Memória residente atual do processo (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class Metricas:
+    """Métricas da aplicação no formato do Prometheus
+
+    Por requisição são feitas apenas três observações em histogramas (latência,
+    número de consultas e tempo de banco). Pool, caches, memória e uptime são
+    contadores que já existem em outros módulos: são copiados para as métricas
+    no máximo a cada `intervalo` segundos e sempre que /metrics é lido.
+    """
+
+    def __init__(self, intervalo=5):
+        self.intervalo = intervalo
+        self.multiprocesso = modo_multiprocesso()
+        # Em modo multiprocesso os valores vão para os arquivos da pasta, não para um registry
+        self.registry = None if self.multiprocesso else CollectorRegistry()
+        self.inicio = time.time()
+        self._proxima_atualizacao = 0.0
+        self._lock_atualizacao = threading.Lock()
+        self._anteriores = {}
+
+        opcoes = {'registry': self.registry}
+        self.requisicoes = Histogram(
+            'clinica_requisicao_segundos', 'Duração das requisições, até o fim da resposta',
+            ['endpoint', 'metodo', 'status'], buckets=BALDES_REQUISICAO, **opcoes)
+        self.consultas = Histogram(
+            'clinica_consultas_por_requisicao', 'Consultas SQL executadas por requisição',
+            ['endpoint'], buckets=BALDES_CONSULTAS, **opcoes)
+        self.tempo_banco = Histogram(
+            'clinica_banco_segundos_por_requisicao', 'Tempo gasto em consultas SQL por requisição',
+            ['endpoint'], buckets=BALDES_BANCO, **opcoes)
+
+        self.pool_conexoes = Gauge(
+            'clinica_pool_conexoes', 'Conexões do pool por estado',
+            ['estado'], multiprocess_mode='livesum', **opcoes)
+        self.pool_eventos = Counter(
+            'clinica_pool_eventos', 'Eventos do pool de conexões',
+            ['evento'], **opcoes)
+        self.cache_operacoes = Counter(
+            'clinica_cache_operacoes', 'Leituras dos caches em memória',
+            ['cache', 'resultado'], **opcoes)
+        self.cache_taxa_acerto = Gauge(
+            'clinica_cache_taxa_acerto', 'Fração das leituras atendidas pelo cache',
+            ['cache'], multiprocess_mode='liveall', **opcoes)
+        self.rss = Gauge(
+            'clinica_processo_rss_bytes', 'Memória residente do processo',
+            multiprocess_mode='liveall', **opcoes)
+        self.uptime = Gauge(
+            'clinica_processo_uptime_segundos', 'Tempo desde a criação da aplicação no processo',
+            multiprocess_mode='liveall', **opcoes)
+
+    def observar_requisicao(self, endpoint, metodo, status, segundos, consultas=None):
+        self.requisicoes.labels(endpoint, metodo, status).observe(segundos)
+        if consultas is not None:
+            self.consultas.labels(endpoint).observe(consultas.total)
+            self.tempo_banco.labels(endpoint).observe(consultas.tempo)
+
+    def _incrementar(self, contador, rotulos, atual):
+        # Os módulos de origem guardam totais; as métricas recebem só a diferença
+        anterior = self._anteriores.get((contador, rotulos), 0)
+        if atual > anterior:
+            contador.labels(*rotulos).inc(atual - anterior)
+        self._anteriores[(contador, rotulos)] = atual
+
+    def atualizar(self, app):
+        """Copia os contadores do pool, dos caches e do processo para as métricas"""
+        pool = banco.estatisticas()
+        for estado in ('em_uso', 'ociosas', 'overflow', 'tamanho'):
+            if estado in pool:
+                self.pool_conexoes.labels(estado).set(pool[estado])
+        for evento in ('checkouts', 'conexoes_criadas', 'pings', 'desconexoes'):
+            self._incrementar(self.pool_eventos, (evento,), pool[evento])
+
+        caches = {}
+        identidade = app.extensions.get('cache_identidade')
+        if identidade is not None:
+            dados = identidade.estatisticas()
+            caches['identidade'] = (dados['consultas_evitadas'], dados['consultas_realizadas'])
+        fragmentos = app.extensions.get('cache_fragmentos')
+        if fragmentos is not None:
+            dados = fragmentos.estatisticas()
+            caches['fragmentos'] = (dados['acertos'], dados['falhas'])
+        for nome, (acertos, falhas) in caches.items():
+            self._incrementar(self.cache_operacoes, (nome, 'acerto'), acertos)
+            self._incrementar(self.cache_operacoes, (nome, 'falha'), falhas)
+            if acertos + falhas:
+                self.cache_taxa_acerto.labels(nome).set(acertos / (acertos + falhas))
+
+        memoria = rss_bytes()
+        if memoria is not None:
+            self.rss.set(memoria)
+        self.uptime.set(time.time() - self.inicio)
+
+    def atualizar_se_preciso(self, app):
+        agora = time.monotonic()
+        if agora < self._proxima_atualizacao or not self._lock_atualizacao.acquire(blocking=False):
+            return
+        try:
+            self._proxima_atualizacao = agora + self.intervalo
+            self.atualizar(app)
+        finally:
+            self._lock_atualizacao.release()
+
+    def exportar(self, app):
+        """Texto no formato de exposição do Prometheus (de todos os workers, em modo multiprocesso)"""
+        with self._lock_atualizacao:
+            self.atualizar(app)
+        if self.multiprocesso:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry)
+        return generate_latest(self.registry)
+
+def _iniciar_requisicao():
+    g._inicio_metricas = time.perf_counter()
+
+def _guardar_status(response):
+    g._status_metricas = response.status_code
+    return response
+
+def _observar(app):
+    metricas = app.extensions['metricas']
+    def observar(exc):
+        inicio = g.pop('_inicio_metricas', None)
+        if inicio is None:
+            return
+        status = g.pop('_status_metricas', 500)
+        if exc is not None:
+            status = 500
+        # Roda antes do teardown do contador_consultas (registrado antes), que descarta g._consultas
+        metricas.observar_requisicao(request.endpoint or 'nenhum', request.method, str(status),
+                                     time.perf_counter() - inicio, g.get('_consultas'))
+        metricas.atualizar_se_preciso(app)
+    return observar
+
+def token_valido():
+    """Indica se a requisição traz `Authorization: Bearer <METRICAS_TOKEN>` (False sem token configurado)"""
+    token = current_app.config.get('METRICAS_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+def exibir_metricas():
+    if current_app.config.get('METRICAS_TOKEN') and not token_valido():
+        return Response('Não autorizado\n', status=401, mimetype='text/plain')
+    return Response(current_app.extensions['metricas'].exportar(current_app), content_type=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    """Registra a coleta por requisição e o endpoint /metrics (depois do contador_consultas)"""
+    if not app.config.get('METRICAS_ATIVO', True):
+        return
+    if app.config.get('METRICAS_EXIGIR_TOKEN') and not app.config.get('METRICAS_TOKEN'):
+        # Sem token o /metrics ficaria público (rotas, volumes, memória): não é registrado
+        logger.warning('METRICAS_TOKEN não definido: /metrics desativado')
+        return
+    app.extensions['metricas'] = Metricas(intervalo=app.config.get('METRICAS_INTERVALO', 5))
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_guardar_status)
+    app.teardown_request(_observar(app))
+    app.add_url_rule('/metrics', 'metricas', exibir_metricas)
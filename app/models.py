@@ -1,12 +1,12 @@
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from app import db, login_manager
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Carrega o usuário pelo ID para o Flask-Login"""
-    return Usuario.query.get(int(user_id))
+    """Carrega o usuário pelo ID para o Flask-Login, já com o perfil do seu tipo"""
+    from app.auth.identidade import carregar_identidade
+    return carregar_identidade(user_id)
 
 class Usuario(UserMixin, db.Model):
     """Modelo base para todos os usuários do sistema"""
@@ -20,6 +20,8 @@ class Usuario(UserMixin, db.Model):
     tipo_usuario = db.Column(db.Enum('admin', 'psicologo', 'paciente', name='tipo_usuario_enum'), nullable=False)
     ativo = db.Column(db.Boolean, default=True, nullable=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Incrementada quando senha, status ou dados do perfil mudam; invalida sessões antigas
+    versao = db.Column(db.Integer, default=1, nullable=False)
     
     # Relacionamentos
     psicologo = db.relationship('Psicologo', backref='usuario', uselist=False, cascade='all, delete-orphan')
@@ -28,11 +30,20 @@ class Usuario(UserMixin, db.Model):
     
     def set_senha(self, senha):
         """Define a senha do usuário com hash"""
-        self.senha_hash = generate_password_hash(senha)
+        from app.auth.senhas import gerar_hash
+        self.senha_hash = gerar_hash(senha)
+        # Uma troca de senha de verdade depois de um rehash na mesma requisição invalida as sessões
+        self.__dict__.pop('_rehash_transparente', None)
     
     def check_senha(self, senha):
-        """Verifica se a senha está correta"""
-        return check_password_hash(self.senha_hash, senha)
+        """Verifica se a senha está correta, atualizando o hash se os parâmetros mudaram"""
+        from app.auth.senhas import verificar_senha, precisa_rehash
+        correta = verificar_senha(self.senha_hash, senha)
+        if correta and precisa_rehash(self.senha_hash):
+            # A troca do hash não é uma troca de senha: não invalida as outras sessões
+            self.set_senha(senha)
+            self._rehash_transparente = self.senha_hash
+        return correta
     
     def __repr__(self):
         return f'<Usuario {self.email}>'
@@ -53,6 +64,8 @@ class Psicologo(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, unique=True)
+    # Incrementada a cada mudança em agendamentos, horários ou prontuários (validador de ETag)
+    versao = db.Column(db.Integer, default=1, nullable=False)
     
     # Relacionamentos
     pacientes = db.relationship('Paciente', backref='psicologo_responsavel', lazy='dynamic')
@@ -147,4 +160,13 @@ class HorarioAtendimento(db.Model):
     
     def __repr__(self):
         dias = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-        return f'<HorarioAtendimento {dias[self.dia_semana]} {self.hora_inicio}-{self.hora_fim}>'
\ No newline at end of file
+        return f'<HorarioAtendimento {dias[self.dia_semana]} {self.hora_inicio}-{self.hora_fim}>'
+
+from app.auth.identidade import incrementar_versao
+db.event.listen(Usuario, 'before_update', incrementar_versao)
+
+from app.condicional import alteracao_do_psicologo, alteracao_de_sessao
+for evento in ('after_insert', 'after_update', 'after_delete'):
+    for modelo in (Agendamento, HorarioAtendimento, Prontuario):
+        db.event.listen(modelo, evento, alteracao_do_psicologo)
+    db.event.listen(Sessao, evento, alteracao_de_sessao)
@@ -1,18 +1,24 @@
+import logging
 from flask import render_template, flash, redirect, url_for, request, session, jsonify
 from flask_login import login_required, current_user
-from werkzeug.security import generate_password_hash
 from app.paciente import bp
 from app.models import Paciente, Agendamento, Psicologo, Usuario, Prontuario, HorarioAtendimento, db
 from datetime import datetime, timedelta, timezone
+from app.auth.perfil import perfil_atual, paciente_required
+from app import rastreamento
+from app.condicional import gerar_etag, versao_psicologo, versao_psicologos, nao_modificado, com_validador
+
+logger = logging.getLogger(__name__)
 
 @bp.route('/dashboard')
 @login_required
+@paciente_required
 def dashboard():
     """Dashboard do paciente"""
     from datetime import datetime
     
     # Buscar o paciente atual
-    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    paciente = perfil_atual()
     
     if not paciente:
         flash('Perfil de paciente não encontrado.', 'error')
@@ -34,6 +40,7 @@ def dashboard():
 
 @bp.route('/perfil', methods=['GET', 'POST'])
 @login_required
+@paciente_required
 def perfil():
     """Perfil do paciente"""
     if request.method == 'POST':
@@ -71,7 +78,7 @@ def perfil():
             current_user.telefone = telefone
             
             # Buscar o paciente relacionado (não é mais necessário para telefone)
-            paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+            paciente = perfil_atual()
             
             # Verificar se uma nova senha foi fornecida
             nova_senha = request.form.get('nova_senha', '').strip()
@@ -86,21 +93,21 @@ def perfil():
                     flash('A senha deve ter pelo menos 6 caracteres.', 'error')
                     return redirect(url_for('paciente.perfil'))
                 
-                current_user.senha_hash = generate_password_hash(nova_senha)
+                current_user.set_senha(nova_senha)
             
             # Salvar alterações
             db.session.commit()
             flash('Perfil atualizado com sucesso!', 'success')
             
-        except Exception as e:
+        except Exception:
             db.session.rollback()
             flash('Erro ao atualizar perfil. Tente novamente.', 'error')
-            print(f"Erro ao atualizar perfil: {e}")
+            logger.exception('Erro ao atualizar perfil')
         
         return redirect(url_for('paciente.perfil'))
     
     # GET request - buscar dados do paciente
-    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    paciente = perfil_atual()
     
     # Buscar agendamentos futuros e passados
     agendamentos_futuros = []
@@ -127,10 +134,11 @@ def perfil():
 
 @bp.route('/agendamentos')
 @login_required
+@paciente_required
 def agendamentos():
     """Lista de agendamentos do paciente"""
     # Buscar o paciente atual
-    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    paciente = perfil_atual()
     
     if not paciente:
         flash('Perfil de paciente não encontrado.', 'error')
@@ -150,12 +158,13 @@ def agendamentos():
 
 @bp.route('/agendar', methods=['POST'])
 @login_required
+@paciente_required
 def agendar():
     """Agendar nova consulta via AJAX"""
     if request.method == 'POST':
         try:
             # Buscar o paciente atual
-            paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+            paciente = perfil_atual()
             
             if not paciente:
                 flash('Perfil de paciente não encontrado.', 'error')
@@ -202,23 +211,31 @@ def agendar():
             flash('Consulta agendada com sucesso!', 'success')
             return redirect(url_for('paciente.agendamentos'))
             
-        except Exception as e:
+        except Exception:
             db.session.rollback()
             flash('Erro ao agendar consulta. Tente novamente.', 'error')
+            logger.exception('Erro ao agendar consulta')
             return redirect(url_for('paciente.agendamentos'))
 
 # APIs para o modal de agendamento
 @bp.route('/api/psicologos')
 @login_required
+@paciente_required
 def api_psicologos():
     """API para buscar psicólogos disponíveis e verificar se paciente tem psicólogo fixo"""
     try:
         # Buscar o paciente atual
-        paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+        paciente = perfil_atual()
         
         if not paciente:
             return jsonify({'error': 'Perfil de paciente não encontrado'}), 404
         
+        # Validador barato: o modal consulta esta API repetidamente
+        etag = gerar_etag('psicologos', paciente.id, versao_psicologos())
+        resposta = nao_modificado(etag)
+        if resposta:
+            return resposta
+        
         # Buscar todos os agendamentos do paciente (não cancelados)
         agendamentos_paciente = Agendamento.query.filter(
             Agendamento.paciente_id == paciente.id,
@@ -256,16 +273,17 @@ def api_psicologos():
                     'fixo': False
                 })
         
-        return jsonify({
+        return com_validador(jsonify({
             'psicologos': psicologos_data
-        })
+        }), etag)
         
-    except Exception as e:
-        print(f"Erro na API de psicólogos: {e}")
+    except Exception:
+        logger.exception('Erro na API de psicólogos')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
 @bp.route('/api/horarios-disponiveis')
 @login_required
+@paciente_required
 def api_horarios_disponiveis():
     """API para buscar horários disponíveis de um psicólogo em uma data"""
     try:
@@ -278,14 +296,21 @@ def api_horarios_disponiveis():
         # Converter string para data
         data = datetime.strptime(data_str, '%Y-%m-%d').date()
         
-        # Buscar psicólogo
-        psicologo = Psicologo.query.get(psicologo_id)
-        if not psicologo:
+        # Validador: versão da agenda do psicólogo (uma consulta pela chave primária).
+        # O resultado também depende do dia atual e, para hoje, da hora atual.
+        versao = versao_psicologo(psicologo_id)
+        if versao is None:
             return jsonify({'error': 'Psicólogo não encontrado'}), 404
+        agora = datetime.now()
+        etag = gerar_etag('horarios', int(psicologo_id), data_str, versao, agora.date().isoformat(),
+                          agora.strftime('%H:%M') if data == agora.date() else None)
+        resposta = nao_modificado(etag)
+        if resposta:
+            return resposta
         
         # Verificar se a data não é no passado
         if data < datetime.now().date():
-            return jsonify({'horarios': []})
+            return com_validador(jsonify({'horarios': []}), etag)
         
         # Verificar se o psicólogo atende neste dia da semana
         dia_semana = data.weekday()  # 0=Segunda, 1=Terça, ..., 6=Domingo
@@ -298,7 +323,7 @@ def api_horarios_disponiveis():
         ).all()
         
         if not horarios_atendimento:
-            return jsonify({'horarios': []})
+            return com_validador(jsonify({'horarios': []}), etag)
         
         # Gerar horários disponíveis baseados em TODOS os turnos do psicólogo
         horarios_disponiveis = []
@@ -349,19 +374,20 @@ def api_horarios_disponiveis():
             horarios_finais = [h for h in horarios_finais if 
                               datetime.strptime(f"{data_str} {h}", '%Y-%m-%d %H:%M') >= hora_limite]
         
-        return jsonify({'horarios': horarios_finais})
+        return com_validador(jsonify({'horarios': horarios_finais}), etag)
         
-    except Exception as e:
-        print(f"Erro na API de horários: {e}")
+    except Exception:
+        logger.exception('Erro na API de horários')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
 @bp.route('/agendar_modal', methods=['POST'])
 @login_required
+@paciente_required
 def agendar_modal():
     """Processar agendamento via modal"""
     try:
         # Buscar o paciente atual
-        paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+        paciente = perfil_atual()
         
         if not paciente:
             flash('Perfil de paciente não encontrado.', 'error')
@@ -423,30 +449,32 @@ def agendar_modal():
         
         # Se é o primeiro agendamento, criar prontuário
         if not agendamentos_paciente:
-            prontuario_existente = Prontuario.query.filter_by(
-                paciente_id=paciente.id,
-                psicologo_id=psicologo_id
-            ).first()
-            
-            if not prontuario_existente:
-                novo_prontuario = Prontuario(
+            with rastreamento.span('prontuário automático'):
+                prontuario_existente = Prontuario.query.filter_by(
                     paciente_id=paciente.id,
-                    psicologo_id=psicologo_id,
-                    observacoes_gerais=f'Prontuário criado automaticamente no primeiro agendamento em {datetime.now().strftime("%d/%m/%Y %H:%M")}'
-                )
-                db.session.add(novo_prontuario)
+                    psicologo_id=psicologo_id
+                ).first()
+                
+                if not prontuario_existente:
+                    novo_prontuario = Prontuario(
+                        paciente_id=paciente.id,
+                        psicologo_id=psicologo_id,
+                        observacoes_gerais=f'Prontuário criado automaticamente no primeiro agendamento em {datetime.now().strftime("%d/%m/%Y %H:%M")}'
+                    )
+                    db.session.add(novo_prontuario)
         
-        db.session.commit()
+        with rastreamento.span('commit'):
+            db.session.commit()
         
         flash(f'Consulta agendada com sucesso para {data_hora.strftime("%d/%m/%Y às %H:%M")} com Dr(a). {psicologo.usuario.nome_completo}!', 'success')
         
     except ValueError as e:
         flash('Formato de data ou horário inválido.', 'error')
         return redirect(url_for('paciente.dashboard'))
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         flash('Erro ao agendar consulta. Tente novamente.', 'error')
-        print(f"Erro ao agendar consulta via modal: {e}")
+        logger.exception('Erro ao agendar consulta via modal')
     
     return redirect(url_for('paciente.dashboard'))
     
@@ -454,11 +482,12 @@ def agendar_modal():
 
 @bp.route('/confirmar/<int:agendamento_id>', methods=['POST'])
 @login_required
+@paciente_required
 def confirmar_agendamento(agendamento_id):
     """Confirmar agendamento"""
     try:
         # Buscar o paciente atual
-        paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+        paciente = perfil_atual()
         
         if not paciente:
             return jsonify({'error': 'Perfil de paciente não encontrado'}), 404
@@ -488,11 +517,12 @@ def confirmar_agendamento(agendamento_id):
 
 @bp.route('/cancelar/<int:agendamento_id>', methods=['POST'])
 @login_required
+@paciente_required
 def cancelar_agendamento(agendamento_id):
     """Cancelar agendamento"""
     try:
         # Buscar o paciente atual
-        paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+        paciente = perfil_atual()
         
         if not paciente:
             flash('Perfil de paciente não encontrado.', 'error')
@@ -519,19 +549,20 @@ def cancelar_agendamento(agendamento_id):
         
         flash('Consulta cancelada com sucesso.', 'success')
         
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         flash('Erro ao cancelar consulta. Tente novamente.', 'error')
-        print(f"Erro ao cancelar consulta: {e}")
+        logger.exception('Erro ao cancelar consulta')
     
     return redirect(url_for('paciente.agendamentos'))
 
 @bp.route('/reagendar_consulta/<int:agendamento_id>')
 @login_required
+@paciente_required
 def reagendar_consulta(agendamento_id):
     """Reagendar consulta"""
     # Buscar o paciente atual
-    paciente = Paciente.query.filter_by(usuario_id=current_user.id).first()
+    paciente = perfil_atual()
     
     if not paciente:
         flash('Perfil de paciente não encontrado.', 'error')
@@ -0,0 +1,267 @@
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import g, has_app_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from app import db
+from app.contador_consultas import duracao
+
+logger = logging.getLogger(__name__)
+
+# Perfis em andamento no processo: sem nenhum, o evento do engine retorna na primeira linha
+_ativos = 0
+_lock_ativos = threading.Lock()
+
+def _ajustar_ativos(diferenca):
+    global _ativos
+    with _lock_ativos:
+        _ativos += diferenca
+
+class AmostradorPilha:
+    """Amostra a pilha de uma thread a cada `intervalo` segundos (formato sampled do speedscope)
+
+    Ao contrário do cProfile, não instrumenta cada chamada: a thread perfilada
+    roda quase na velocidade normal e o custo fica com a thread amostradora.
+    """
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.amostras = []
+        self._alvo = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._alvo = threading.get_ident()
+        self._anterior = time.perf_counter()
+        self._thread = threading.Thread(target=self._amostrar, name='amostrador-pilha', daemon=True)
+        self._thread.start()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._alvo)
+            agora = time.perf_counter()
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append((codigo.co_qualname, codigo.co_filename, codigo.co_firstlineno))
+                frame = frame.f_back
+            self.amostras.append((tuple(reversed(pilha)), agora - self._anterior))
+            self._anterior = agora
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def speedscope(self, nome):
+        """Documento no formato de arquivo do speedscope (https://www.speedscope.app)"""
+        indices, frames, amostras, pesos = {}, [], [], []
+        for pilha, segundos in self.amostras:
+            caminho = []
+            for frame in pilha:
+                if frame not in indices:
+                    indices[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                caminho.append(indices[frame])
+            amostras.append(caminho)
+            pesos.append(round(segundos * 1000, 3))
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': nome,
+            'exporter': 'clinica-mentalize',
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled', 'name': nome, 'unit': 'milliseconds',
+                'startValue': 0, 'endValue': round(sum(pesos), 3),
+                'samples': amostras, 'weights': pesos,
+            }],
+        }
+
+class PerfilRequisicao:
+    """Perfil de uma requisição: cProfile ou amostrador, mais o trace das consultas SQL"""
+
+    def __init__(self, modo, motivo, intervalo, base):
+        self.modo = modo
+        self.motivo = motivo
+        self.base = base
+        self.consultas = []
+        self.inicio = time.perf_counter()
+        if modo == 'amostragem':
+            self.perfilador = AmostradorPilha(intervalo)
+            self.perfilador.iniciar()
+        else:
+            self.perfilador = cProfile.Profile()
+            self.perfilador.enable()
+
+    def registrar_consulta(self, sql, parametros, segundos):
+        # Início relativo ao da requisição, para alinhar com o perfil
+        fim = time.perf_counter() - self.inicio
+        self.consultas.append({
+            'inicio_ms': round((fim - segundos) * 1000, 3),
+            'duracao_ms': round(segundos * 1000, 3),
+            'sql': ' '.join(sql.split()),
+        })
+
+    def parar(self):
+        if self.modo == 'amostragem':
+            self.perfilador.parar()
+        else:
+            self.perfilador.disable()
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def gravar(self, pasta, trace):
+        """Grava o perfil (.pstats ou .speedscope.json) e o trace (.json)"""
+        base = self.base
+        if self.modo == 'amostragem':
+            nome_perfil = f'{base}.speedscope.json'
+            with open(os.path.join(pasta, nome_perfil), 'w') as arquivo:
+                json.dump(self.perfilador.speedscope(f"{trace['metodo']} {trace['rota']}"), arquivo)
+        else:
+            nome_perfil = f'{base}.pstats'
+            self.perfilador.dump_stats(os.path.join(pasta, nome_perfil))
+        trace['perfil'] = nome_perfil
+        trace['consultas'] = self.consultas
+        with open(os.path.join(pasta, f'{base}.json'), 'w') as arquivo:
+            json.dump(trace, arquivo, ensure_ascii=False, indent=1)
+
+def pasta_perfis(app):
+    return app.config.get('PERFIL_PASTA') or os.path.join(app.instance_path, 'perfis')
+
+def listar_perfis(app):
+    """Traces gravados (mais recentes primeiro), cada um com o nome do arquivo de perfil"""
+    pasta = pasta_perfis(app)
+    if not os.path.isdir(pasta):
+        return []
+    perfis = []
+    for nome in sorted(os.listdir(pasta), reverse=True):
+        if nome.endswith('.json') and not nome.endswith('.speedscope.json'):
+            try:
+                with open(os.path.join(pasta, nome)) as arquivo:
+                    trace = json.load(arquivo)
+            except (OSError, ValueError):
+                continue
+            trace['arquivo'] = nome
+            perfis.append(trace)
+    return perfis
+
+def _limpar_antigos(pasta, maximo):
+    traces = sorted(nome for nome in os.listdir(pasta)
+                    if nome.endswith('.json') and not nome.endswith('.speedscope.json'))
+    for nome in traces[:max(0, len(traces) - maximo)]:
+        base = nome[:-len('.json')]
+        for sufixo in ('.json', '.pstats', '.speedscope.json'):
+            try:
+                os.remove(os.path.join(pasta, base + sufixo))
+            except FileNotFoundError:
+                pass
+
+def motivo(app, prefixo='PERFIL', cabecalho='X-Perfil'):
+    """Por que esta requisição deve ser perfilada (ou rastreada); None na imensa maioria
+
+    Lê `<prefixo>_TOKEN`, `<prefixo>_AMOSTRAGEM` e `<prefixo>_ENDPOINTS` da configuração.
+    """
+    valor = request.headers.get(cabecalho)
+    if valor:
+        token = app.config.get(f'{prefixo}_TOKEN')
+        if token and hmac.compare_digest(valor, token):
+            return 'token'
+        # Só aqui o usuário é carregado: as demais requisições não pagam nada
+        if current_user.is_authenticated and current_user.tipo_usuario == 'admin':
+            return 'admin'
+    taxa = app.config.get(f'{prefixo}_AMOSTRAGEM', 0.0)
+    endpoints = app.config.get(f'{prefixo}_ENDPOINTS')
+    if taxa and (not endpoints or request.endpoint in endpoints) and random.random() < taxa:
+        return 'amostragem'
+    return None
+
+def nome_base():
+    """Nome de arquivo ordenável pela data; o id da requisição (log_estruturado) o liga à linha de log"""
+    return '{:%Y%m%d-%H%M%S}-{}-{}'.format(datetime.now(), re.sub(r'[^\w.]', '_', request.endpoint or 'nenhum'),
+                                           (g.get('_request_id') or uuid.uuid4().hex)[:12])
+
+def _iniciar(app):
+    def iniciar():
+        origem = motivo(app)
+        if origem is None:
+            return
+        try:
+            perfil = PerfilRequisicao(app.config.get('PERFIL_MODO', 'cprofile'), origem,
+                                      app.config.get('PERFIL_INTERVALO_MS', 5) / 1000, nome_base())
+        except ValueError as e:
+            # Outro perfilador já ativo nesta thread (ex.: a requisição está sendo depurada)
+            logger.warning('Perfil de %s não iniciado: %s', request.path, e)
+            return
+        _ajustar_ativos(1)
+        g._perfil_requisicao = perfil
+    return iniciar
+
+def _anunciar_arquivo(response):
+    perfil = g.get('_perfil_requisicao')
+    if perfil is not None:
+        # Quem pediu o perfil recebe o nome do trace que será gravado
+        response.headers['X-Perfil-Arquivo'] = f'{perfil.base}.json'
+        g._perfil_status = response.status_code
+    return response
+
+def _finalizar(app):
+    def finalizar(exc):
+        perfil = g.pop('_perfil_requisicao', None)
+        if perfil is None:
+            return
+        total_ms = perfil.parar()
+        _ajustar_ativos(-1)
+        status = g.pop('_perfil_status', None)
+        trace = {
+            'quando': datetime.now().isoformat(timespec='seconds'),
+            'motivo': perfil.motivo,
+            'modo': perfil.modo,
+            'metodo': request.method,
+            'rota': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': 500 if exc is not None else status,
+            'request_id': g.get('_request_id'),
+            'pid': os.getpid(),
+            'total_ms': round(total_ms, 2),
+        }
+        pasta = pasta_perfis(app)
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            perfil.gravar(pasta, trace)
+            _limpar_antigos(pasta, app.config.get('PERFIL_MAXIMO_ARQUIVOS', 200))
+        except OSError as e:
+            logger.warning('Não foi possível gravar o perfil de %s: %s', trace['rota'], e)
+            return
+        logger.info('Perfil de %s %s (%s, %.1f ms) gravado em %s', request.method, trace['rota'],
+                    perfil.motivo, total_ms, os.path.join(pasta, perfil.base))
+    return finalizar
+
+def _registrar_consulta(conn, cursor, statement, parameters, context, executemany):
+    if not _ativos or not has_app_context():
+        return
+    perfil = g.get('_perfil_requisicao')
+    segundos = duracao(context)
+    if perfil is not None and segundos is not None:
+        perfil.registrar_consulta(statement, parameters, segundos)
+
+def init_app(app):
+    """Perfil sob demanda: cabeçalho X-Perfil (admin ou PERFIL_TOKEN) ou amostragem (depois do contador_consultas)"""
+    if not app.config.get('PERFIL_ATIVO', True):
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'after_cursor_execute', _registrar_consulta)
+    app.before_request(_iniciar(app))
+    app.after_request(_anunciar_arquivo)
+    app.teardown_request(_finalizar(app))
@@ -0,0 +1,50 @@
+import logging
+import os
+import time
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger(__name__)
+
+class BytecodeCacheArquivos(FileSystemBytecodeCache):
+    """Bytecode dos templates em disco, compartilhado entre workers e reinícios
+
+    O Jinja confere o checksum do código-fonte ao ler cada arquivo, então um
+    template alterado é recompilado sem precisar limpar a pasta. Falhas de
+    escrita (disco cheio, pasta somente leitura) não derrubam a requisição.
+    """
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError as e:
+            logger.warning('Não foi possível gravar o bytecode de %s: %s', bucket.key, e)
+
+def pasta_bytecode(app):
+    return app.config.get('JINJA_BYTECODE_PASTA') or os.path.join(app.instance_path, 'jinja')
+
+def carregar_templates(app):
+    """Carrega (e compila, se o bytecode não existir) todos os templates da aplicação
+
+    Retorna uma lista de (nome, ms). Os templates ficam no cache em memória do
+    ambiente Jinja; chamado no master do gunicorn (preload_app), os workers
+    criados depois do fork — inclusive os reciclados por memória — já os
+    recebem prontos.
+    """
+    tempos = []
+    for nome in app.jinja_env.list_templates():
+        inicio = time.perf_counter()
+        app.jinja_env.get_template(nome)
+        tempos.append((nome, (time.perf_counter() - inicio) * 1000))
+    return tempos
+
+def init_app(app):
+    """Ativa o cache de bytecode em disco (JINJA_BYTECODE_CACHE)"""
+    if not app.config.get('JINJA_BYTECODE_CACHE', True):
+        return
+    pasta = pasta_bytecode(app)
+    try:
+        os.makedirs(pasta, exist_ok=True)
+    except OSError as e:
+        logger.warning('Cache de bytecode dos templates desativado (%s): %s', pasta, e)
+        return
+    app.jinja_env.bytecode_cache = BytecodeCacheArquivos(pasta)
@@ -1,28 +1,20 @@
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from app.psicologo import bp
-from app.models import Paciente, Psicologo, Agendamento, Prontuario, Sessao, HorarioAtendimento, db
+from app.models import Usuario, Paciente, Psicologo, Agendamento, Prontuario, Sessao, HorarioAtendimento, db
 from datetime import date, datetime, time, timedelta
 from flask_login import login_required, current_user
-from sqlalchemy import func, extract
+from sqlalchemy import case, func, extract, select
 from datetime import datetime, timedelta, timezone
-
-def psicologo_required(f):
-    """Decorator para verificar se o usuário é um psicólogo"""
-    from functools import wraps
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or current_user.tipo_usuario != 'psicologo':
-            flash('Acesso negado. Área restrita para psicólogos.', 'error')
-            return redirect(url_for('main.index'))
-        return f(*args, **kwargs)
-    return decorated_function
+from app.auth.perfil import perfil_atual, psicologo_required
+from app.condicional import gerar_etag, versao_psicologo, nao_modificado, com_validador, incrementar_versao_psicologo
+from app.transmissao import ConsultaTransmitida, transmitir_template
 
 @bp.route('/dashboard')
 @login_required
 @psicologo_required
 def dashboard():
     """Dashboard principal do psicólogo"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     if not psicologo:
         flash('Perfil de psicólogo não encontrado.', 'error')
@@ -61,10 +53,15 @@ def dashboard():
         func.date(Agendamento.data_hora) == hoje
     ).order_by(Agendamento.data_hora).all()
     
+    # Chave do fragmento da agenda: muda com qualquer alteração nos agendamentos do psicólogo
+    chave_agenda = (psicologo.id, versao_psicologo(psicologo.id), hoje,
+                    tuple(a.id for a in consultas_hoje_detalhes), tuple(a.id for a in proximas_consultas))
+    
     return render_template('psicologo/dashboard.html', 
                          title='Página Principal - Psicólogo',
                          psicologo=psicologo,
                          hoje=hoje,
+                         chave_agenda=chave_agenda,
                          total_pacientes=total_pacientes,
                          agendamentos_hoje=consultas_hoje_detalhes,
                          agendamentos_mes=consultas_mes,
@@ -75,7 +72,7 @@ def dashboard():
 @psicologo_required
 def perfil():
     """Página de perfil do psicólogo"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     if not psicologo:
         flash('Perfil de psicólogo não encontrado.', 'error')
@@ -158,7 +155,7 @@ def perfil():
 @psicologo_required
 def calendario():
     """Calendário de agendamentos do psicólogo"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     if not psicologo:
         flash('Perfil de psicólogo não encontrado.', 'error')
@@ -239,7 +236,7 @@ def calendario():
 @psicologo_required
 def horarios_atendimento():
     """Gestão de horários de atendimento do psicólogo"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     if not psicologo:
         flash('Perfil de psicólogo não encontrado.', 'error')
@@ -249,6 +246,8 @@ def horarios_atendimento():
         try:
             # Remover horários existentes
             HorarioAtendimento.query.filter_by(psicologo_id=psicologo.id).delete()
+            # A exclusão em massa não dispara os eventos do ORM
+            incrementar_versao_psicologo(db.session.connection(), psicologo.id)
             
             # Dias da semana (0=segunda, 1=terça, ..., 6=domingo)
             dias_semana = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
@@ -318,43 +317,32 @@ def horarios_atendimento():
 @psicologo_required
 def prontuarios():
     """Lista todos os pacientes do psicólogo para acesso aos prontuários"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
-    
-    # Buscar todos os pacientes que têm agendamentos com este psicólogo
-    pacientes = db.session.query(Paciente).join(Agendamento).filter(
+    psicologo = perfil_atual()
+    
+    agora = datetime.utcnow()
+    
+    # Pacientes com agendamentos com este psicólogo e os dados de cada um em uma única
+    # consulta agregada (eram quatro consultas por paciente)
+    linhas = db.session.query(
+        Paciente,
+        Usuario,
+        func.max(case((Agendamento.data_hora <= agora, Agendamento.data_hora))).label('ultima_consulta'),
+        func.count(case((Agendamento.status == 'realizado', 1))).label('total_sessoes'),
+        func.count(case((Agendamento.data_hora > agora, 1))).label('futuros')
+    ).join(Agendamento, Agendamento.paciente_id == Paciente.id).join(
+        Usuario, Usuario.id == Paciente.usuario_id
+    ).filter(
         Agendamento.psicologo_id == psicologo.id
-    ).distinct().all()
+    ).group_by(Paciente.id, Usuario.id).order_by(Usuario.nome_completo).all()
     
     pacientes_data = []
     pacientes_ativos = 0
     pacientes_inativos = 0
     
-    for paciente in pacientes:
-        # Última Consulta
-        ultima_consulta = Agendamento.query.filter_by(
-            paciente_id=paciente.id,
-            psicologo_id=psicologo.id
-        ).filter(
-            Agendamento.data_hora <= datetime.utcnow()
-        ).order_by(Agendamento.data_hora.desc()).first()
-
-        # Total de Sessões - contar consultas com status "Realizado"
-        total_sessoes = Agendamento.query.filter_by(
-            paciente_id=paciente.id,
-            psicologo_id=psicologo.id,
-            status='realizado'
-        ).count()
-
+    for paciente, usuario, ultima_consulta, total_sessoes, futuros in linhas:
         # Status do Paciente (simplificado: ativo se tiver agendamentos futuros ou recentes)
         status = "Inativo"
-        agendamento_futuro = Agendamento.query.filter_by(
-            paciente_id=paciente.id,
-            psicologo_id=psicologo.id
-        ).filter(
-            Agendamento.data_hora > datetime.utcnow()
-        ).first()
-
-        if agendamento_futuro or (ultima_consulta and (datetime.utcnow() - ultima_consulta.data_hora).days <= 90):
+        if futuros or (ultima_consulta and (agora - ultima_consulta).days <= 90):
             status = "Ativo"
             pacientes_ativos += 1
         else:
@@ -362,8 +350,8 @@ def prontuarios():
         
         pacientes_data.append({
             'id': paciente.id,
-            'usuario': paciente.usuario,
-            'ultima_consulta': ultima_consulta.data_hora if ultima_consulta else None,
+            'usuario': usuario,
+            'ultima_consulta': ultima_consulta,
             'total_sessoes': total_sessoes,
             'status': status
         })
@@ -386,7 +374,7 @@ def prontuarios():
 @psicologo_required
 def prontuario_individual(paciente_id):
     """Exibe o prontuário individual de um paciente"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     # Verificar se o paciente tem agendamentos com este psicólogo
     paciente = db.session.query(Paciente).join(Agendamento).filter(
@@ -413,21 +401,28 @@ def prontuario_individual(paciente_id):
         db.session.add(prontuario)
         db.session.commit()
     
-    # Buscar sessões do prontuário
-    sessoes = Sessao.query.filter_by(prontuario_id=prontuario.id).order_by(Sessao.data_sessao.desc()).all()
+    # Sessões do prontuário (lidas em lotes durante a renderização)
+    sessoes = ConsultaTransmitida(
+        select(Sessao.id, Sessao.data_sessao, Sessao.anotacoes, Sessao.data_criacao)
+        .where(Sessao.prontuario_id == prontuario.id)
+        .order_by(Sessao.data_sessao.desc())
+    )
     
-    # Buscar agendamentos do paciente com este psicólogo
-    agendamentos = Agendamento.query.filter_by(
-        paciente_id=paciente_id,
-        psicologo_id=psicologo.id
-    ).order_by(Agendamento.data_hora.desc()).all()
+    # Consultas realizadas do paciente com este psicólogo
+    consultas_realizadas = ConsultaTransmitida(
+        select(Agendamento.data_hora, Agendamento.observacoes)
+        .where(Agendamento.paciente_id == paciente_id,
+               Agendamento.psicologo_id == psicologo.id,
+               Agendamento.status == 'realizado')
+        .order_by(Agendamento.data_hora.desc())
+    )
     
-    return render_template('psicologo/prontuario_individual.html',
+    return transmitir_template('psicologo/prontuario_individual.html',
                          title=f'Prontuário - {paciente.usuario.nome_completo}',
                          paciente=paciente,
                          prontuario=prontuario,
                          sessoes=sessoes,
-                         agendamentos=agendamentos)
+                         consultas_realizadas=consultas_realizadas)
 
 
 @bp.route('/paciente/<int:paciente_id>/historico')
@@ -435,7 +430,7 @@ def prontuario_individual(paciente_id):
 @psicologo_required
 def historico_paciente(paciente_id):
     """API para buscar histórico de sessões do paciente"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     # Verificar permissão
     paciente = db.session.query(Paciente).join(Agendamento).filter(
@@ -446,6 +441,12 @@ def historico_paciente(paciente_id):
     if not paciente:
         return jsonify({'error': 'Acesso negado'}), 403
     
+    # Validador: versão dos dados do psicólogo (muda com novas sessões e agendamentos)
+    etag = gerar_etag('historico', psicologo.id, paciente_id, versao_psicologo(psicologo.id))
+    resposta = nao_modificado(etag)
+    if resposta:
+        return resposta
+    
     # Buscar prontuário
     prontuario = Prontuario.query.filter_by(
         paciente_id=paciente_id,
@@ -453,7 +454,7 @@ def historico_paciente(paciente_id):
     ).first()
     
     if not prontuario:
-        return jsonify({'sessoes': []})
+        return com_validador(jsonify({'sessoes': []}), etag)
     
     # Buscar sessões
     sessoes = Sessao.query.filter_by(prontuario_id=prontuario.id).order_by(Sessao.data_sessao.desc()).all()
@@ -467,7 +468,7 @@ def historico_paciente(paciente_id):
             'data_criacao': sessao.data_criacao.strftime('%d/%m/%Y %H:%M')
         })
     
-    return jsonify({'sessoes': sessoes_data})
+    return com_validador(jsonify({'sessoes': sessoes_data}), etag)
 
 
 @bp.route('/paciente/<int:paciente_id>/anotacao', methods=['POST'])
@@ -475,7 +476,7 @@ def historico_paciente(paciente_id):
 @psicologo_required
 def adicionar_anotacao(paciente_id):
     """API para adicionar nova anotação/sessão ao prontuário"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     # Verificar permissão
     paciente = db.session.query(Paciente).join(Agendamento).filter(
@@ -533,7 +534,7 @@ def adicionar_anotacao(paciente_id):
 @psicologo_required
 def editar_sessao(sessao_id):
     """API para editar uma sessão/anotação existente"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     # Buscar a sessão e verificar permissão
     sessao = db.session.query(Sessao).join(Prontuario).filter(
@@ -572,7 +573,7 @@ def editar_sessao(sessao_id):
 @psicologo_required
 def configurar_recorrencia(paciente_id):
     """Configura recorrência de agendamentos para um paciente"""
-    psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+    psicologo = perfil_atual()
     
     # Verificar permissão
     paciente = db.session.query(Paciente).join(Agendamento).filter(
@@ -662,7 +663,7 @@ def configurar_recorrencia(paciente_id):
 def marcar_ausente(agendamento_id):
     """Marcar consulta como ausente"""
     try:
-        psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+        psicologo = perfil_atual()
         
         # Buscar o agendamento
         agendamento = Agendamento.query.filter_by(
@@ -691,7 +692,7 @@ def marcar_ausente(agendamento_id):
 def marcar_realizada(agendamento_id):
     """Marcar consulta como realizada"""
     try:
-        psicologo = Psicologo.query.filter_by(usuario_id=current_user.id).first()
+        psicologo = perfil_atual()
         
         # Buscar o agendamento
         agendamento = Agendamento.query.filter_by(
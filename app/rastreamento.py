@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from flask import before_render_template, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from app import db
+from app.perfilador import motivo, nome_base
+
+logger = logging.getLogger(__name__)
+
+# Rastros em andamento no processo: sem nenhum, eventos e spans retornam na primeira linha
+_ativos = 0
+_lock_ativos = threading.Lock()
+
+def _ajustar_ativos(diferenca):
+    global _ativos
+    with _lock_ativos:
+        _ativos += diferenca
+
+class Span:
+    """Trecho cronometrado de uma requisição, filho do span aberto quando ele começou"""
+
+    __slots__ = ('id', 'pai', 'nome', 'categoria', 'inicio', 'fim', 'atributos')
+
+    def __init__(self, nome, categoria, pai, atributos):
+        self.id = uuid.uuid4().hex[:16]
+        self.pai = pai
+        self.nome = nome
+        self.categoria = categoria
+        self.inicio = time.perf_counter_ns()
+        self.fim = None
+        self.atributos = atributos
+
+    def definir(self, **atributos):
+        self.atributos.update(atributos)
+
+class Rastro:
+    """Spans de uma requisição; a pilha de spans abertos define o pai de cada novo span"""
+
+    def __init__(self, origem):
+        self.origem = origem
+        self.trace_id = uuid.uuid4().hex
+        # Referência para converter perf_counter em horário (OTLP usa nanossegundos desde a época)
+        self.epoca_ns = time.time_ns() - time.perf_counter_ns()
+        self.spans = []
+        self._abertos = []
+
+    def abrir(self, nome, categoria, **atributos):
+        span = Span(nome, categoria, self._abertos[-1].id if self._abertos else None, atributos)
+        self.spans.append(span)
+        self._abertos.append(span)
+        return span
+
+    def fechar(self, span):
+        span.fim = time.perf_counter_ns()
+        # Fecha também os filhos que ficaram abertos (ex.: exceção no meio de um template)
+        while self._abertos:
+            aberto = self._abertos.pop()
+            if aberto.fim is None:
+                aberto.fim = span.fim
+            if aberto is span:
+                break
+
+    def chrome(self):
+        """Eventos do formato Chrome trace (chrome://tracing, Perfetto, speedscope)"""
+        inicio = self.spans[0].inicio
+        pid = os.getpid()
+        return {
+            'displayTimeUnit': 'ms',
+            'otherData': {'trace_id': self.trace_id, 'origem': self.origem},
+            'traceEvents': [{
+                'name': span.nome, 'cat': span.categoria, 'ph': 'X', 'pid': pid, 'tid': 1,
+                'ts': (span.inicio - inicio) / 1000, 'dur': ((span.fim or span.inicio) - span.inicio) / 1000,
+                'args': dict(span.atributos, span_id=span.id, parent_id=span.pai),
+            } for span in self.spans],
+        }
+
+    def otlp(self):
+        """Documento OTLP/JSON (ExportTraceServiceRequest), aceito pelo coletor do OpenTelemetry e pelo Jaeger"""
+        def valor(v):
+            if isinstance(v, bool):
+                return {'boolValue': v}
+            if isinstance(v, int):
+                return {'intValue': str(v)}
+            if isinstance(v, float):
+                return {'doubleValue': v}
+            return {'stringValue': str(v)}
+        # SERVER para a requisição, CLIENT para o banco, INTERNAL para o resto
+        tipos = {'requisicao': 2, 'sql': 3}
+        return {'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': 'clinica-mentalize'}},
+                {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}},
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': 'app.rastreamento'},
+                'spans': [{
+                    'traceId': self.trace_id,
+                    'spanId': span.id,
+                    'parentSpanId': span.pai or '',
+                    'name': span.nome,
+                    'kind': tipos.get(span.categoria, 1),
+                    'startTimeUnixNano': str(self.epoca_ns + span.inicio),
+                    'endTimeUnixNano': str(self.epoca_ns + (span.fim or span.inicio)),
+                    'attributes': [{'key': chave, 'value': valor(v)}
+                                   for chave, v in dict(span.atributos, categoria=span.categoria).items()
+                                   if v is not None],
+                } for span in self.spans],
+            }],
+        }]}
+
+class _SpanNulo:
+    """Usado quando a requisição não está sendo rastreada: não mede nada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def definir(self, **atributos):
+        pass
+
+_NULO = _SpanNulo()
+
+class _SpanAtivo:
+    def __init__(self, rastro, nome, categoria, atributos):
+        self.rastro = rastro
+        self.span = rastro.abrir(nome, categoria, **atributos)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, exc, tb):
+        if tipo is not None:
+            self.span.definir(erro=tipo.__name__)
+        self.rastro.fechar(self.span)
+        return False
+
+    def definir(self, **atributos):
+        self.span.definir(**atributos)
+
+def span(nome, categoria='app', **atributos):
+    """Abre um span filho do atual, se a requisição estiver sendo rastreada
+
+        with rastreamento.span('cache identidade', 'cache') as s:
+            copia = cache.obter(user_id, versao)
+            s.definir(resultado='acerto' if copia else 'falha')
+    """
+    if not _ativos or not has_app_context():
+        return _NULO
+    rastro = g.get('_rastro')
+    if rastro is None:
+        return _NULO
+    return _SpanAtivo(rastro, nome, categoria, atributos)
+
+def _rastro_atual():
+    if not _ativos or not has_app_context():
+        return None
+    return g.get('_rastro')
+
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    rastro = _rastro_atual()
+    if rastro is not None:
+        span_sql = rastro.abrir(statement.split(None, 1)[0].upper() if statement else 'SQL', 'sql',
+                                **{'db.system': conn.dialect.name,
+                                   'db.statement': ' '.join(statement.split())[:2000],
+                                   'db.executemany': executemany})
+        context._span_rastro = (rastro, span_sql)
+
+def _depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    aberto = getattr(context, '_span_rastro', None)
+    if aberto is not None:
+        rastro, span_sql = aberto
+        span_sql.definir(**{'db.linhas': cursor.rowcount})
+        rastro.fechar(span_sql)
+
+def _erro_sql(contexto):
+    aberto = getattr(contexto.execution_context, '_span_rastro', None)
+    if aberto is not None and aberto[1].fim is None:
+        rastro, span_sql = aberto
+        span_sql.definir(erro=type(contexto.original_exception).__name__)
+        rastro.fechar(span_sql)
+
+def _inicio_template(app, template, context, **extra):
+    rastro = _rastro_atual()
+    if rastro is not None:
+        g.setdefault('_spans_template', []).append(rastro.abrir(f'template {template.name}', 'template',
+                                                                template=template.name))
+
+def _fim_template(app, template, context, **extra):
+    rastro = _rastro_atual()
+    spans = g.get('_spans_template')
+    if rastro is not None and spans:
+        rastro.fechar(spans.pop())
+
+def _iniciar(app):
+    def iniciar():
+        origem = motivo(app, 'RASTREAMENTO', 'X-Rastro')
+        if origem is None:
+            return
+        _ajustar_ativos(1)
+        rastro = Rastro(origem)
+        rastro.abrir(f'{request.method} {request.url_rule.rule if request.url_rule else request.path}',
+                     'requisicao', **{'http.method': request.method, 'http.target': request.full_path.rstrip('?'),
+                                      'endpoint': request.endpoint, 'request_id': g.get('_request_id')})
+        g._rastro = rastro
+        g._rastro_nome = nome_base() + ('.otlp.json' if app.config.get('RASTREAMENTO_FORMATO') == 'otlp'
+                                        else '.trace.json')
+    return iniciar
+
+def _anunciar_arquivo(response):
+    rastro = g.get('_rastro')
+    if rastro is not None:
+        # Quem pediu o rastro recebe o nome do arquivo que será gravado
+        rastro.spans[0].definir(**{'http.status_code': response.status_code})
+        response.headers['X-Rastro-Arquivo'] = g._rastro_nome
+    return response
+
+def _limpar_antigos(pasta, maximo):
+    rastros = sorted(nome for nome in os.listdir(pasta) if nome.endswith(('.trace.json', '.otlp.json')))
+    for nome in rastros[:max(0, len(rastros) - maximo)]:
+        try:
+            os.remove(os.path.join(pasta, nome))
+        except FileNotFoundError:
+            pass
+
+def pasta_rastros(app):
+    return app.config.get('RASTREAMENTO_PASTA') or os.path.join(app.instance_path, 'rastros')
+
+def _finalizar(app):
+    def finalizar(exc):
+        rastro = g.pop('_rastro', None)
+        if rastro is None:
+            return
+        _ajustar_ativos(-1)
+        raiz = rastro.spans[0]
+        if exc is not None:
+            raiz.definir(erro=type(exc).__name__, **{'http.status_code': 500})
+        rastro.fechar(raiz)
+        g.pop('_spans_template', None)
+
+        pasta = pasta_rastros(app)
+        nome = g.pop('_rastro_nome')
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            with open(os.path.join(pasta, nome), 'w') as arquivo:
+                json.dump(rastro.otlp() if nome.endswith('.otlp.json') else rastro.chrome(), arquivo,
+                          ensure_ascii=False)
+            _limpar_antigos(pasta, app.config.get('RASTREAMENTO_MAXIMO_ARQUIVOS', 200))
+        except OSError as e:
+            logger.warning('Não foi possível gravar o rastro de %s: %s', request.path, e)
+            return
+        logger.info('Rastro de %s %s (%d spans, %.1f ms) gravado em %s', request.method, request.path,
+                    len(rastro.spans), (raiz.fim - raiz.inicio) / 1e6, os.path.join(pasta, nome))
+    return finalizar
+
+def init_app(app):
+    """Rastreamento sob demanda: cabeçalho X-Rastro (admin ou RASTREAMENTO_TOKEN) ou amostragem"""
+    if not app.config.get('RASTREAMENTO_ATIVO', True):
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _antes_de_executar)
+    event.listen(engine, 'after_cursor_execute', _depois_de_executar)
+    event.listen(engine, 'handle_error', _erro_sql)
+    before_render_template.connect(_inicio_template, app)
+    template_rendered.connect(_fim_template, app)
+    app.before_request(_iniciar(app))
+    app.after_request(_anunciar_arquivo)
+    app.teardown_request(_finalizar(app))
@@ -0,0 +1,79 @@
+import os
+import signal
+import threading
+import time
+from collections import deque
+from app.metricas import rss_bytes
+
+MB = 1024 * 1024
+
+class ReciclagemPorMemoria:
+    """Recicla o worker do gunicorn pela memória residente, não por número de requisições
+
+    Depois de cada requisição o RSS é comparado a dois limites:
+
+    - suave: o worker termina as requisições em andamento e sai (o mesmo
+      mecanismo do max_requests); o master cria outro em seguida. Só vale
+      depois de `minimo_requisicoes`, para um worker que já nasce acima do
+      limite não ser reciclado a cada requisição.
+    - rígido: emergência; o worker sai na hora (SIGQUIT) antes que o limite de
+      memória do contêiner derrube todos os processos. Também é conferido por
+      uma thread a cada `intervalo` segundos, para pegar uma requisição que
+      estoura a memória enquanto ainda está rodando.
+
+    O log da reciclagem traz as últimas rotas atendidas pelo worker.
+    """
+
+    def __init__(self, limite_suave_mb, limite_rigido_mb, historico=20, minimo_requisicoes=20, intervalo=2.0,
+                 medir=rss_bytes):
+        self.limite_suave = limite_suave_mb * MB if limite_suave_mb else None
+        self.limite_rigido = limite_rigido_mb * MB if limite_rigido_mb else None
+        self.minimo_requisicoes = minimo_requisicoes
+        self.intervalo = intervalo
+        self.medir = medir
+        self.rotas = deque(maxlen=historico)
+        self.requisicoes = 0
+        self.reciclando = False
+        self._lock = threading.Lock()
+
+    def registrar(self, worker, metodo, caminho, status):
+        """Chamado no post_request: guarda a rota e confere os limites"""
+        self.rotas.append(f'{metodo} {caminho} {status}')
+        self.requisicoes += 1
+        self.verificar(worker)
+
+    def verificar(self, worker, apenas_rigido=False):
+        rss = self.medir()
+        if rss is None or self.reciclando:
+            return
+        if self.limite_rigido and rss >= self.limite_rigido:
+            self._reciclar(worker, rss, 'rígido', self.limite_rigido)
+        elif (not apenas_rigido and self.limite_suave and rss >= self.limite_suave
+              and self.requisicoes >= self.minimo_requisicoes):
+            self._reciclar(worker, rss, 'suave', self.limite_suave)
+
+    def _reciclar(self, worker, rss, limite, bytes_limite):
+        with self._lock:
+            if self.reciclando:
+                return
+            self.reciclando = True
+        mensagem = 'Reciclando worker %d: RSS %.0f MB acima do limite %s de %.0f MB após %d requisições; últimas rotas: %s'
+        argumentos = (worker.pid, rss / MB, limite, bytes_limite / MB, self.requisicoes, ' | '.join(self.rotas) or '-')
+        if limite == 'rígido':
+            worker.log.error(mensagem, *argumentos)
+            # Saída imediata: as requisições em andamento são interrompidas
+            os.kill(worker.pid, signal.SIGQUIT)
+        else:
+            worker.log.warning(mensagem, *argumentos)
+            # O worker sai depois das requisições em andamento, como no max_requests
+            worker.alive = False
+
+    def vigiar(self, worker):
+        """Confere o limite rígido periodicamente numa thread do worker"""
+        if not self.limite_rigido:
+            return
+        def vigiar():
+            while worker.alive and not self.reciclando:
+                time.sleep(self.intervalo)
+                self.verificar(worker, apenas_rigido=True)
+        threading.Thread(target=vigiar, name='reciclagem-memoria', daemon=True).start()
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+from flask import current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import inspect, text
+from sqlalchemy.pool import StaticPool
+from app import banco, db, metricas
+
+# Endpoints das sondas: não entram na taxa de erros
+ENDPOINTS_SONDAS = ('saude_viva', 'saude_pronta')
+
+class JanelaErros:
+    """Requisições e respostas 5xx dos últimos `janela` segundos, em baldes de um segundo"""
+
+    def __init__(self, janela=60):
+        self.janela = janela
+        self._lock = threading.Lock()
+        # [segundo, requisições, erros] por posição segundo % janela
+        self._baldes = [[0, 0, 0] for _ in range(janela)]
+
+    def registrar(self, erro, agora=None):
+        segundo = int(agora if agora is not None else time.monotonic())
+        with self._lock:
+            balde = self._baldes[segundo % self.janela]
+            if balde[0] != segundo:
+                balde[:] = [segundo, 0, 0]
+            balde[1] += 1
+            balde[2] += erro
+
+    def resumo(self, agora=None):
+        limite = int(agora if agora is not None else time.monotonic()) - self.janela
+        with self._lock:
+            recentes = [balde for balde in self._baldes if balde[0] > limite]
+            requisicoes = sum(balde[1] for balde in recentes)
+            erros = sum(balde[2] for balde in recentes)
+        return {
+            'janela_segundos': self.janela,
+            'requisicoes': requisicoes,
+            'respostas_5xx': erros,
+            'taxa': round(erros / requisicoes, 4) if requisicoes else 0.0
+        }
+
+class VerificadorProntidao:
+    """Estado do processo para o /readyz, recalculado no máximo a cada `validade` segundos
+
+    O ping do banco roda numa thread própria com `timeout`: um banco travado
+    responde 503 no prazo em vez de prender a sonda. Enquanto um ping travado não
+    termina, os seguintes falham na hora, sem empilhar conexões.
+    """
+
+    def __init__(self, timeout=2.0, validade=1.0, janela_erros=60):
+        self.timeout = timeout
+        self.validade = validade
+        self.erros = JanelaErros(janela_erros)
+        self._lock = threading.Lock()
+        self._ultimo = (float('-inf'), None, None)
+        self._executor = None
+        self._pid = None
+        self._ping = None
+        self._head = False
+
+    def _executor_do_processo(self):
+        # Threads não sobrevivem ao fork dos workers do gunicorn
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ping-banco')
+            self._pid = os.getpid()
+            self._ping = None
+        return self._executor
+
+    def head_migracoes(self, app):
+        """Revisão mais recente da pasta de migrações (None se o projeto não usa migrações)"""
+        if self._head is False:
+            migrate = app.extensions.get('migrate')
+            pasta = migrate.directory if migrate is not None else 'migrations'
+            self._head = None
+            if os.path.isdir(pasta):
+                # Só aqui o Alembic é carregado
+                from alembic.config import Config
+                from alembic.script import ScriptDirectory
+                configuracao = Config()
+                configuracao.set_main_option('script_location', pasta)
+                heads = ScriptDirectory.from_config(configuracao).get_heads()
+                self._head = heads[0] if len(heads) == 1 else ','.join(sorted(heads)) or None
+        return self._head
+
+    def _consultar_banco(self, engine, com_migracoes):
+        inicio = time.perf_counter()
+        with engine.connect() as conexao:
+            if engine.dialect.name == 'postgresql':
+                conexao.exec_driver_sql(f'SET LOCAL statement_timeout = {int(self.timeout * 1000)}')
+            conexao.execute(text('SELECT 1'))
+            atual = None
+            if com_migracoes and inspect(conexao).has_table('alembic_version'):
+                atual = conexao.execute(text('SELECT version_num FROM alembic_version')).scalar()
+        return (time.perf_counter() - inicio) * 1000, atual
+
+    def verificar_banco(self, app):
+        engine = db.engine
+        head = self.head_migracoes(app)
+        try:
+            if isinstance(engine.pool, StaticPool):
+                # Conexão única (SQLite em memória): outra thread a usaria junto com a requisição
+                ms, atual = self._consultar_banco(engine, head is not None)
+            else:
+                executor = self._executor_do_processo()
+                if self._ping is not None and not self._ping.done():
+                    return {'ok': False, 'erro': 'ping anterior ainda sem resposta'}, None
+                self._ping = executor.submit(self._consultar_banco, engine, head is not None)
+                ms, atual = self._ping.result(timeout=self.timeout)
+        except TempoEsgotado:
+            return {'ok': False, 'erro': f'sem resposta em {self.timeout:g} s'}, None
+        except Exception as e:
+            return {'ok': False, 'erro': f'{type(e).__name__}: {e}'[:300]}, None
+        return {'ok': True, 'latencia_ms': round(ms, 2)}, atual
+
+    def calcular(self, app):
+        banco_estado, atual = self.verificar_banco(app)
+        head = self.head_migracoes(app)
+        if head is None:
+            migracoes = {'status': 'sem_migracoes'}
+        else:
+            migracoes = {'head': head, 'atual': atual,
+                         'status': 'desconhecido' if not banco_estado['ok'] else
+                                   'em_dia' if atual == head else 'pendente'}
+
+        cache_fragmentos = app.extensions.get('cache_fragmentos')
+        pronto = banco_estado['ok'] and migracoes['status'] != 'pendente'
+        dados = {
+            'status': 'pronto' if pronto else 'indisponivel',
+            'pid': os.getpid(),
+            'banco': banco_estado,
+            'pool': banco.estatisticas(),
+            'caches': {
+                'identidade': app.extensions['cache_identidade'].estatisticas(),
+                'fragmentos': cache_fragmentos.estatisticas() if cache_fragmentos is not None else None,
+                # Templates já compilados (pré-carregados no master pelo precompilacao)
+                'templates_carregados': len(app.jinja_env.cache) if app.jinja_env.cache is not None else None
+            },
+            'migracoes': migracoes,
+            'erros': self.erros.resumo(),
+            'verificado_em': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        return dados, 200 if pronto else 503
+
+    def resultado(self, app):
+        """Último resultado, se tiver menos de `validade` segundos; senão recalcula (uma thread por vez)"""
+        with self._lock:
+            instante, dados, status = self._ultimo
+            if time.monotonic() - instante >= self.validade:
+                dados, status = self.calcular(app)
+                self._ultimo = (time.monotonic(), dados, status)
+        return dados, status
+
+def saude_viva():
+    """Liveness: o processo responde requisições (sem I/O)"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+def detalhes_autorizados():
+    """Os detalhes do /readyz (erro do banco, pid, pool, caches, migrações) exigem o token das métricas ou um admin"""
+    if metricas.token_valido():
+        return True
+    # Sem cookie de sessão (a sonda do Render) o usuário é anônimo sem consultar o banco
+    return current_user.is_authenticated and current_user.tipo_usuario == 'admin'
+
+def saude_pronta():
+    """Readiness: banco, pool, caches, migrações e taxa de erros recentes"""
+    dados, status = current_app.extensions['saude'].resultado(current_app)
+    if not detalhes_autorizados():
+        # Publicamente só o estado: o erro do banco pode trazer host, DSN ou trechos de SQL
+        dados = {'status': dados['status']}
+    response = jsonify(dados)
+    response.status_code = status
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def _contar_resposta(app):
+    erros = app.extensions['saude'].erros
+    def contar(response):
+        if request.endpoint not in ENDPOINTS_SONDAS:
+            erros.registrar(response.status_code >= 500)
+        return response
+    return contar
+
+def init_app(app):
+    """Registra /healthz e /readyz e a contagem de respostas 5xx para a taxa de erros"""
+    if not app.config.get('SAUDE_ATIVO', True):
+        return
+    app.extensions['saude'] = VerificadorProntidao(
+        timeout=app.config.get('SAUDE_TIMEOUT_BANCO', 2.0),
+        validade=app.config.get('SAUDE_VALIDADE', 1.0),
+        janela_erros=app.config.get('SAUDE_JANELA_ERROS', 60)
+    )
+    app.after_request(_contar_resposta(app))
+    app.add_url_rule('/healthz', 'saude_viva', saude_viva)
+    app.add_url_rule('/readyz', 'saude_pronta', saude_pronta)
@@ -0,0 +1,66 @@
+from flask import current_app, stream_template
+from sqlalchemy import func, select
+from app import db
+
+class ConsultaTransmitida:
+    """Resultado de uma consulta lido em lotes enquanto o template é renderizado
+
+    A consulta só é executada quando o template chega ao {% if %} ou ao {% for %}
+    (depois do cabeçalho da página já ter sido enviado) e usa um cursor do lado
+    do servidor (yield_per), então apenas um lote de linhas fica em memória.
+    Selecione colunas, não entidades: entidades ficariam no identity map da sessão
+    até o fim da requisição. Só pode ser percorrida uma vez.
+    """
+
+    def __init__(self, consulta, lote=None):
+        self.consulta = consulta
+        self.lote = lote or current_app.config.get('TRANSMISSAO_LOTE', 500)
+        self._linhas = None
+        self._primeira = None
+        self._total = None
+
+    def _abrir(self):
+        if self._linhas is None:
+            resultado = db.session.execute(self.consulta.execution_options(yield_per=self.lote))
+            self._linhas = iter(resultado)
+            self._primeira = next(self._linhas, None)
+
+    def __bool__(self):
+        self._abrir()
+        return self._primeira is not None
+
+    def __len__(self):
+        """Total de linhas (uma consulta COUNT separada, feita uma única vez)"""
+        if self._total is None:
+            self._total = db.session.execute(
+                select(func.count()).select_from(self.consulta.order_by(None).subquery())
+            ).scalar()
+        return self._total
+
+    def __iter__(self):
+        self._abrir()
+        if self._primeira is not None:
+            yield self._primeira
+            self._primeira = None
+            yield from self._linhas
+
+def _agrupar(partes, tamanho):
+    """Junta os pedaços gerados pelo Jinja em blocos de ~`tamanho` caracteres"""
+    buffer, acumulado = [], 0
+    for parte in partes:
+        buffer.append(parte)
+        acumulado += len(parte)
+        if acumulado >= tamanho:
+            yield ''.join(buffer)
+            buffer, acumulado = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def transmitir_template(nome, **contexto):
+    """Como render_template, mas envia a página em blocos (chunked) à medida que é gerada"""
+    partes = stream_template(nome, **contexto)
+    response = current_app.response_class(_agrupar(partes, current_app.config.get('TRANSMISSAO_BLOCO', 16384)),
+                                          mimetype='text/html')
+    # Proxies como o nginx guardariam a resposta inteira antes de repassá-la
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
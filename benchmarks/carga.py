@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Teste de carga com pacientes, psicólogos e administradores simulados
+
+Sobe o gunicorn local (gunicorn.conf.py) e dispara sessões de usuários que
+chegam como um processo de Poisson, com a taxa de chegada subindo a cada
+estágio (--taxas). Cada sessão faz login e segue o roteiro do seu papel:
+
+    paciente   - dashboard, lista de psicólogos, horários disponíveis, agenda,
+                 confirma e às vezes cancela uma consulta
+    psicólogo  - dashboard e calendário, marca uma consulta como realizada,
+                 abre um prontuário e registra uma anotação
+    admin      - dashboard (só PostgreSQL), listas de pacientes, psicólogos
+                 e agendamentos
+
+O banco é populado pelo gerador de `flask seed` (app/dados_sinteticos.py) e o
+administrador é o mesmo das fixtures dos testes. As senhas usam um PBKDF2
+barato para que o login não domine a medição (o custo real do hash é medido em
+benchmarks/login_hash.py). O relatório mostra, por estágio e por rota, vazão,
+taxa de erros (status >= 400 ou falha de conexão) e latência p50/p95/p99.
+
+Uso:
+    python benchmarks/carga.py
+    python benchmarks/carga.py --taxas 1 2 4 8 --duracao 30 --mix paciente=60,psicologo=30,admin=10
+    python benchmarks/carga.py --perfil sync --workers 4 --json carga.json
+    python benchmarks/carga.py --database-url postgresql://localhost/carga   # banco já populado com flask seed
+    python benchmarks/carga.py --servidor-existente --porta 10000 --database-url ...
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from perfis_gunicorn import Cliente, aguardar_porta, percentil, rss_total_mb
+
+SENHA = 'senha123'
+CONTAS_POR_PAPEL = 500
+ID_NA_ROTA = re.compile(r'/\d+')
+
+def preparar_banco(database_url, psicologos, pacientes, anos):
+    """Popula o banco se estiver vazio e devolve as contas de cada papel"""
+    os.environ['DATABASE_URL'] = database_url
+    from sqlalchemy import select
+    from app import create_app, db, dados_sinteticos
+    from app.models import Usuario, Psicologo, Paciente
+    from tests.conftest import criar_admin
+
+    app = create_app('development')
+    app.config['SENHA_HASH_METODO'] = 'pbkdf2:sha256:1000'
+    with app.app_context():
+        db.create_all()
+        if not db.session.execute(select(Usuario.id).limit(1)).first():
+            totais = dados_sinteticos.gerar(psicologos, pacientes, anos, senha=SENHA)
+            print(f"Banco populado: {totais['usuarios']} usuários, {totais['agendamentos']} agendamentos.")
+        if not Usuario.query.filter_by(email='admin@teste.com').first():
+            criar_admin()
+
+        ativo = Usuario.ativo.is_(True)
+        contas = {
+            'admin': [{'email': 'admin@teste.com'}],
+            'paciente': [{'email': email, 'psicologo_id': psicologo_id} for email, psicologo_id in db.session.execute(
+                select(Usuario.email, Paciente.psicologo_id).join(Paciente, Paciente.usuario_id == Usuario.id)
+                .where(ativo, Paciente.psicologo_id.is_not(None)).order_by(Paciente.id).limit(CONTAS_POR_PAPEL))],
+            'psicologo': [],
+        }
+        for email, psicologo_id in db.session.execute(
+                select(Usuario.email, Psicologo.id).join(Psicologo, Psicologo.usuario_id == Usuario.id)
+                .where(ativo).order_by(Psicologo.id).limit(CONTAS_POR_PAPEL)):
+            carteira = db.session.execute(
+                select(Paciente.id).where(Paciente.psicologo_id == psicologo_id).limit(50)).scalars().all()
+            if carteira:
+                contas['psicologo'].append({'email': email, 'pacientes': carteira})
+        return contas, db.engine.dialect.name
+
+class Coletor:
+    """Latências e status por estágio e rota (o estágio é o da conclusão da requisição)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.estagio = 0
+        self.medidas = {}
+        self.descartadas = {}
+
+    @staticmethod
+    def rota(metodo, caminho):
+        return f"{metodo} {ID_NA_ROTA.sub('/<id>', caminho.split('?', 1)[0])}"
+
+    def registrar(self, metodo, caminho, status, segundos):
+        with self.lock:
+            self.medidas.setdefault(self.estagio, {}).setdefault(self.rota(metodo, caminho), []).append(
+                (segundos, status))
+
+    def descartar(self):
+        with self.lock:
+            self.descartadas[self.estagio] = self.descartadas.get(self.estagio, 0) + 1
+
+class UsuarioVirtual:
+    """Uma sessão de navegação: login, roteiro do papel e pausas de leitura entre as páginas"""
+
+    def __init__(self, porta, papel, conta, coletor, pensar, aleatorio, dialeto):
+        self.cliente = Cliente(porta)
+        self.papel = papel
+        self.conta = conta
+        self.coletor = coletor
+        self.pensar = pensar
+        self.aleatorio = aleatorio
+        self.dialeto = dialeto
+
+    def req(self, metodo, caminho, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            status = self.cliente.requisitar(metodo, caminho, **kwargs)
+        except (OSError, http.client.HTTPException):
+            status = 0
+            self.cliente.corpo = b''
+        self.coletor.registrar(metodo, caminho, status, time.perf_counter() - inicio)
+        if self.pensar:
+            time.sleep(self.aleatorio.expovariate(1 / self.pensar))
+        return status
+
+    def texto(self):
+        return self.cliente.corpo.decode('utf-8', 'replace')
+
+    def executar(self):
+        status = self.req('POST', '/auth/api/login', corpo={
+            'email': self.conta['email'], 'senha': SENHA, 'tipo_usuario': self.papel})
+        if status == 200:
+            ROTEIROS[self.papel](self)
+        self.cliente.conexao.close()
+
+def dia_util(aleatorio):
+    """Um dia útil depois do período coberto pelo seed (que vai até oito semanas à frente)"""
+    dia = date.today() + timedelta(days=aleatorio.randint(70, 365))
+    return dia + timedelta(days=7 - dia.weekday()) if dia.weekday() > 4 else dia
+
+def roteiro_paciente(u):
+    u.req('GET', '/paciente/dashboard')
+    u.req('GET', '/paciente/api/psicologos')
+    dia = dia_util(u.aleatorio).isoformat()
+    psicologo_id = u.conta['psicologo_id']
+    if u.req('GET', f'/paciente/api/horarios-disponiveis?psicologo_id={psicologo_id}&data={dia}') == 200:
+        horarios = json.loads(u.texto() or '{}').get('horarios') or []
+        if horarios:
+            u.req('POST', '/paciente/agendar_modal', formulario={
+                'psicologo_id': psicologo_id, 'data': dia, 'horario': u.aleatorio.choice(horarios)})
+    u.req('GET', '/paciente/agendamentos')
+    pendentes = re.findall(r'confirmarConsulta\((\d+)\)', u.texto())
+    if pendentes:
+        u.req('POST', f'/paciente/confirmar/{u.aleatorio.choice(pendentes)}')
+        if u.aleatorio.random() < 0.3:
+            u.req('POST', f'/paciente/cancelar/{u.aleatorio.choice(pendentes)}')
+
+def roteiro_psicologo(u):
+    u.req('GET', '/psicologo/dashboard')
+    u.req('GET', '/psicologo/calendario')
+    abertas = re.findall(r'marcarRealizada\((\d+)\)', u.texto())
+    if abertas:
+        u.req('POST', f'/psicologo/agendamento/{u.aleatorio.choice(abertas)}/marcar-realizada')
+    u.req('GET', '/psicologo/prontuarios')
+    paciente_id = u.aleatorio.choice(u.conta['pacientes'])
+    u.req('GET', f'/psicologo/prontuario/{paciente_id}')
+    u.req('POST', f'/psicologo/paciente/{paciente_id}/anotacao',
+          corpo={'anotacoes': 'Sessão registrada pelo teste de carga.'})
+
+def roteiro_admin(u):
+    if u.dialeto == 'postgresql':
+        # O dashboard usa to_char e só funciona no PostgreSQL
+        u.req('GET', '/admin/dashboard')
+    u.req('GET', '/admin/listar-pacientes')
+    u.req('GET', '/admin/listar-psicologos')
+    u.req('GET', '/admin/agendamentos?status=agendado')
+
+ROTEIROS = {'paciente': roteiro_paciente, 'psicologo': roteiro_psicologo, 'admin': roteiro_admin}
+
+def ler_mix(texto):
+    mix = {}
+    for parte in texto.split(','):
+        papel, peso = parte.split('=')
+        if papel.strip() not in ROTEIROS:
+            raise argparse.ArgumentTypeError(f'papel desconhecido: {papel}')
+        mix[papel.strip()] = float(peso)
+    return mix
+
+def executar_estagios(porta, contas, dialeto, mix, taxas, duracao, pensar, max_usuarios, semente):
+    """Chegadas de Poisson a cada taxa (sessões/s); devolve o coletor e a duração real de cada estágio"""
+    coletor = Coletor()
+    aleatorio = random.Random(semente)
+    papeis = [papel for papel in mix if contas.get(papel)]
+    pesos = [mix[papel] for papel in papeis]
+    vagas = threading.BoundedSemaphore(max_usuarios)
+    threads = []
+    duracoes = []
+
+    def sessao(usuario):
+        try:
+            usuario.executar()
+        finally:
+            vagas.release()
+
+    for estagio, taxa in enumerate(taxas):
+        coletor.estagio = estagio
+        inicio = time.time()
+        proxima = inicio
+        while True:
+            proxima += aleatorio.expovariate(taxa)
+            if proxima >= inicio + duracao:
+                break
+            time.sleep(max(0.0, proxima - time.time()))
+            if not vagas.acquire(blocking=False):
+                # Usuários simultâneos demais: o gerador não acompanha a taxa pedida
+                coletor.descartar()
+                continue
+            papel = aleatorio.choices(papeis, pesos)[0]
+            usuario = UsuarioVirtual(porta, papel, aleatorio.choice(contas[papel]), coletor, pensar,
+                                     random.Random(aleatorio.random()), dialeto)
+            thread = threading.Thread(target=sessao, args=(usuario,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        time.sleep(max(0.0, inicio + duracao - time.time()))
+        if estagio == len(taxas) - 1:
+            # As sessões ainda abertas terminam dentro do último estágio
+            for thread in threads:
+                thread.join()
+        duracoes.append(time.time() - inicio)
+    return coletor, duracoes
+
+def resumir(medidas, duracao):
+    latencias = [segundos for segundos, _ in medidas]
+    erros = sum(1 for _, status in medidas if status == 0 or status >= 400)
+    return {
+        'requisicoes': len(medidas),
+        'requisicoes_por_segundo': round(len(medidas) / duracao, 2),
+        'erros_pct': round(100 * erros / len(medidas), 2) if medidas else 0.0,
+        'p50_ms': round(percentil(latencias, 0.50), 2),
+        'p95_ms': round(percentil(latencias, 0.95), 2),
+        'p99_ms': round(percentil(latencias, 0.99), 2),
+    }
+
+def relatorio(coletor, taxas, duracoes):
+    estagios = []
+    for estagio, (taxa, duracao) in enumerate(zip(taxas, duracoes)):
+        rotas = coletor.medidas.get(estagio, {})
+        todas = [medida for medidas in rotas.values() for medida in medidas]
+        estagios.append(dict(resumir(todas, duracao), chegadas_por_segundo=taxa,
+                             sessoes_descartadas=coletor.descartadas.get(estagio, 0),
+                             rotas={rota: resumir(medidas, duracao) for rota, medidas in sorted(rotas.items())}))
+    por_rota = {}
+    for rotas in coletor.medidas.values():
+        for rota, medidas in rotas.items():
+            por_rota.setdefault(rota, []).extend(medidas)
+    total = sum(duracoes)
+    return {'estagios': estagios, 'rotas': {rota: resumir(medidas, total) for rota, medidas in sorted(por_rota.items())}}
+
+def imprimir(resultado):
+    cabecalho = f"{'req':>7}{'req/s':>9}{'erros %':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+
+    def linha(r):
+        return (f"{r['requisicoes']:>7}{r['requisicoes_por_segundo']:>9.1f}{r['erros_pct']:>9.1f}"
+                f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+
+    print(f"\n{'chegadas/s':<52}{cabecalho}{'descartadas':>13}")
+    for estagio in resultado['estagios']:
+        print(f"{estagio['chegadas_por_segundo']:<52}{linha(estagio)}{estagio['sessoes_descartadas']:>13}")
+    print(f"\n{'rota (todos os estágios)':<52}{cabecalho}")
+    for rota, r in resultado['rotas'].items():
+        print(f'{rota:<52}{linha(r)}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga com usuários simulados de cada papel')
+    parser.add_argument('--taxas', type=float, nargs='+', default=[0.5, 1, 2, 4],
+                        help='chegadas de sessões por segundo em cada estágio')
+    parser.add_argument('--duracao', type=float, default=30, help='segundos por estágio')
+    parser.add_argument('--mix', type=ler_mix, default='paciente=70,psicologo=25,admin=5')
+    parser.add_argument('--pensar', type=float, default=0.5, help='pausa média entre páginas (s)')
+    parser.add_argument('--max-usuarios', type=int, default=200, help='sessões simultâneas no gerador')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--perfil', default='sync', help='GUNICORN_PERFIL')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--porta', type=int, default=18081)
+    parser.add_argument('--database-url', help='banco a usar (populado apenas se estiver vazio); padrão: SQLite temporário')
+    parser.add_argument('--servidor-existente', action='store_true',
+                        help='não sobe o gunicorn: usa o que já responde em --porta (com o mesmo banco)')
+    parser.add_argument('--psicologos', type=int, default=10)
+    parser.add_argument('--pacientes', type=int, default=300)
+    parser.add_argument('--anos', type=int, default=1)
+    parser.add_argument('--json', help='arquivo para salvar o relatório completo (estágio x rota)')
+    args = parser.parse_args()
+    if isinstance(args.mix, str):
+        args.mix = ler_mix(args.mix)
+
+    caminho_db = None
+    database_url = args.database_url
+    if not database_url:
+        fd, caminho_db = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        database_url = f'sqlite:///{caminho_db}'
+    processo = None
+    try:
+        contas, dialeto = preparar_banco(database_url, args.psicologos, args.pacientes, args.anos)
+        if not args.servidor_existente:
+            env = dict(os.environ, PORT=str(args.porta), GUNICORN_PERFIL=args.perfil,
+                       GUNICORN_WORKERS=str(args.workers), GUNICORN_THREADS=str(args.threads),
+                       FLASK_CONFIG='production', DATABASE_URL=database_url, SECRET_KEY='carga',
+                       JWT_SECRET_KEY='carga', SENHA_HASH_METODO='pbkdf2:sha256:1000', LOGIN_LIMITE_ATIVO='false')
+            processo = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                         '--access-logfile', '/dev/null', 'wsgi:app'],
+                                        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if not aguardar_porta(args.porta):
+            sys.exit(f'Nenhum servidor respondendo na porta {args.porta}.')
+
+        print(f"Estágios de {args.duracao:.0f} s: {' -> '.join(f'{t:g}' for t in args.taxas)} sessões/s "
+              f"({', '.join(f'{p} {v:g}' for p, v in args.mix.items())})")
+        coletor, duracoes = executar_estagios(args.porta, contas, dialeto, args.mix, args.taxas, args.duracao,
+                                              args.pensar, args.max_usuarios, args.semente)
+        resultado = relatorio(coletor, args.taxas, duracoes)
+        if processo:
+            resultado['rss_mb'] = round(rss_total_mb(processo.pid), 1)
+        imprimir(resultado)
+        if 'rss_mb' in resultado:
+            print(f"\nRSS do gunicorn (master + workers): {resultado['rss_mb']} MB")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(dict(resultado, configuracao={k: v for k, v in vars(args).items() if k != 'json'}),
+                          f, indent=2, ensure_ascii=False)
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait(timeout=30)
+        if caminho_db:
+            os.unlink(caminho_db)
+
+if __name__ == '__main__':
+    main()
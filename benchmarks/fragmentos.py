@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cache de fragmentos: dashboard do psicólogo com e sem {% cache %}
+
+Cria um psicólogo com consultas hoje e nos próximos dias, renderiza o dashboard
+repetidamente nos dois modos e mostra a latência da página, o tempo médio por
+template (sinais do Flask) e o número de consultas SQL por requisição.
+
+Uso:
+    python benchmarks/fragmentos.py
+    python benchmarks/fragmentos.py --requisicoes 500 --consultas 40
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Usuario, Psicologo, Paciente, Agendamento
+from config import config, TestingConfig
+
+def criar_app(uri, cache_ativo):
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'FRAGMENTOS_CACHE_ATIVO': cache_ativo,
+        'COMPRESSAO_ATIVA': False,
+    })
+    return create_app('benchmark')
+
+def popular(quantidade):
+    """Psicólogo com `quantidade` consultas entre hoje e os próximos dias"""
+    usuario_psi = Usuario(nome_completo='Dra. Benchmark', email='psi@benchmark.com', tipo_usuario='psicologo')
+    usuario_psi.set_senha('senha123')
+    db.session.add(usuario_psi)
+    db.session.flush()
+    psicologo = Psicologo(usuario_id=usuario_psi.id)
+    db.session.add(psicologo)
+
+    pacientes = []
+    for i in range(10):
+        usuario = Usuario(nome_completo=f'Paciente {i}', email=f'pac{i}@benchmark.com', tipo_usuario='paciente')
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        paciente = Paciente(usuario_id=usuario.id)
+        db.session.add(paciente)
+        pacientes.append(paciente)
+    db.session.flush()
+
+    inicio = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+    for i in range(quantidade):
+        db.session.add(Agendamento(paciente_id=pacientes[i % 10].id, psicologo_id=psicologo.id,
+                                   data_hora=inicio + timedelta(days=i // 8, hours=i % 8), status='agendado'))
+    db.session.commit()
+
+def medir(cache_ativo, requisicoes, quantidade):
+    fd, caminho_db = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = criar_app(f'sqlite:///{caminho_db}', cache_ativo)
+        with app.app_context():
+            db.create_all()
+            popular(quantidade)
+            client = app.test_client()
+            client.post('/auth/api/login', json={'email': 'psi@benchmark.com', 'senha': 'senha123',
+                                                 'tipo_usuario': 'psicologo'})
+            consultas = []
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: consultas.append(1))
+
+            tempos = []
+            for _ in range(requisicoes):
+                g.pop('_login_user', None)
+                g.pop('_perfil_atual', None)
+                inicio = time.perf_counter()
+                response = client.get('/psicologo/dashboard')
+                tempos.append(time.perf_counter() - inicio)
+                assert response.status_code == 200
+            return sorted(tempos), len(consultas) / requisicoes, app.extensions['tempos_templates'].estatisticas()
+    finally:
+        os.unlink(caminho_db)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara o dashboard com e sem cache de fragmentos')
+    parser.add_argument('--requisicoes', type=int, default=200)
+    parser.add_argument('--consultas', type=int, default=24, help='agendamentos do psicólogo')
+    args = parser.parse_args()
+
+    print(f"{'modo':<12}{'p50 ms':>10}{'p95 ms':>10}{'SQL/req':>10}{'template ms':>14}")
+    for nome, ativo in (('sem cache', False), ('com cache', True)):
+        tempos, sql, templates = medir(ativo, args.requisicoes, args.consultas)
+        p50 = tempos[len(tempos) // 2] * 1000
+        p95 = tempos[int(len(tempos) * 0.95)] * 1000
+        template = templates.get('psicologo/dashboard.html', {}).get('media_ms', 0.0)
+        print(f"{nome:<12}{p50:>10.2f}{p95:>10.2f}{sql:>10.1f}{template:>14.3f}")
+
+if __name__ == '__main__':
+    main()
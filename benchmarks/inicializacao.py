@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Perfil do cold start: tempo de import por módulo (python -X importtime) e fases do create_app
+
+Executa `import wsgi` em um processo novo, como o gunicorn faz após o Render
+reativar a instância, e mostra os módulos mais caros e o tempo de cada fase.
+
+Uso:
+    python benchmarks/inicializacao.py
+    python benchmarks/inicializacao.py --top 30 --repeticoes 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import json, sys, time
+inicio = time.perf_counter()
+import wsgi
+total = (time.perf_counter() - inicio) * 1000
+fases = wsgi.app.extensions['inicializacao']
+print(json.dumps({'total_ms': total, 'create_app_ms': fases.total_ms, 'fases': fases.fases,
+                  'alembic': 'alembic' in sys.modules}))
+"""
+
+def executar(env, importtime=False):
+    comando = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', SCRIPT]
+    processo = subprocess.run(comando, cwd=RAIZ, env=env, capture_output=True, text=True, check=True)
+    return json.loads(processo.stdout.strip().splitlines()[-1]), processo.stderr
+
+def modulos_mais_caros(stderr, top):
+    """Lê a saída do -X importtime e retorna os módulos com maior tempo acumulado"""
+    modulos = []
+    for linha in stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha.split(':', 1)[1].split('|')
+        modulos.append((int(acumulado) / 1000, nome.rstrip()))
+    return sorted(modulos, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede o tempo de inicialização da aplicação')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    fd, caminho_db = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    env = dict(os.environ, FLASK_CONFIG='production', DATABASE_URL=f'sqlite:///{caminho_db}',
+               SECRET_KEY='benchmark', JWT_SECRET_KEY='benchmark', LOG_NIVEL='WARNING')
+    try:
+        _, stderr = executar(env, importtime=True)
+        print(f"{'acumulado ms':>14}  módulo")
+        for ms, nome in modulos_mais_caros(stderr, args.top):
+            print(f"{ms:>14.1f}  {nome}")
+
+        execucoes = [executar(env)[0] for _ in range(args.repeticoes)]
+        melhor = min(execucoes, key=lambda e: e['total_ms'])
+        print(f"\nimport wsgi: {melhor['total_ms']:.1f} ms (melhor de {args.repeticoes}), "
+              f"create_app: {melhor['create_app_ms']:.1f} ms, alembic carregado: {melhor['alembic']}")
+        for nome, ms in melhor['fases']:
+            print(f"  {nome:<14}{ms:>8.1f} ms")
+    finally:
+        os.unlink(caminho_db)
+
+if __name__ == '__main__':
+    main()
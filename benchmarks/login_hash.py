@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark de vazão de login para cada custo de hash de senha
+
+Uso:
+    python benchmarks/login_hash.py
+    python benchmarks/login_hash.py --metodos pbkdf2:sha256:1000 pbkdf2:sha256:600000 --threads 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Usuario
+from config import config, TestingConfig
+
+METODOS_PADRAO = [
+    'pbkdf2:sha256:1000',
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:600000',
+    'scrypt:32768:8:1',
+]
+
+def criar_app(metodo, caminho_db):
+    """Cria uma aplicação de teste usando o método de hash informado"""
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{caminho_db}',
+        'SENHA_HASH_METODO': metodo,
+    })
+    app = create_app('benchmark')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        usuario = Usuario(nome_completo='Benchmark', email='bench@teste.com', tipo_usuario='paciente')
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.commit()
+    return app
+
+def fazer_logins(app, quantidade, resultados):
+    """Executa logins sequenciais com um cliente próprio"""
+    client = app.test_client()
+    for _ in range(quantidade):
+        inicio = time.perf_counter()
+        response = client.post('/auth/api/login', json={
+            'email': 'bench@teste.com',
+            'senha': 'senha123',
+            'tipo_usuario': 'paciente'
+        })
+        resultados.append((response.status_code, time.perf_counter() - inicio))
+        client.post('/auth/api/logout')
+
+def medir(metodo, logins, threads, caminho_db):
+    app = criar_app(metodo, caminho_db)
+    resultados = []
+    por_thread = max(1, logins // threads)
+    workers = [threading.Thread(target=fazer_logins, args=(app, por_thread, resultados))
+               for _ in range(threads)]
+
+    inicio = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    duracao = time.perf_counter() - inicio
+
+    latencias = sorted(latencia for _, latencia in resultados)
+    recusados = sum(1 for status, _ in resultados if status == 503)
+    p50 = latencias[len(latencias) // 2] * 1000
+    p95 = latencias[int(len(latencias) * 0.95) - 1] * 1000
+    return len(resultados) / duracao, p50, p95, recusados
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão de login por custo de hash')
+    parser.add_argument('--metodos', nargs='+', default=METODOS_PADRAO)
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    fd, caminho_db = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        print(f"{'método':<26}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'503':>6}")
+        for metodo in args.metodos:
+            vazao, p50, p95, recusados = medir(metodo, args.logins, args.threads, caminho_db)
+            print(f"{metodo:<26}{vazao:>10.1f}{p50:>10.1f}{p95:>10.1f}{recusados:>6}")
+    finally:
+        os.unlink(caminho_db)
+
+if __name__ == '__main__':
+    main()
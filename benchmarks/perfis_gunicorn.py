@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga dos perfis de worker do gunicorn (sync, gthread, gevent)
+
+Sobe o gunicorn com gunicorn.conf.py para cada perfil, autentica pacientes
+simulados e mede vazão, latência p50/p99 e memória (RSS do master + workers)
+nas rotas mais acessadas.
+
+Uso:
+    python benchmarks/perfis_gunicorn.py
+    python benchmarks/perfis_gunicorn.py --perfis sync gthread --concorrencia 16 --duracao 20
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, time as hora, timedelta
+from urllib.parse import urlencode
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+ORCAMENTO_MEMORIA_MB = 512
+PACIENTES = 32
+
+def preparar_banco(caminho_db):
+    """Cria o banco SQLite com psicólogo, horários e pacientes para o teste"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{caminho_db}'
+    from app import create_app, db
+    from app.models import Usuario, Psicologo, Paciente, HorarioAtendimento
+
+    app = create_app('development')
+    app.config['SENHA_HASH_METODO'] = 'pbkdf2:sha256:1000'
+    with app.app_context():
+        db.create_all()
+        usuario = Usuario(nome_completo='Dra. Benchmark', email='psi@bench.com', tipo_usuario='psicologo')
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        psicologo = Psicologo(usuario_id=usuario.id)
+        db.session.add(psicologo)
+        db.session.flush()
+        for dia in range(5):
+            db.session.add(HorarioAtendimento(psicologo_id=psicologo.id, dia_semana=dia,
+                                              hora_inicio=hora(8), hora_fim=hora(18)))
+        for i in range(PACIENTES):
+            usuario = Usuario(nome_completo=f'Paciente {i}', email=f'p{i}@bench.com', tipo_usuario='paciente')
+            usuario.set_senha('senha123')
+            db.session.add(usuario)
+            db.session.flush()
+            db.session.add(Paciente(usuario_id=usuario.id))
+        db.session.commit()
+        return psicologo.id
+
+def aguardar_porta(porta, timeout=30):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def rss_total_mb(pid_master):
+    """Soma o RSS do master e dos workers (filhos diretos)"""
+    pids = [pid_master]
+    for entrada in os.listdir('/proc'):
+        if entrada.isdigit():
+            try:
+                with open(f'/proc/{entrada}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid_master:
+                        pids.append(int(entrada))
+            except (OSError, IndexError, ValueError):
+                pass
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for linha in f:
+                    if linha.startswith('VmRSS:'):
+                        total += int(linha.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+class Cliente:
+    """Cliente HTTP mínimo com cookie de sessão"""
+
+    def __init__(self, porta):
+        self.porta = porta
+        self.conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+        self.cookie = None
+        self.corpo = b''
+
+    def _enviar(self, metodo, caminho, corpo, cabecalhos):
+        self.conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+        response = self.conexao.getresponse()
+        self.corpo = response.read()
+        return response
+
+    def requisitar(self, metodo, caminho, corpo=None, formulario=None):
+        """Envia a requisição (corpo JSON ou formulário) e devolve o status; o corpo fica em self.corpo"""
+        cabecalhos = {}
+        if corpo is not None:
+            cabecalhos['Content-Type'] = 'application/json'
+            corpo = json.dumps(corpo)
+        elif formulario is not None:
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+            corpo = urlencode(formulario)
+        if self.cookie:
+            cabecalhos['Cookie'] = self.cookie
+        try:
+            response = self._enviar(metodo, caminho, corpo, cabecalhos)
+        except (ConnectionError, http.client.HTTPException):
+            # Workers sync não mantêm keep-alive: reabre a conexão e tenta de novo
+            self.conexao.close()
+            self.conexao = http.client.HTTPConnection('127.0.0.1', self.porta, timeout=60)
+            response = self._enviar(metodo, caminho, corpo, cabecalhos)
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status
+
+def rotas_quentes(psicologo_id):
+    proxima_segunda = date.today() + timedelta(days=(7 - date.today().weekday()))
+    return [
+        '/',
+        '/paciente/dashboard',
+        '/paciente/api/psicologos',
+        f'/paciente/api/horarios-disponiveis?psicologo_id={psicologo_id}&data={proxima_segunda.isoformat()}',
+        '/paciente/agendamentos',
+    ]
+
+def executar_carga(porta, rotas, concorrencia, duracao):
+    resultados = {rota: [] for rota in rotas}
+    erros = []
+    lock = threading.Lock()
+    fim = time.time() + duracao
+
+    def usuario_simulado(i):
+        cliente = Cliente(porta)
+        status = cliente.requisitar('POST', '/auth/api/login', {
+            'email': f'p{i % PACIENTES}@bench.com', 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        if status != 200:
+            erros.append(('login', status))
+            return
+        n = 0
+        while time.time() < fim:
+            rota = rotas[n % len(rotas)]
+            inicio = time.perf_counter()
+            status = cliente.requisitar('GET', rota)
+            latencia = time.perf_counter() - inicio
+            with lock:
+                resultados[rota].append(latencia)
+                if status >= 400:
+                    erros.append((rota, status))
+            n += 1
+
+    threads = [threading.Thread(target=usuario_simulado, args=(i,)) for i in range(concorrencia)]
+    inicio = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados, erros, time.time() - inicio
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, int(len(valores) * p))] * 1000
+
+def medir_perfil(perfil, porta, caminho_db, concorrencia, duracao, rotas):
+    env = dict(os.environ,
+               PORT=str(porta),
+               GUNICORN_PERFIL=perfil,
+               FLASK_CONFIG='production',
+               DATABASE_URL=f'sqlite:///{caminho_db}',
+               SECRET_KEY='benchmark',
+               JWT_SECRET_KEY='benchmark',
+               SENHA_HASH_METODO='pbkdf2:sha256:1000',
+               LOGIN_LIMITE_ATIVO='false')
+    processo = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                 '--access-logfile', '/dev/null', 'wsgi:app'],
+                                cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not aguardar_porta(porta):
+            raise RuntimeError(f'gunicorn ({perfil}) não iniciou')
+        executar_carga(porta, rotas, min(concorrencia, 4), 2)  # aquecimento
+        resultados, erros, duracao_real = executar_carga(porta, rotas, concorrencia, duracao)
+        memoria = rss_total_mb(processo.pid)
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+    todas = [latencia for latencias in resultados.values() for latencia in latencias]
+    return {
+        'perfil': perfil,
+        'requisicoes_por_segundo': len(todas) / duracao_real,
+        'p50_ms': percentil(todas, 0.50),
+        'p99_ms': percentil(todas, 0.99),
+        'erros': len(erros),
+        'rss_mb': memoria,
+        'rotas': {rota: {'p50_ms': percentil(latencias, 0.50), 'p99_ms': percentil(latencias, 0.99)}
+                  for rota, latencias in resultados.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara perfis de worker do gunicorn')
+    parser.add_argument('--perfis', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--duracao', type=float, default=15)
+    parser.add_argument('--porta', type=int, default=18080)
+    parser.add_argument('--json', help='Arquivo para salvar os resultados')
+    args = parser.parse_args()
+
+    fd, caminho_db = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        psicologo_id = preparar_banco(caminho_db)
+        rotas = rotas_quentes(psicologo_id)
+        resultados = []
+        print(f"{'perfil':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'erros':>8}{'RSS MB':>10}")
+        for perfil in args.perfis:
+            if perfil == 'gevent':
+                try:
+                    import gevent  # noqa: F401
+                except ImportError:
+                    print(f"{perfil:<10}  ignorado: pacote gevent não instalado")
+                    continue
+            r = medir_perfil(perfil, args.porta, caminho_db, args.concorrencia, args.duracao, rotas)
+            resultados.append(r)
+            alerta = '  (acima do orçamento!)' if r['rss_mb'] > ORCAMENTO_MEMORIA_MB else ''
+            print(f"{perfil:<10}{r['requisicoes_por_segundo']:>10.1f}{r['p50_ms']:>10.1f}"
+                  f"{r['p99_ms']:>10.1f}{r['erros']:>8}{r['rss_mb']:>10.1f}{alerta}")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(resultados, f, indent=2)
+    finally:
+        os.unlink(caminho_db)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pool de conexões: pre-ping em todo checkout x ping só em conexões ociosas
+
+Mede a latência de uma requisição típica (checkout + consulta + checkin) nos dois
+modos e, com mais threads do que conexões, o tempo de espera por uma conexão.
+Sem DATABASE_URL usa um SQLite temporário; com PostgreSQL a diferença é o
+round trip do SELECT 1 economizado em cada requisição.
+
+Uso:
+    python benchmarks/pool_conexoes.py
+    DATABASE_URL=postgresql://... python benchmarks/pool_conexoes.py --requisicoes 5000 --threads 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app import create_app, db, banco
+from config import config, TestingConfig
+
+def criar_app(uri, pre_ping, pool_size):
+    """Cria uma aplicação usando o modo de verificação de conexões informado"""
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'DB_POOL_PRE_PING': pre_ping,
+        'DB_POOL_SIZE': pool_size,
+        'DB_MAX_OVERFLOW': 0,
+    })
+    return create_app('benchmark')
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] * 1000 if valores else 0.0
+
+def medir(app, requisicoes, threads):
+    """Executa `requisicoes` checkouts com consulta, divididos entre `threads` threads"""
+    latencias = []
+    lock = threading.Lock()
+
+    def trabalhador(quantidade):
+        with app.app_context():
+            engine = db.engine
+            locais = []
+            for _ in range(quantidade):
+                inicio = time.perf_counter()
+                with engine.connect() as conexao:
+                    conexao.execute(text('SELECT 1')).scalar()
+                locais.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(locais)
+
+    with app.app_context():
+        db.engine.dispose()
+    lista = [threading.Thread(target=trabalhador, args=(requisicoes // threads,)) for _ in range(threads)]
+    inicio = time.perf_counter()
+    for thread in lista:
+        thread.start()
+    for thread in lista:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    return len(latencias) / duracao, percentil(latencias, 0.50), percentil(latencias, 0.95)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara pre-ping e ping de conexões ociosas')
+    parser.add_argument('--requisicoes', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--pool-size', type=int, default=4)
+    args = parser.parse_args()
+
+    caminho_db = None
+    uri = os.environ.get('DATABASE_URL')
+    if not uri:
+        fd, caminho_db = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        uri = f'sqlite:///{caminho_db}'
+
+    try:
+        print(f"{'modo':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'pings':>8}")
+        for nome, pre_ping in (('pre-ping', True), ('ping ocioso', False)):
+            app = criar_app(uri, pre_ping, args.pool_size)
+            antes = banco.estatisticas_pool.como_dict()
+            vazao, p50, p95 = medir(app, args.requisicoes, args.threads)
+            depois = banco.estatisticas_pool.como_dict()
+            pings = args.requisicoes if pre_ping else depois['pings'] - antes['pings']
+            print(f"{nome:<16}{vazao:>10.0f}{p50:>10.3f}{p95:>10.3f}{pings:>8}")
+        if depois['espera_maxima_ms']:
+            # Só o QueuePool do PostgreSQL mede a espera por conexão
+            print(f"espera por conexão: média {depois['espera_media_ms']:.3f} ms, máxima {depois['espera_maxima_ms']:.3f} ms")
+    finally:
+        if caminho_db:
+            os.unlink(caminho_db)
+
+if __name__ == '__main__':
+    main()
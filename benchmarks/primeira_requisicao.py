@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Latência da primeira requisição por página, com e sem o bytecode dos templates
+
+Cada cenário roda em um processo novo (como um worker recém-criado após o
+spin-up do Render ou a reciclagem por max_requests) e acessa cada página uma
+única vez:
+
+    sem cache    - JINJA_BYTECODE_CACHE=false: todo template é analisado e compilado
+    cache vazio  - cache ativo, mas sem `flask templates compilar` no build
+    compilado    - bytecode gerado antes por `flask templates compilar`
+    preload      - templates carregados no master (hook when_ready do gunicorn)
+
+Uso:
+    python benchmarks/primeira_requisicao.py
+    python benchmarks/primeira_requisicao.py --repeticoes 5
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGINAS = [
+    ('anonimo', '/'),
+    ('anonimo', '/auth/login'),
+    ('anonimo', '/contato'),
+    ('paciente', '/paciente/dashboard'),
+    ('paciente', '/paciente/agendamentos'),
+    ('psicologo', '/psicologo/dashboard'),
+    ('psicologo', '/psicologo/calendario'),
+    ('psicologo', '/psicologo/prontuarios'),
+    ('admin', '/admin/listar-pacientes'),
+    ('admin', '/admin/listar-psicologos'),
+]
+
+SCRIPT = """
+import json, sys, time
+from app import create_app, db, precompilacao
+from app.models import Usuario, Psicologo, Paciente
+
+preload = sys.argv[1] == 'preload'
+app = create_app('production')
+app.config['SENHA_HASH_METODO'] = 'pbkdf2:sha256:1000'
+with app.app_context():
+    db.create_all()
+    for email, tipo in (('admin@b.com', 'admin'), ('psi@b.com', 'psicologo'), ('pac@b.com', 'paciente')):
+        usuario = Usuario(nome_completo=tipo.title(), email=email, tipo_usuario=tipo)
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        if tipo == 'psicologo':
+            db.session.add(Psicologo(usuario_id=usuario.id))
+        elif tipo == 'paciente':
+            db.session.add(Paciente(usuario_id=usuario.id))
+    db.session.commit()
+if preload:
+    precompilacao.carregar_templates(app)
+
+clientes = {'anonimo': app.test_client()}
+for email, tipo in (('admin@b.com', 'admin'), ('psi@b.com', 'psicologo'), ('pac@b.com', 'paciente')):
+    clientes[tipo] = app.test_client()
+    clientes[tipo].post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+
+tempos = {}
+for perfil, caminho in json.loads(sys.argv[2]):
+    inicio = time.perf_counter()
+    response = clientes[perfil].get(caminho)
+    tempos[caminho] = ((time.perf_counter() - inicio) * 1000, response.status_code)
+print(json.dumps(tempos))
+"""
+
+def executar(env, cenario):
+    processo = subprocess.run([sys.executable, '-c', SCRIPT, cenario, json.dumps(PAGINAS)],
+                              cwd=RAIZ, env=env, capture_output=True, text=True)
+    if processo.returncode != 0:
+        sys.exit(processo.stderr)
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede a primeira requisição de cada página em um processo novo')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    base = dict(os.environ, SECRET_KEY='benchmark', JWT_SECRET_KEY='benchmark', LOG_NIVEL='WARNING',
+                COMPRESSAO_ATIVA='false', JINJA_BYTECODE_PASTA=os.path.join(pasta, 'jinja'))
+
+    def ambiente(**extra):
+        fd, caminho_db = tempfile.mkstemp(suffix='.db', dir=pasta)
+        os.close(fd)
+        return dict(base, DATABASE_URL=f'sqlite:///{caminho_db}', **extra)
+
+    def melhor(cenario, antes=None, **extra):
+        execucoes = []
+        for _ in range(args.repeticoes):
+            if antes:
+                antes()
+            execucoes.append(executar(ambiente(**extra), cenario))
+        return {caminho: min(e[caminho][0] for e in execucoes) for caminho in execucoes[0]}, execucoes[0]
+
+    def limpar_cache():
+        shutil.rmtree(base['JINJA_BYTECODE_PASTA'], ignore_errors=True)
+
+    try:
+        cenarios = {}
+        cenarios['sem cache'], status = melhor('normal', JINJA_BYTECODE_CACHE='false')
+        cenarios['cache vazio'], _ = melhor('normal', antes=limpar_cache)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'wsgi', 'templates', 'compilar'],
+                       cwd=RAIZ, env=ambiente(FLASK_CONFIG='production'), check=True, capture_output=True)
+        cenarios['compilado'], _ = melhor('normal')
+        cenarios['preload'], _ = melhor('preload')
+
+        print(f"{'página':<28}" + ''.join(f'{nome:>14}' for nome in cenarios))
+        for _, caminho in PAGINAS:
+            if status[caminho][1] != 200:
+                print(f"{caminho:<28}  (status {status[caminho][1]}, ignorada)")
+                continue
+            print(f"{caminho:<28}" + ''.join(f'{tempos[caminho]:>11.1f} ms' for tempos in cenarios.values()))
+        totais = {nome: sum(t for c, t in tempos.items() if status[c][1] == 200) for nome, tempos in cenarios.items()}
+        print(f"{'total':<28}" + ''.join(f'{total:>11.1f} ms' for total in totais.values()))
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmarks das rotas mais usadas, com baseline em JSON
+
+Para cada escala de dados popula um banco novo (SQLite temporário ou o
+PostgreSQL informado em --postgres) com a clínica sintética do `flask seed`
+(app/dados_sinteticos.py), autentica um usuário de cada papel e mede
+latência p50/p95 e consultas SQL por requisição de cada cenário. O resultado é
+comparado com benchmarks/baseline.json: o script termina com código 1 se algum
+cenário ficar mais lento que a tolerância ou fizer mais consultas. Cada rodada
+roda em um processo novo e vale a melhor latência entre as rodadas.
+
+Uso:
+    python benchmarks/suite.py                              # compara com o baseline
+    python benchmarks/suite.py --escalas pequena --cenarios login paciente_horarios
+    python benchmarks/suite.py --atualizar                  # grava o baseline
+    python benchmarks/suite.py --postgres postgresql://localhost/bench_mentalize
+
+O banco do --postgres é apagado e recriado: use um banco dedicado.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from itertools import count
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from sqlalchemy import event, select
+from app import create_app, dados_sinteticos, db
+from app.models import Usuario, Psicologo, Paciente, Prontuario
+from config import config, TestingConfig
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SENHA = 'senha123'
+
+# psicólogos, pacientes e anos de histórico da clínica gerada por app.dados_sinteticos (o mesmo do `flask seed`)
+ESCALAS = {
+    'pequena': (2, 20, 0.1),
+    'media': (5, 300, 0.5),
+    'grande': (10, 2000, 3),
+}
+
+def proximo_dia_util(dias=1):
+    dia = date.today() + timedelta(days=dias)
+    while dia.weekday() > 4:
+        dia += timedelta(days=1)
+    return dia
+
+def criar_app(uri):
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'LOGIN_LIMITE_ATIVO': False,
+        'COMPRESSAO_ATIVA': False,
+    })
+    return create_app('benchmark')
+
+def popular(escala, semente=42):
+    """Popula o banco com a clínica sintética da escala informada e as contas usadas nos cenários"""
+    total_psicologos, total_pacientes, anos = ESCALAS[escala]
+    dados_sinteticos.gerar(total_psicologos, total_pacientes, anos, semente=semente, senha=SENHA)
+
+    # O gerador desativa alguns usuários: o psicólogo e o paciente com histórico precisam fazer login
+    psicologo_id, email_psicologo = db.session.execute(
+        select(Psicologo.id, Usuario.email).join(Usuario, Usuario.id == Psicologo.usuario_id)
+        .where(Usuario.ativo.is_(True)).order_by(Psicologo.id)
+    ).first()
+    paciente_id, email_paciente = db.session.execute(
+        select(Paciente.id, Usuario.email).join(Usuario, Usuario.id == Paciente.usuario_id)
+        .join(Prontuario, Prontuario.paciente_id == Paciente.id)
+        .where(Prontuario.psicologo_id == psicologo_id, Usuario.ativo.is_(True)).order_by(Prontuario.id)
+    ).first()
+
+    # O gerador não cria admin; o paciente sem agendamentos anteriores é quem agenda no cenário de agendamento
+    admin = Usuario(nome_completo='Admin Benchmark', email='admin@bench.com', tipo_usuario='admin')
+    agenda = Usuario(nome_completo='Paciente Benchmark', email='agenda@bench.com', tipo_usuario='paciente')
+    for usuario in (admin, agenda):
+        usuario.set_senha(SENHA)
+    db.session.add_all([admin, agenda])
+    db.session.flush()
+    db.session.add(Paciente(usuario_id=agenda.id))
+    db.session.commit()
+
+    return {'psicologo_id': psicologo_id, 'paciente_id': paciente_id, 'email_login': email_paciente,
+            'credenciais': {'admin': (admin.email, 'admin'), 'psicologo': (email_psicologo, 'psicologo'),
+                            'paciente': (agenda.email, 'paciente')}}
+
+def _agendar(cliente, contexto):
+    """Um horário diferente a cada chamada, a partir de um ano no futuro"""
+    n = next(contexto['horarios_livres'])
+    dia = proximo_dia_util(365 + n // 10)
+    return cliente.post('/paciente/agendar_modal', data={
+        'psicologo_id': contexto['psicologo_id'], 'data': dia.isoformat(), 'horario': f'{8 + n % 10:02d}:00'
+    })
+
+# nome: (perfil, requisição, dialetos em que roda)
+CENARIOS = {
+    'login': ('anonimo', lambda c, ctx: c.post('/auth/api/login', json={
+        'email': ctx['email_login'], 'senha': SENHA, 'tipo_usuario': 'paciente'}), None),
+    'paciente_psicologos': ('paciente', lambda c, ctx: c.get('/paciente/api/psicologos'), None),
+    'paciente_horarios': ('paciente', lambda c, ctx: c.get(
+        f"/paciente/api/horarios-disponiveis?psicologo_id={ctx['psicologo_id']}&data={proximo_dia_util(7).isoformat()}"),
+        None),
+    'paciente_agendar': ('paciente', _agendar, None),
+    'psicologo_dashboard': ('psicologo', lambda c, ctx: c.get('/psicologo/dashboard'), None),
+    'psicologo_calendario': ('psicologo', lambda c, ctx: c.get('/psicologo/calendario'), None),
+    'psicologo_prontuarios': ('psicologo', lambda c, ctx: c.get('/psicologo/prontuarios'), None),
+    'psicologo_prontuario': ('psicologo', lambda c, ctx: c.get(f"/psicologo/prontuario/{ctx['paciente_id']}"), None),
+    # to_char: o dashboard administrativo só funciona no PostgreSQL
+    'admin_dashboard': ('admin', lambda c, ctx: c.get('/admin/dashboard'), ('postgresql',)),
+    'admin_pacientes': ('admin', lambda c, ctx: c.get('/admin/listar-pacientes'), None),
+    'admin_psicologos': ('admin', lambda c, ctx: c.get('/admin/listar-psicologos'), None),
+    'admin_agendamentos': ('admin', lambda c, ctx: c.get('/admin/agendamentos'), None),
+}
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] * 1000
+
+def medir_escala(uri, escala, nomes, iteracoes, aquecimento):
+    app = criar_app(uri)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        contexto = popular(escala)
+        dialeto = db.engine.dialect.name
+        engine = db.engine
+    contexto['horarios_livres'] = count()
+
+    clientes = {'anonimo': app.test_client()}
+    for perfil, (email, tipo) in contexto['credenciais'].items():
+        clientes[perfil] = app.test_client()
+        response = clientes[perfil].post('/auth/api/login', json={'email': email, 'senha': SENHA, 'tipo_usuario': tipo})
+        assert response.status_code == 200, f'login de {email} falhou'
+
+    consultas = []
+
+    def registrar(*args):
+        consultas.append(1)
+
+    event.listen(engine, 'before_cursor_execute', registrar)
+    resultados = {}
+    try:
+        for nome in nomes:
+            perfil, requisicao, dialetos = CENARIOS[nome]
+            if dialetos and dialeto not in dialetos:
+                continue
+            cliente = clientes[perfil]
+            for _ in range(aquecimento):
+                requisicao(cliente, contexto).close()
+            tempos, por_requisicao = [], []
+            for _ in range(iteracoes):
+                consultas.clear()
+                inicio = time.perf_counter()
+                response = requisicao(cliente, contexto)
+                response.get_data()
+                tempos.append(time.perf_counter() - inicio)
+                por_requisicao.append(len(consultas))
+                if response.status_code >= 400:
+                    raise RuntimeError(f'{nome}: status {response.status_code}')
+            resultados[nome] = {
+                'p50_ms': round(percentil(tempos, 0.50), 3),
+                'p95_ms': round(percentil(tempos, 0.95), 3),
+                'consultas': max(por_requisicao),
+            }
+    finally:
+        event.remove(engine, 'before_cursor_execute', registrar)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+    return dialeto, resultados
+
+def comparar(atual, baseline, tolerancia, piso_ms, tolerancia_consultas):
+    """Lista de regressões: p50 acima de baseline * (1 + tolerância) + piso ou consultas a mais
+
+    Os dados são gerados em torno da data atual, então o número de consultas das
+    páginas de agenda varia um pouco de um dia para outro; um N+1 novo o multiplica.
+    """
+    regressoes = []
+    for chave, medida in atual.items():
+        anterior = baseline.get(chave)
+        if not anterior:
+            continue
+        if medida['consultas'] > anterior['consultas'] * (1 + tolerancia_consultas):
+            regressoes.append(f"{chave}: {anterior['consultas']} -> {medida['consultas']} consultas")
+        # p95 é registrado, mas com poucas iterações é ruidoso demais para reprovar a execução
+        limite = anterior['p50_ms'] * (1 + tolerancia) + piso_ms
+        if medida['p50_ms'] > limite:
+            regressoes.append(f"{chave}: p50 {anterior['p50_ms']:.2f} -> {medida['p50_ms']:.2f} ms")
+    return regressoes
+
+def medir(args):
+    """Mede todas as escalas pedidas em bancos novos; chaves '<dialeto>/<escala>/<cenário>'"""
+    atual = {}
+    for escala in args.escalas:
+        caminho_db = None
+        uri = args.postgres
+        if not uri:
+            fd, caminho_db = tempfile.mkstemp(suffix='.db')
+            os.close(fd)
+            uri = f'sqlite:///{caminho_db}'
+        try:
+            dialeto, resultados = medir_escala(uri, escala, args.cenarios, args.iteracoes, args.aquecimento)
+        finally:
+            if caminho_db:
+                os.unlink(caminho_db)
+        for nome, medida in resultados.items():
+            atual[f'{dialeto}/{escala}/{nome}'] = medida
+    return atual
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks das rotas principais com baseline em JSON')
+    parser.add_argument('--escalas', nargs='+', choices=ESCALAS, default=list(ESCALAS))
+    parser.add_argument('--cenarios', nargs='+', choices=CENARIOS, default=list(CENARIOS))
+    parser.add_argument('--iteracoes', type=int, default=20)
+    parser.add_argument('--aquecimento', type=int, default=3)
+    parser.add_argument('--rodadas', type=int, default=3, help='processos independentes; vale a melhor latência')
+    parser.add_argument('--rodada', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--postgres', help='URL de um PostgreSQL dedicado (é recriado)')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--atualizar', action='store_true', help='grava os resultados como novo baseline')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='aumento relativo de latência aceito')
+    parser.add_argument('--piso-ms', type=float, default=1.0, help='aumento absoluto sempre aceito (ruído)')
+    parser.add_argument('--tolerancia-consultas', type=float, default=0.1, help='aumento relativo de consultas aceito')
+    args = parser.parse_args()
+
+    if args.rodada:
+        # Processo filho de --rodadas: só mede e devolve o JSON
+        print(json.dumps(medir(args)))
+        return
+
+    atual = {}
+    for _ in range(args.rodadas):
+        comando = [sys.executable, os.path.abspath(__file__), '--rodada', '--escalas', *args.escalas,
+                   '--cenarios', *args.cenarios, '--iteracoes', str(args.iteracoes),
+                   '--aquecimento', str(args.aquecimento)] + (['--postgres', args.postgres] if args.postgres else [])
+        processo = subprocess.run(comando, capture_output=True, text=True)
+        if processo.returncode != 0:
+            sys.exit(processo.stderr)
+        for chave, medida in json.loads(processo.stdout.strip().splitlines()[-1]).items():
+            # Melhor latência entre as rodadas: a variação entre processos é maior que a de uma mudança pequena
+            anterior = atual.setdefault(chave, medida)
+            for metrica in ('p50_ms', 'p95_ms'):
+                anterior[metrica] = min(anterior[metrica], medida[metrica])
+            anterior['consultas'] = max(anterior['consultas'], medida['consultas'])
+
+    print(f"{'cenário':<42}{'p50 ms':>10}{'p95 ms':>10}{'SQL':>6}")
+    for chave, medida in atual.items():
+        print(f"{chave:<42}{medida['p50_ms']:>10.2f}{medida['p95_ms']:>10.2f}{medida['consultas']:>6}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.atualizar:
+        baseline.update(atual)
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+        print(f'\nBaseline gravado em {args.baseline}')
+        return
+
+    regressoes = comparar(atual, baseline, args.tolerancia, args.piso_ms, args.tolerancia_consultas)
+    if regressoes:
+        print('\nRegressões em relação ao baseline:')
+        for regressao in regressoes:
+            print(f'  {regressao}')
+        sys.exit(1)
+    print('\nNenhuma regressão em relação ao baseline.')
+
+if __name__ == '__main__':
+    main()
@@ -10,14 +10,111 @@ class Config:
     # Normalizar URI do PostgreSQL caso venha com prefixo antigo
     if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith("postgres://"):
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace("postgres://", "postgresql://", 1)
-    # Opções de engine para conexões mais estáveis (útil em ambientes cloud)
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,    # verifica conexão antes de usar
-        'pool_recycle': 300       # recicla conexões após 5 minutos
-    }
+    # Pool de conexões (as opções do engine são montadas em app/banco.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))   # recicla conexões após 5 minutos
+    # 'fila' (QueuePool) ou 'transacao' (NullPool, para PgBouncer em modo transaction)
+    DB_POOL_MODO = os.environ.get('DB_POOL_MODO', 'fila')
+    # Limite de duração de cada comando no PostgreSQL (0 = sem limite)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # Ping só em conexões ociosas há mais de N segundos; DB_POOL_PRE_PING=true volta ao ping em todo checkout
+    DB_PING_OCIOSO = float(os.environ.get('DB_PING_OCIOSO', 30))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'false').lower() == 'true'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-chave-desenvolvimento'
-    JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hora    # Configurações da clínica
+    JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hora
+    # Cache local dos usuários autenticados (evita consultar o usuário a cada requisição). Alterações invalidam
+    # o cache na hora só no worker que as fez; nos demais a cópia antiga vale até o TTL (segundos) expirar
+    CACHE_IDENTIDADE_TTL = int(os.environ.get('CACHE_IDENTIDADE_TTL', 5))
+    CACHE_IDENTIDADE_TAMANHO = int(os.environ.get('CACHE_IDENTIDADE_TAMANHO', 1024))
+    # Hash de senhas: método completo, com parâmetros (ex.: pbkdf2:sha256:600000 ou scrypt:32768:8:1).
+    # Hashes gerados com outros parâmetros são atualizados no próximo login.
+    SENHA_HASH_METODO = os.environ.get('SENHA_HASH_METODO') or 'pbkdf2:sha256:600000'
+    SENHA_HASH_THREADS = int(os.environ.get('SENHA_HASH_THREADS', 2))
+    SENHA_HASH_FILA_MAXIMA = int(os.environ.get('SENHA_HASH_FILA_MAXIMA', 16))
+    # Segundos que o login espera pelo hash antes de responder 503 (a thread da requisição fica bloqueada até lá)
+    SENHA_HASH_TIMEOUT = float(os.environ.get('SENHA_HASH_TIMEOUT', 10))
+    # Limite de tentativas de login (token bucket por IP e por e-mail)
+    LOGIN_LIMITE_ATIVO = os.environ.get('LOGIN_LIMITE_ATIVO', 'true').lower() == 'true'
+    LOGIN_LIMITE_RAJADA_IP = int(os.environ.get('LOGIN_LIMITE_RAJADA_IP', 20))
+    LOGIN_LIMITE_POR_MINUTO_IP = float(os.environ.get('LOGIN_LIMITE_POR_MINUTO_IP', 10))
+    LOGIN_LIMITE_RAJADA_EMAIL = int(os.environ.get('LOGIN_LIMITE_RAJADA_EMAIL', 5))
+    LOGIN_LIMITE_POR_MINUTO_EMAIL = float(os.environ.get('LOGIN_LIMITE_POR_MINUTO_EMAIL', 5))
+    # Arquivo SQLite compartilhado entre workers (ex.: /dev/shm/limite_login.db); vazio = memória do processo
+    LOGIN_LIMITE_SQLITE = os.environ.get('LOGIN_LIMITE_SQLITE')
+    # Quantidade de proxies reversos confiáveis que acrescentam o X-Forwarded-For
+    LOGIN_LIMITE_PROXIES = int(os.environ.get('LOGIN_LIMITE_PROXIES', 0))
+    # Inicialização: avisa no log quando o create_app passa do orçamento (cold start do Render)
+    INICIALIZACAO_ORCAMENTO_MS = int(os.environ.get('INICIALIZACAO_ORCAMENTO_MS', 500))
+    # Registra o Flask-Migrate (e carrega o Alembic) para os comandos `flask db`
+    MIGRACOES_ATIVAS = os.environ.get('MIGRACOES_ATIVAS', 'true').lower() == 'true'
+    LOG_NIVEL = os.environ.get('LOG_NIVEL', 'INFO')
+    # Uma linha por requisição (logger app.requisicoes) com id, perfil, status e tempos de banco e de templates;
+    # o formato (LOG_FORMATO=json|texto) é escolhido pelo ponto de entrada (json no wsgi.py, texto no app.py)
+    LOG_REQUISICOES = os.environ.get('LOG_REQUISICOES', 'true').lower() == 'true'
+    # Compressão dinâmica das respostas (brotli se o pacote estiver instalado, senão gzip)
+    COMPRESSAO_ATIVA = os.environ.get('COMPRESSAO_ATIVA', 'true').lower() == 'true'
+    COMPRESSAO_NIVEL = int(os.environ.get('COMPRESSAO_NIVEL', 6))
+    COMPRESSAO_NIVEL_BROTLI = int(os.environ.get('COMPRESSAO_NIVEL_BROTLI', 4))
+    COMPRESSAO_MINIMO = int(os.environ.get('COMPRESSAO_MINIMO', 1024))  # bytes
+    # Cache de fragmentos de template ({% cache %}): número máximo de fragmentos por processo
+    FRAGMENTOS_CACHE_ATIVO = os.environ.get('FRAGMENTOS_CACHE_ATIVO', 'true').lower() == 'true'
+    FRAGMENTOS_CACHE_TAMANHO = int(os.environ.get('FRAGMENTOS_CACHE_TAMANHO', 512))
+    # Bytecode dos templates em disco (padrão: instance/jinja), gerado no build por `flask templates compilar`
+    JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE', 'true').lower() == 'true'
+    JINJA_BYTECODE_PASTA = os.environ.get('JINJA_BYTECODE_PASTA')
+    # Listas longas transmitidas em blocos: linhas lidas por vez do cursor e tamanho de cada bloco enviado
+    TRANSMISSAO_LOTE = int(os.environ.get('TRANSMISSAO_LOTE', 500))
+    TRANSMISSAO_BLOCO = int(os.environ.get('TRANSMISSAO_BLOCO', 16384))  # caracteres
+    # Consultas SQL por requisição: cabeçalho Server-Timing e aviso no log acima dos limites
+    CONSULTAS_SERVER_TIMING = os.environ.get('CONSULTAS_SERVER_TIMING', 'true').lower() == 'true'
+    CONSULTAS_LIMITE_QUANTIDADE = int(os.environ.get('CONSULTAS_LIMITE_QUANTIDADE', 30))
+    CONSULTAS_LIMITE_TEMPO_MS = float(os.environ.get('CONSULTAS_LIMITE_TEMPO_MS', 500))
+    # O mesmo SQL com N ou mais parâmetros diferentes na mesma requisição é um provável N+1
+    CONSULTAS_N_MAIS_UM_MINIMO = int(os.environ.get('CONSULTAS_N_MAIS_UM_MINIMO', 5))
+    # Consultas acima de N ms ficam nas últimas CAPACIDADE registradas, com o EXPLAIN (página /admin/consultas-lentas)
+    CONSULTAS_LENTAS_ATIVO = os.environ.get('CONSULTAS_LENTAS_ATIVO', 'true').lower() == 'true'
+    CONSULTAS_LENTAS_MS = float(os.environ.get('CONSULTAS_LENTAS_MS', 200))
+    CONSULTAS_LENTAS_CAPACIDADE = int(os.environ.get('CONSULTAS_LENTAS_CAPACIDADE', 100))
+    CONSULTAS_LENTAS_EXPLAIN = os.environ.get('CONSULTAS_LENTAS_EXPLAIN', 'true').lower() == 'true'
+    # Endpoint /metrics (Prometheus); com PROMETHEUS_MULTIPROC_DIR agrega todos os workers do gunicorn
+    METRICAS_ATIVO = os.environ.get('METRICAS_ATIVO', 'true').lower() == 'true'
+    METRICAS_INTERVALO = float(os.environ.get('METRICAS_INTERVALO', 5))  # segundos entre cópias de pool/caches/memória
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')  # se definido, exige Authorization: Bearer <token>
+    METRICAS_EXIGIR_TOKEN = False  # com True, sem METRICAS_TOKEN o /metrics não é registrado
+    # /healthz (processo vivo, sem I/O) e /readyz (ping do banco com timeout, pool, caches, migrações e taxa de 5xx)
+    SAUDE_ATIVO = os.environ.get('SAUDE_ATIVO', 'true').lower() == 'true'
+    SAUDE_TIMEOUT_BANCO = float(os.environ.get('SAUDE_TIMEOUT_BANCO', 2))  # segundos
+    SAUDE_VALIDADE = float(os.environ.get('SAUDE_VALIDADE', 1))  # segundos em que o resultado do /readyz é reaproveitado
+    SAUDE_JANELA_ERROS = int(os.environ.get('SAUDE_JANELA_ERROS', 60))  # segundos considerados na taxa de erros
+    # Perfil de requisições sob demanda: cabeçalho X-Perfil de um admin (ou com o PERFIL_TOKEN) ou uma fração
+    # PERFIL_AMOSTRAGEM das requisições (opcionalmente só dos PERFIL_ENDPOINTS, separados por vírgula).
+    # Modos: cprofile (.pstats) ou amostragem (pilha a cada PERFIL_INTERVALO_MS, .speedscope.json)
+    PERFIL_ATIVO = os.environ.get('PERFIL_ATIVO', 'true').lower() == 'true'
+    PERFIL_MODO = os.environ.get('PERFIL_MODO', 'cprofile')
+    PERFIL_INTERVALO_MS = float(os.environ.get('PERFIL_INTERVALO_MS', 5))
+    PERFIL_AMOSTRAGEM = float(os.environ.get('PERFIL_AMOSTRAGEM', 0))
+    PERFIL_ENDPOINTS = [e.strip() for e in os.environ.get('PERFIL_ENDPOINTS', '').split(',') if e.strip()]
+    PERFIL_TOKEN = os.environ.get('PERFIL_TOKEN')
+    PERFIL_PASTA = os.environ.get('PERFIL_PASTA')  # padrão: instance/perfis
+    PERFIL_MAXIMO_ARQUIVOS = int(os.environ.get('PERFIL_MAXIMO_ARQUIVOS', 200))
+    # Snapshots de memória (tracemalloc) em /admin/memoria; o tracemalloc só é ligado quando o admin cria a base
+    MEMORIA_ATIVO = os.environ.get('MEMORIA_ATIVO', 'true').lower() == 'true'
+    MEMORIA_FRAMES = int(os.environ.get('MEMORIA_FRAMES', 5))  # quadros de pilha guardados por alocação
+    MEMORIA_TOP = int(os.environ.get('MEMORIA_TOP', 25))  # locais e tipos listados na diferença
+    # Rastreamento (spans de requisição, SQL, templates e caches) com os mesmos gatilhos do perfil:
+    # cabeçalho X-Rastro, RASTREAMENTO_TOKEN ou amostragem. Formato: chrome (trace events) ou otlp (OTLP/JSON)
+    RASTREAMENTO_ATIVO = os.environ.get('RASTREAMENTO_ATIVO', 'true').lower() == 'true'
+    RASTREAMENTO_FORMATO = os.environ.get('RASTREAMENTO_FORMATO', 'chrome')
+    RASTREAMENTO_AMOSTRAGEM = float(os.environ.get('RASTREAMENTO_AMOSTRAGEM', 0))
+    RASTREAMENTO_ENDPOINTS = [e.strip() for e in os.environ.get('RASTREAMENTO_ENDPOINTS', '').split(',') if e.strip()]
+    RASTREAMENTO_TOKEN = os.environ.get('RASTREAMENTO_TOKEN')
+    RASTREAMENTO_PASTA = os.environ.get('RASTREAMENTO_PASTA')  # padrão: instance/rastros
+    RASTREAMENTO_MAXIMO_ARQUIVOS = int(os.environ.get('RASTREAMENTO_MAXIMO_ARQUIVOS', 200))
+    
+    # Configurações da clínica
     CLINICA_NOME = "Clínica Mentalize"
     CLINICA_ENDERECO = "R. Progresso, 735 – Centro, Francisco Morato - SP, CEP 07901-080"
     CLINICA_EMAIL = "contato@clinicamentalize.com.br"
@@ -44,6 +141,24 @@ class ProductionConfig(Config):
     SECRET_KEY = os.environ.get('SECRET_KEY')
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     
+    # O Render encaminha as requisições por um proxy que acrescenta o X-Forwarded-For
+    LOGIN_LIMITE_PROXIES = int(os.environ.get('LOGIN_LIMITE_PROXIES', 1))
+    
+    # Nenhuma consulta de requisição deve segurar uma conexão por mais de 30s
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    
+    # Tempos de banco não são expostos aos clientes em produção
+    CONSULTAS_SERVER_TIMING = os.environ.get('CONSULTAS_SERVER_TIMING', 'false').lower() == 'true'
+    
+    # /metrics só existe com METRICAS_TOKEN definido: sem ele seria público
+    METRICAS_EXIGIR_TOKEN = True
+    
+    # Comandos de teste de escala (`flask seed`) recusam este banco, exceto com --forcar
+    BANCO_DE_PRODUCAO = True
+    
+    # O servidor web não usa migrações; defina MIGRACOES_ATIVAS=true para rodar `flask db`
+    MIGRACOES_ATIVAS = os.environ.get('MIGRACOES_ATIVAS', 'false').lower() == 'true'
+    
     # Configurações específicas do PostgreSQL
     if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith("postgres://"):
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace("postgres://", "postgresql://", 1)
@@ -53,6 +168,9 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    # Hash barato para não tornar a suíte de testes lenta
+    SENHA_HASH_METODO = 'pbkdf2:sha256:1000'
+    JINJA_BYTECODE_CACHE = False
 
 # Dicionário de configurações
 config = {
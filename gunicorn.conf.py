@@ -1,24 +1,56 @@
 # Configuração do Gunicorn para Render Free Tier
 import os
 
+# Perfil de worker (GUNICORN_PERFIL):
+#   sync    - 1 requisição por vez por worker (padrão: menor p99 no benchmarks/perfis_gunicorn.py,
+#             121 ms contra 378 ms do gthread, já que a carga é dominada por CPU e o GIL serializa as threads)
+#   gthread - N threads por worker; um dashboard lento não bloqueia os demais usuários
+#   gevent  - greenlets cooperativos; exige o pacote gevent (e psycogreen com PostgreSQL)
+perfil = os.environ.get('GUNICORN_PERFIL', 'sync')
+
+if perfil == 'gevent':
+    # O monkey patch precisa acontecer antes de o app ser carregado (preload_app)
+    from gevent import monkey
+    monkey.patch_all()
+
 # Configurações básicas
 bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"
-workers = 1  # Render Free tem limitação de memória
-worker_class = "sync"
-worker_connections = 1000
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))  # Render Free tem limitação de memória
+
+if perfil == 'gthread':
+    worker_class = "gthread"
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+elif perfil == 'gevent':
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+else:
+    worker_class = "sync"
 
 # Configurações de timeout - CRÍTICO para resolver WORKER TIMEOUT
 timeout = 120  # Aumenta de 30s para 120s
 keepalive = 5
-max_requests = 1000
-max_requests_jitter = 100
+# Reciclagem de workers pela memória (RSS) em vez de a cada 1000 requisições, que esvaziava os caches:
+#   limite suave  - o worker termina as requisições em andamento e é substituído
+#   limite rígido - emergência: o worker sai na hora, antes de o contêiner (512 MB) estourar
+# GUNICORN_MAX_REQUESTS continua disponível como rede de segurança (0 = desligado)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+rss_suave_mb = int(os.environ.get('GUNICORN_RSS_SUAVE_MB', 350))
+rss_rigido_mb = int(os.environ.get('GUNICORN_RSS_RIGIDO_MB', 450))
+
+# Métricas de todos os workers em /metrics: cada processo grava seus valores nesta pasta
+pasta_metricas = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if pasta_metricas:
+    # Precisa existir antes do preload_app, que já cria as métricas no master
+    os.makedirs(pasta_metricas, exist_ok=True)
 
 # Configurações de memória para Render Free
 preload_app = True  # Carrega app antes de fazer fork dos workers
 worker_tmp_dir = "/dev/shm"  # Usa RAM para arquivos temporários
 
 # Logs
-accesslog = "-"  # stdout
+# Com LOG_FORMATO=json (padrão) a aplicação já registra cada requisição (logger app.requisicoes), com mais detalhes
+accesslog = "-" if os.environ.get('LOG_FORMATO', 'json') == 'texto' else None
 errorlog = "-"   # stderr
 loglevel = "info"
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
@@ -31,4 +63,59 @@ group = None
 tmp_upload_dir = None
 
 # Configurações de graceful restart
-graceful_timeout = 30
\ No newline at end of file
+graceful_timeout = 30
+
+def on_starting(server):
+    """Limpa as métricas da execução anterior (os arquivos são por PID)"""
+    if not pasta_metricas:
+        return
+    for nome in os.listdir(pasta_metricas):
+        if nome.endswith('.db'):
+            os.remove(os.path.join(pasta_metricas, nome))
+
+def child_exit(server, worker):
+    """Remove os gauges do worker encerrado; contadores e histogramas continuam somados"""
+    if pasta_metricas:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+def when_ready(server):
+    """Carrega os templates no master: workers novos e reciclados já os herdam compilados"""
+    if not preload_app:
+        return
+    from app import precompilacao
+    from wsgi import app
+    tempos = precompilacao.carregar_templates(app)
+    server.log.info("%d templates carregados em %.0f ms", len(tempos), sum(ms for _, ms in tempos))
+
+def post_fork(server, worker):
+    """Ajustes feitos em cada worker logo após o fork"""
+    if perfil == 'gevent':
+        try:
+            # Torna o psycopg2 cooperativo com o gevent
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen não instalado: consultas ao PostgreSQL bloquearão o worker gevent")
+
+    # Conexões abertas no master (preload_app) não podem ser compartilhadas com os workers
+    from app import db
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+def post_worker_init(worker):
+    """Liga a reciclagem por memória no worker (uma instância por processo)"""
+    from app.reciclagem import ReciclagemPorMemoria
+    worker.reciclagem = ReciclagemPorMemoria(
+        rss_suave_mb, rss_rigido_mb,
+        historico=int(os.environ.get('GUNICORN_ROTAS_RECENTES', 20)),
+        minimo_requisicoes=int(os.environ.get('GUNICORN_RSS_MINIMO_REQUISICOES', 20)),
+    )
+    worker.reciclagem.vigiar(worker)
+
+def post_request(worker, req, environ, resp):
+    """Guarda a rota atendida e recicla o worker se o RSS passou dos limites"""
+    reciclagem = getattr(worker, 'reciclagem', None)
+    if reciclagem is not None:
+        reciclagem.registrar(worker, req.method, req.path, resp.status_code)
@@ -6,6 +6,7 @@ Execute este script APENAS UMA VEZ após o primeiro deploy
 import os
 import sys
 from app import create_app, db
+from app.esquema import atualizar_esquema
 from app.models import Usuario
 from werkzeug.security import generate_password_hash
 
@@ -19,6 +20,10 @@ def init_database():
         try:
             print("🔧 Iniciando inicialização do banco de dados...")
             
+            # Colunas novas em tabelas existentes (o create_all não altera tabelas)
+            for coluna in atualizar_esquema(db.engine):
+                print(f"🔧 Coluna adicionada: {coluna}")
+            
             # Verificar se já existe usuário admin primeiro (evita recriar)
             admin_email = 'admin@clinicamentalize.com.br'
             try:
@@ -1,7 +1,8 @@
 import pytest
 import tempfile
 import os
-from app import create_app, db
+from contextlib import contextmanager
+from app import create_app, db, contador_consultas
 from app.models import Usuario
 
 @pytest.fixture
@@ -32,17 +33,38 @@ def runner(app):
     """Fixture do runner CLI"""
     return app.test_cli_runner()
 
+def criar_admin():
+    """Cria o administrador de teste (também usado por benchmarks/carga.py)"""
+    admin = Usuario(
+        nome_completo='Admin Teste',
+        email='admin@teste.com',
+        telefone='(11) 99999-9999',
+        tipo_usuario='admin'
+    )
+    admin.set_senha('senha123')
+    db.session.add(admin)
+    db.session.commit()
+    return admin
+
 @pytest.fixture
 def admin_user(app):
     """Fixture para criar um usuário administrador de teste"""
     with app.app_context():
-        admin = Usuario(
-            nome_completo='Admin Teste',
-            email='admin@teste.com',
-            telefone='(11) 99999-9999',
-            tipo_usuario='admin'
-        )
-        admin.set_senha('senha123')
-        db.session.add(admin)
-        db.session.commit()
-        return admin
\ No newline at end of file
+        return criar_admin()
+
+@pytest.fixture
+def limite_consultas(app):
+    """Falha o teste se o bloco fizer mais consultas SQL que `maximo` ou tiver um provável N+1
+
+        with limite_consultas(8):
+            client.get('/psicologo/prontuarios')
+    """
+    @contextmanager
+    def limite(maximo, n_mais_um=True):
+        minimo = app.config['CONSULTAS_N_MAIS_UM_MINIMO']
+        with contador_consultas.contar() as consultas:
+            yield consultas
+        assert consultas.total <= maximo, f'Mais de {maximo} consultas: {consultas.resumo(minimo)}'
+        if n_mais_um:
+            assert not consultas.suspeitas_n_mais_um(minimo), consultas.resumo(minimo)
+    return limite
@@ -1,5 +1,16 @@
+import json
+import os
+import subprocess
+import sys
 import pytest
 from app import create_app, db
+from sqlalchemy import create_engine, inspect
+from app.esquema import COLUNAS_ADICIONADAS, atualizar_esquema
+from app.models import Usuario
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Orçamento do cold start (import + create_app) em um processo novo, como no Render
+ORCAMENTO_IMPORT_MS = 2000
 
 class TestApp:
     """Testes básicos da aplicação"""
@@ -50,4 +61,61 @@ class TestApp:
         assert response.status_code == 302  # Redirect para login
         
         response = client.get('/admin/dashboard')
-        assert response.status_code == 302  # Redirect para login
\ No newline at end of file
+        assert response.status_code == 302  # Redirect para login
+
+
+class TestInicializacao:
+    """Testes do tempo e dos efeitos colaterais da inicialização"""
+    
+    def test_fases_registradas(self):
+        """Testa se o create_app registra as fases dentro do orçamento configurado"""
+        app = create_app('testing')
+        fases = app.extensions['inicializacao']
+        assert [nome for nome, _ in fases.fases] == ['configuracao', 'extensoes', 'autenticacao', 'blueprints', 'modelos']
+        assert fases.total_ms < app.config['INICIALIZACAO_ORCAMENTO_MS']
+    
+    def test_import_wsgi_rapido_e_silencioso(self, tmp_path):
+        """Testa o cold start: sem prints, sem acesso ao banco, sem Alembic e dentro do orçamento"""
+        caminho_db = tmp_path / 'nao_criar.db'
+        script = (
+            "import json, sys, time\n"
+            "inicio = time.perf_counter()\n"
+            "import wsgi\n"
+            "total = (time.perf_counter() - inicio) * 1000\n"
+            "sys.stderr.write(json.dumps({'total_ms': total, 'alembic': 'alembic' in sys.modules}))\n"
+        )
+        env = dict(os.environ, FLASK_CONFIG='production', DATABASE_URL=f'sqlite:///{caminho_db}',
+                   SECRET_KEY='teste', JWT_SECRET_KEY='teste', LOG_NIVEL='WARNING')
+        processo = subprocess.run([sys.executable, '-c', script], cwd=RAIZ, env=env,
+                                  capture_output=True, text=True, check=True)
+        
+        resultado = json.loads(processo.stderr.strip().splitlines()[-1])
+        assert processo.stdout == ''
+        assert not caminho_db.exists()
+        assert resultado['alembic'] is False
+        assert resultado['total_ms'] < ORCAMENTO_IMPORT_MS
+    
+    def test_comando_bootstrap(self, app, runner):
+        """Testa se o bootstrap cria o administrador padrão uma única vez"""
+        runner.invoke(args=['bootstrap'])
+        result = runner.invoke(args=['bootstrap'])
+        assert 'Usuário já existe' in result.output
+        assert Usuario.query.filter_by(email='admin@clinicamentalize.com.br').count() == 1
+    
+    def test_colunas_adicionadas_em_banco_existente(self, tmp_path):
+        """Testa que o esquema de um banco antigo ganha as colunas novas, uma única vez"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+        tabelas = sorted({tabela for tabela, _, _ in COLUNAS_ADICIONADAS})
+        with engine.begin() as conexao:
+            for tabela in tabelas:
+                conexao.exec_driver_sql(f'CREATE TABLE {tabela} (id INTEGER PRIMARY KEY)')
+                conexao.exec_driver_sql(f'INSERT INTO {tabela} (id) VALUES (1)')
+        
+        assert atualizar_esquema(engine) == [f'{t}.{c}' for t, c, _ in COLUNAS_ADICIONADAS]
+        assert atualizar_esquema(engine) == []
+        with engine.connect() as conexao:
+            for tabela, coluna, _ in COLUNAS_ADICIONADAS:
+                assert coluna in {c['name'] for c in inspect(conexao).get_columns(tabela)}
+                # Linhas existentes recebem o valor padrão
+                assert conexao.exec_driver_sql(f'SELECT {coluna} FROM {tabela}').scalar() == 1
+        engine.dispose()
@@ -0,0 +1,112 @@
+import gzip
+import io
+import json
+import pytest
+from app import assets
+
+
+class TestAssets:
+    """Testes do pipeline de arquivos estáticos com hash"""
+
+    def criar_static(self, pasta):
+        (pasta / 'vendor' / 'lib' / 'css').mkdir(parents=True)
+        (pasta / 'vendor' / 'lib' / 'webfonts').mkdir(parents=True)
+        (pasta / 'js').mkdir()
+        (pasta / 'vendor' / 'lib' / 'webfonts' / 'fonte.woff2').write_bytes(b'\x00fonte')
+        (pasta / 'vendor' / 'lib' / 'css' / 'all.css').write_text(
+            '@font-face{src:url(../webfonts/fonte.woff2?v=1) format("woff2"),url(data:abc)}' * 20)
+        (pasta / 'js' / 'app.js').write_text('console.log("ok");\n' * 50)
+
+    def test_build_com_hash_e_compressao(self, tmp_path):
+        """Testa nomes por conteúdo, reescrita de url() no CSS e versões .gz"""
+        static = tmp_path / 'static'
+        self.criar_static(static)
+        manifesto = assets.construir(str(static))
+
+        dist = static / 'dist'
+        nome_js = manifesto['js/app.js']
+        assert nome_js.startswith('js/app.') and nome_js.endswith('.js') and nome_js != 'js/app.js'
+        assert gzip.decompress((dist / (nome_js + '.gz')).read_bytes()) == (static / 'js' / 'app.js').read_bytes()
+        # woff2 já é comprimido
+        assert not (dist / (manifesto['vendor/lib/webfonts/fonte.woff2'] + '.gz')).exists()
+
+        css = (dist / manifesto['vendor/lib/css/all.css']).read_text()
+        fonte = manifesto['vendor/lib/webfonts/fonte.woff2'].rsplit('/', 1)[1]
+        assert f'url(../webfonts/{fonte}?v=1)' in css
+        assert 'url(data:abc)' in css
+        assert json.loads((dist / 'manifest.json').read_text()) == manifesto
+
+        # O hash só muda quando o conteúdo muda
+        assert assets.construir(str(static)) == manifesto
+
+    def test_servir_com_cache_imutavel(self, app, client, tmp_path):
+        """Testa cabeçalhos de cache e a escolha da versão pré-comprimida"""
+        static = tmp_path / 'static'
+        self.criar_static(static)
+        manifesto = assets.construir(str(static))
+        app.config['ASSETS_DIST'] = str(static / 'dist')
+        assets.carregar_manifesto(app)
+
+        with app.test_request_context():
+            url = assets.asset_url('js/app.js')
+        assert url == '/assets/' + manifesto['js/app.js']
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.mimetype in ('application/javascript', 'text/javascript')
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'max-age=31536000' in response.headers['Cache-Control']
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data).startswith(b'console.log')
+
+        response = client.get(url)
+        assert 'Content-Encoding' not in response.headers
+        assert response.data.startswith(b'console.log')
+
+    def test_fallback_para_cdn_sem_vendor(self, app):
+        """Testa que, antes de `flask assets baixar`, a biblioteca vem da CDN fixada"""
+        with app.test_request_context():
+            url = assets.asset_url('vendor/chart.js/chart.umd.js')
+        assert url == 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js'
+
+    def test_integridade_nas_tags_da_cdn(self, app, client, monkeypatch):
+        """Testa que a tag que aponta para a CDN leva integrity/crossorigin e a cópia local não"""
+        caminho = 'vendor/bootstrap/js/bootstrap.bundle.min.js'
+        html = client.get('/').get_data(as_text=True)
+        assert (f'src="{assets.URLS_CDN[caminho]}" integrity="{assets.INTEGRIDADE_CDN[caminho]}" '
+                'crossorigin="anonymous"') in html
+
+        monkeypatch.setattr(assets.os.path, 'exists', lambda _: True)
+        with app.test_request_context():
+            assert assets.asset_url(caminho) == f'/static/{caminho}'
+            assert assets.integridade_cdn(caminho) == ''
+
+    def test_chartjs_apenas_no_dashboard(self, client):
+        """Testa que páginas sem gráficos não carregam o Chart.js"""
+        html = client.get('/').get_data(as_text=True)
+        assert 'chart.umd' not in html
+        assert 'npm/chart.js"' not in html
+
+    def test_baixar_vendor_confere_digests_fixados(self, tmp_path):
+        """Testa que o download confere o SHA-256 fixado e recusa conteúdo diferente"""
+        conteudos = {}
+
+        def abrir_url(url):
+            return io.BytesIO(conteudos.setdefault(url, url.encode()))
+
+        digests, integridade = assets.calcular_digests(abrir_url)
+        assert integridade['vendor/chart.js/chart.umd.js'] == assets.integridade_sri(
+            assets.URLS_CDN['vendor/chart.js/chart.umd.js'].encode())
+        sem_chart = {c: d for c, d in digests.items() if c != 'vendor/chart.js/chart.umd.js'}
+        baixados, sem_digest = assets.baixar_vendor(str(tmp_path), abrir_url, sem_chart)
+        assert 'vendor/bootstrap/css/bootstrap.min.css' in baixados
+        # Sem digest fixado o arquivo não é baixado e a página segue na CDN
+        assert sem_digest == ['vendor/chart.js/chart.umd.js']
+        assert not (tmp_path / 'vendor/chart.js/chart.umd.js').exists()
+
+        conteudos[assets.URLS_CDN['vendor/bootstrap/js/bootstrap.bundle.min.js']] = b'adulterado'
+        with pytest.raises(assets.DigestDivergente):
+            assets.baixar_vendor(str(tmp_path / 'outro'), abrir_url, digests)
+        # Nada é gravado quando algum arquivo diverge
+        assert not (tmp_path / 'outro').exists()
@@ -337,4 +337,343 @@ class TestAPIAuth:
     def test_api_logout_without_login(self, client):
         """Testa logout via API sem estar logado"""
         response = client.post('/auth/api/logout')
-        assert response.status_code == 302  # Redirecionamento para login
\ No newline at end of file
+        assert response.status_code == 302  # Redirecionamento para login
+
+class TestPerfilUsuario:
+    """Testes do carregamento do perfil do usuário logado"""
+    
+    def test_carregar_usuario_traz_perfil_na_mesma_consulta(self, app, usuario_paciente):
+        """Testa se o usuário e o perfil de paciente vêm de uma única consulta"""
+        from sqlalchemy import event
+        from app.auth.perfil import carregar_usuario
+        
+        usuario_id = Usuario.query.filter_by(email='paciente@teste.com').first().id
+        db.session.expunge_all()
+        
+        consultas = []
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            usuario = carregar_usuario(usuario_id)
+            assert usuario.paciente is not None
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+        
+        assert len(consultas) == 1
+    
+    def test_paciente_required_bloqueia_outros_tipos(self, client, usuario_admin):
+        """Testa se a área do paciente é negada para outros tipos de usuário"""
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(Usuario.query.filter_by(email='admin@teste.com.br').first().id)
+            sess['_fresh'] = True
+        
+        response = client.get('/paciente/dashboard', follow_redirects=True)
+        assert response.status_code == 200
+        assert 'Área restrita para pacientes' in response.get_data(as_text=True)
+
+
+class TestCacheIdentidade:
+    """Testes do cache de usuários autenticados"""
+    
+    def _nova_requisicao(self):
+        """Simula o início de outra requisição: o contexto de aplicação dos testes
+        mantém o usuário do Flask-Login em g e os objetos na sessão"""
+        from flask import g
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        db.session.expunge_all()
+    
+    def _login(self, client):
+        return client.post('/auth/login', data={
+            'email': 'paciente@teste.com',
+            'senha': 'senha123',
+            'tipo_usuario': 'paciente'
+        })
+    
+    def test_requisicao_autenticada_usa_cache(self, app, client, usuario_paciente):
+        """Testa se o usuário é servido do cache sem consultar o banco"""
+        self._login(client)
+        self._nova_requisicao()
+        client.get('/paciente/agendamentos')
+        cache = app.extensions['cache_identidade']
+        evitadas = cache.consultas_evitadas
+        
+        self._nova_requisicao()
+        response = client.get('/paciente/agendamentos')
+        assert response.status_code == 200
+        assert cache.consultas_evitadas == evitadas + 1
+    
+    def test_troca_de_senha_rejeita_outras_sessoes(self, app, usuario_paciente):
+        """Testa se sessões antigas são rejeitadas após a troca de senha"""
+        cliente_antigo = app.test_client()
+        cliente_atual = app.test_client()
+        self._login(cliente_antigo)
+        self._nova_requisicao()
+        self._login(cliente_atual)
+        
+        response = cliente_atual.post('/auth/alterar-senha', data={
+            'senha_atual': 'senha123',
+            'nova_senha': 'novasenha456',
+            'confirmar_nova_senha': 'novasenha456'
+        })
+        assert response.status_code == 302
+        
+        usuario = Usuario.query.filter_by(email='paciente@teste.com').first()
+        assert usuario.versao == 2
+        
+        self._nova_requisicao()
+        assert cliente_atual.get('/paciente/agendamentos').status_code == 200
+        self._nova_requisicao()
+        response = cliente_antigo.get('/paciente/agendamentos')
+        assert response.status_code == 302
+        assert '/auth/login' in response.headers['Location']
+    
+    def test_troca_de_senha_apos_mudanca_do_custo_do_hash(self, app, usuario_paciente):
+        """Testa se trocar a senha na requisição em que o hash antigo foi regerado ainda encerra as outras sessões"""
+        from sqlalchemy import update
+        from werkzeug.security import generate_password_hash
+        usuario_id = Usuario.query.filter_by(email='paciente@teste.com').first().id
+        cliente_antigo = app.test_client()
+        cliente_atual = app.test_client()
+        self._login(cliente_antigo)
+        self._nova_requisicao()
+        self._login(cliente_atual)
+        
+        # Hash gerado com o custo anterior (sem passar pelo ORM, que contaria como troca de senha)
+        db.session.execute(update(Usuario).where(Usuario.id == usuario_id).values(
+            senha_hash=generate_password_hash('senha123', method='pbkdf2:sha256:500')))
+        db.session.commit()
+        app.extensions['cache_identidade'].invalidar(usuario_id)
+        self._nova_requisicao()
+        # O check_senha da senha atual regera o hash antes do set_senha da nova senha
+        response = cliente_atual.post('/auth/alterar-senha', data={
+            'senha_atual': 'senha123',
+            'nova_senha': 'novasenha456',
+            'confirmar_nova_senha': 'novasenha456'
+        })
+        assert response.status_code == 302
+        
+        usuario = Usuario.query.filter_by(email='paciente@teste.com').first()
+        assert usuario.check_senha('novasenha456')
+        self._nova_requisicao()
+        assert cliente_atual.get('/paciente/agendamentos').status_code == 200
+        self._nova_requisicao()
+        response = cliente_antigo.get('/paciente/agendamentos')
+        assert response.status_code == 302
+        assert '/auth/login' in response.headers['Location']
+    
+    def test_cookie_lembrar_vale_so_na_versao_do_login(self, app, usuario_paciente):
+        """Testa se a sessão restaurada pelo cookie "lembrar-me" confere a versão do usuário"""
+        from flask import g
+        from flask_login import login_user
+        from flask_login.utils import encode_cookie
+        from app.auth.identidade import _gravar_versao_lembrada
+        usuario = Usuario.query.filter_by(email='paciente@teste.com').first()
+        with app.test_request_context('/auth/login', method='POST'):
+            login_user(usuario, remember=True)
+            response = _gravar_versao_lembrada(app.response_class())
+            lembrar = encode_cookie(str(usuario.id))
+        cookie_versao = next(c for c in response.headers.getlist('Set-Cookie') if c.startswith('lembrar_versao='))
+        versao = cookie_versao.split(';')[0].split('=', 1)[1]
+        assert 'HttpOnly' in cookie_versao
+        
+        def acessar(*cookies):
+            self._nova_requisicao()
+            cliente = app.test_client()
+            for nome, valor in cookies:
+                cliente.set_cookie(nome, valor)
+            return cliente.get('/paciente/agendamentos').status_code
+        
+        assert acessar(('remember_token', lembrar), ('lembrar_versao', versao)) == 200
+        # Cookie "lembrar-me" sem a versão (ou com a versão adulterada) não restaura a sessão
+        assert acessar(('remember_token', lembrar)) == 302
+        assert acessar(('remember_token', lembrar), ('lembrar_versao', versao[:-2] + 'xx')) == 302
+        
+        usuario = Usuario.query.filter_by(email='paciente@teste.com').first()
+        usuario.set_senha('novasenha456')
+        db.session.commit()
+        assert acessar(('remember_token', lembrar), ('lembrar_versao', versao)) == 302
+
+
+class TestHashSenhas:
+    """Testes do hash de senhas configurável"""
+    
+    def test_login_atualiza_hash_com_parametros_antigos(self, app, client):
+        """Testa se o hash é regerado no login quando os parâmetros mudam"""
+        from werkzeug.security import generate_password_hash
+        usuario = Usuario(
+            nome_completo='Paciente Antigo',
+            email='antigo@teste.com',
+            tipo_usuario='paciente',
+            senha_hash=generate_password_hash('senha123', method='pbkdf2:sha256:2000')
+        )
+        db.session.add(usuario)
+        db.session.commit()
+        
+        response = client.post('/auth/api/login', json={
+            'email': 'antigo@teste.com',
+            'senha': 'senha123',
+            'tipo_usuario': 'paciente'
+        })
+        assert response.status_code == 200
+        
+        db.session.expire_all()
+        usuario = Usuario.query.filter_by(email='antigo@teste.com').first()
+        assert usuario.senha_hash.startswith(app.config['SENHA_HASH_METODO'] + '$')
+        assert usuario.check_senha('senha123')
+        # Regerar o hash não conta como troca de senha
+        assert usuario.versao == 1
+    
+    @pytest.mark.parametrize('alteracao', [
+        lambda u: u.set_senha('novasenha456'),
+        lambda u: setattr(u, 'ativo', False),
+        lambda u: setattr(u, 'email', 'novo@teste.com'),
+        lambda u: setattr(u, 'tipo_usuario', 'admin'),
+    ], ids=['senha', 'ativo', 'email', 'tipo_usuario'])
+    def test_alteracao_apos_rehash_invalida_identidade(self, app, alteracao):
+        """Testa que, com um hash do método anterior, uma alteração de identidade feita depois do
+        rehash no mesmo flush ainda incrementa a versão e tira o usuário do cache"""
+        from werkzeug.security import generate_password_hash
+        usuario = Usuario(nome_completo='Paciente Antigo', email='antigo@teste.com', tipo_usuario='paciente',
+                          senha_hash=generate_password_hash('senha123', method='pbkdf2:sha256:2000'))
+        db.session.add(usuario)
+        db.session.commit()
+        cache = app.extensions['cache_identidade']
+        cache.guardar(usuario)
+        
+        assert usuario.check_senha('senha123')
+        alteracao(usuario)
+        db.session.commit()
+        assert usuario.versao == 2
+        assert cache.obter(usuario.id, 1) is None
+    
+    def test_fila_cheia_recusa_login(self, app, client, usuario_admin):
+        """Testa se o login é recusado quando a fila de verificação está cheia"""
+        verificador = app.extensions['verificador_senhas']
+        vagas = verificador.threads + verificador.fila_maxima
+        for _ in range(vagas):
+            verificador._vagas.acquire()
+        try:
+            response = client.post('/auth/api/login', json={
+                'email': 'admin@teste.com.br',
+                'senha': 'senha123',
+                'tipo_usuario': 'admin'
+            })
+        finally:
+            for _ in range(vagas):
+                verificador._vagas.release()
+        
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
+    
+    def test_hash_demorado_responde_503(self, app, client, usuario_admin, monkeypatch):
+        """Testa se o tempo esgotado na verificação da senha vira 503, e não erro 500"""
+        import threading
+        import time
+        from app.auth import senhas
+        liberar = threading.Event()
+        monkeypatch.setattr(senhas, 'check_password_hash', lambda *_: liberar.wait(5))
+        verificador = app.extensions['verificador_senhas']
+        monkeypatch.setattr(verificador, 'timeout', 0.05)
+        try:
+            response = client.post('/auth/api/login', json={
+                'email': 'admin@teste.com.br',
+                'senha': 'senha123',
+                'tipo_usuario': 'admin'
+            })
+            assert response.status_code == 503
+            assert response.headers['Retry-After'] == '2'
+            
+            response = client.post('/auth/login', data={
+                'email': 'admin@teste.com.br',
+                'senha': 'senha123',
+                'tipo_usuario': 'admin'
+            })
+            assert response.status_code == 503
+        finally:
+            liberar.set()
+        # As vagas voltam quando os hashes pendentes terminam
+        for _ in range(100):
+            if verificador._vagas._value == verificador.threads + verificador.fila_maxima:
+                break
+            time.sleep(0.01)
+        assert verificador._vagas._value == verificador.threads + verificador.fila_maxima
+
+
+class TestLimitadorLogin:
+    """Testes do limite de tentativas de login"""
+    
+    def test_baldes_memoria_esgota_e_recarrega(self, monkeypatch):
+        """Testa o consumo e a recarga do token bucket em memória"""
+        from app.auth import limitador
+        relogio = [100.0]
+        monkeypatch.setattr(limitador.time, 'monotonic', lambda: relogio[0])
+        
+        baldes = limitador.BaldesMemoria(capacidade=2)
+        assert baldes.consumir('a', 2, 1.0)
+        assert baldes.consumir('a', 2, 1.0)
+        assert not baldes.consumir('a', 2, 1.0)
+        relogio[0] += 1
+        assert baldes.consumir('a', 2, 1.0)
+        
+        # A capacidade é fixa: chaves antigas são descartadas
+        baldes.consumir('b', 2, 1.0)
+        baldes.consumir('c', 2, 1.0)
+        assert len(baldes._baldes) == 2
+    
+    def test_baldes_sqlite_compartilhados(self, tmp_path):
+        """Testa se duas instâncias (workers) compartilham os baldes pelo arquivo"""
+        from app.auth.limitador import BaldesSQLite
+        caminho = str(tmp_path / 'limite.db')
+        worker_1 = BaldesSQLite(caminho)
+        worker_2 = BaldesSQLite(caminho)
+        
+        assert worker_1.consumir('ip:1.2.3.4', 2, 0.001)
+        assert worker_2.consumir('ip:1.2.3.4', 2, 0.001)
+        assert not worker_1.consumir('ip:1.2.3.4', 2, 0.001)
+    
+    @pytest.mark.parametrize('backend', ['memoria', 'sqlite'])
+    def test_email_bloqueado_nao_gasta_token_do_ip(self, tmp_path, backend):
+        """Testa que uma tentativa barrada pelo balde do e-mail não consome o balde do IP"""
+        from app.auth.limitador import BaldesMemoria, BaldesSQLite, LimitadorLogin
+        baldes = BaldesMemoria() if backend == 'memoria' else BaldesSQLite(str(tmp_path / 'limite.db'))
+        limitador = LimitadorLogin(baldes, rajada_ip=3, por_minuto_ip=0.001, rajada_email=1, por_minuto_email=0.001)
+        
+        assert limitador.permitir('1.2.3.4', 'vitima@teste.com.br')
+        for _ in range(10):
+            assert not limitador.permitir('1.2.3.4', 'Vitima@teste.com.br ')
+        # O IP ainda tem os dois tokens restantes para outros e-mails
+        assert limitador.permitir('1.2.3.4', 'outro@teste.com.br')
+        assert limitador.permitir('1.2.3.4')
+        assert not limitador.permitir('1.2.3.4', 'terceiro@teste.com.br')
+    
+    def test_api_login_acima_do_limite(self, app, client, usuario_admin):
+        """Testa se tentativas acima do limite são recusadas sem consultar o banco"""
+        from sqlalchemy import event
+        dados = {'email': 'admin@teste.com.br', 'senha': 'errada', 'tipo_usuario': 'admin'}
+        rajada = app.config['LOGIN_LIMITE_RAJADA_EMAIL']
+        for _ in range(rajada):
+            assert client.post('/auth/api/login', json=dados).status_code == 401
+        
+        consultas = []
+        def contar(*args):
+            consultas.append(args)
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            response = client.post('/auth/api/login', json=dados)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+        
+        assert response.status_code == 429
+        assert consultas == []
+    
+    def test_login_formulario_acima_do_limite(self, app, client):
+        """Testa a mensagem exibida no formulário quando o limite é atingido"""
+        dados = {'email': 'x@teste.com', 'senha': 'errada', 'tipo_usuario': 'paciente'}
+        for _ in range(app.config['LOGIN_LIMITE_RAJADA_EMAIL']):
+            client.post('/auth/login', data=dados)
+        
+        response = client.post('/auth/login', data=dados, follow_redirects=True)
+        assert 'Muitas tentativas de login' in response.get_data(as_text=True)
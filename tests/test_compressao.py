@@ -0,0 +1,104 @@
+import gzip
+import os
+import zlib
+from types import SimpleNamespace
+from flask import Response, stream_with_context
+from app import compressao
+from app.compressao import CompressaoMiddleware
+
+
+class TestCompressao:
+    """Testes da compressão dinâmica das respostas"""
+
+    def test_html_comprimido_com_gzip(self, client):
+        """Testa que páginas grandes são comprimidas quando o cliente aceita gzip"""
+        original = client.get('/')
+        response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) == len(response.data) < len(original.data)
+        assert gzip.decompress(response.data) == original.data
+
+    def test_sem_accept_encoding(self, client):
+        """Testa que clientes sem Accept-Encoding recebem a resposta original"""
+        response = client.get('/')
+        assert 'Content-Encoding' not in response.headers
+
+    def test_resposta_pequena_nao_comprimida(self, client):
+        """Testa o limite mínimo de tamanho"""
+        response = client.get('/api/status', headers={'Accept-Encoding': 'gzip'})
+        assert len(response.data) < 1024
+        assert 'Content-Encoding' not in response.headers
+
+    def test_tipo_fora_da_lista(self, app, client):
+        """Testa que apenas tipos da lista permitida são comprimidos"""
+        @app.route('/teste-binario')
+        def binario():
+            return Response(b'\x89PNG' * 1000, mimetype='image/png')
+
+        response = client.get('/teste-binario', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_streaming_comprimido_por_bloco(self, app, client):
+        """Testa a compressão de respostas geradas em streaming"""
+        @app.route('/teste-streaming')
+        def streaming():
+            def gerar():
+                for i in range(200):
+                    yield f'<tr><td>linha {i}</td></tr>\n'
+            return Response(stream_with_context(gerar()), mimetype='text/html')
+
+        response = client.get('/teste-streaming', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        html = gzip.decompress(response.data).decode()
+        assert html.count('<tr>') == 200
+
+    def test_blocos_decodificaveis_imediatamente(self):
+        """Testa que cada bloco do streaming já pode ser descomprimido pelo navegador"""
+        def wsgi_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/html')])
+            return iter([b'primeiro bloco', b'segundo bloco'])
+
+        middleware = CompressaoMiddleware(wsgi_app)
+        environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': 'gzip'}
+        blocos = iter(middleware(environ, lambda status, headers, exc_info=None: None))
+        descompressor = zlib.decompressobj(31)
+        assert descompressor.decompress(next(blocos)) == b'primeiro bloco'
+        assert descompressor.decompress(next(blocos)) == b'segundo bloco'
+
+    def test_range_em_arquivo_estatico(self, app, client):
+        """Testa que respostas parciais (206) saem sem compressão, com os bytes pedidos"""
+        with open(os.path.join(app.static_folder, 'js/phone-mask.js'), 'rb') as arquivo:
+            conteudo = arquivo.read()
+        assert len(conteudo) > 1500
+
+        response = client.get('/static/js/phone-mask.js',
+                              headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-1499'})
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == f'bytes 0-1499/{len(conteudo)}'
+        assert 'Content-Encoding' not in response.headers
+        assert response.data == conteudo[:1500]
+
+    def test_etag_fica_fraca(self, app, client):
+        """Testa que o ETag forte é convertido em fraco na versão comprimida"""
+        @app.route('/teste-etag')
+        def com_etag():
+            response = Response('x' * 5000, mimetype='text/plain')
+            response.set_etag('abc')
+            return response
+
+        response = client.get('/teste-etag', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['ETag'] == 'W/"abc"'
+
+    def test_brotli_preferido_quando_disponivel(self, monkeypatch):
+        """Testa a escolha do brotli quando o pacote está instalado e o cliente aceita"""
+        class Compressor:
+            def __init__(self, quality):
+                self.quality = quality
+
+        monkeypatch.setattr(compressao, 'brotli', SimpleNamespace(Compressor=Compressor))
+        middleware = CompressaoMiddleware(None, nivel_brotli=5)
+        assert middleware._escolher_codificacao({'HTTP_ACCEPT_ENCODING': 'gzip, deflate, br'})().nome == 'br'
+        assert middleware._escolher_codificacao({'HTTP_ACCEPT_ENCODING': 'gzip, br;q=0'})().nome == 'gzip'
+        assert middleware._escolher_codificacao({}) is None
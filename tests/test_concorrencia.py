@@ -0,0 +1,70 @@
+import pytest
+import threading
+from app import create_app, db
+from app.models import Usuario, Paciente
+from config import TestingConfig
+
+
+class TestConcorrencia:
+    """Testes de isolamento entre requisições simultâneas (workers gthread)"""
+
+    @pytest.fixture
+    def app(self, tmp_path, monkeypatch):
+        """Aplicação com banco em arquivo, acessível por várias threads"""
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'concorrencia.db'}")
+        app = create_app('testing')
+
+        with app.app_context():
+            db.create_all()
+            for i in range(8):
+                usuario = Usuario(
+                    nome_completo=f'Paciente Concorrente {i}',
+                    email=f'paciente{i}@teste.com',
+                    tipo_usuario='paciente'
+                )
+                usuario.set_senha('senha123')
+                db.session.add(usuario)
+                db.session.flush()
+                db.session.add(Paciente(usuario_id=usuario.id))
+            db.session.commit()
+
+        # Sem contexto de aplicação externo: cada requisição cria o seu, como no gunicorn
+        yield app
+
+        with app.app_context():
+            db.drop_all()
+
+    def test_sessao_e_usuario_isolados_por_thread(self, app):
+        """Testa se cada thread enxerga apenas o próprio usuário e sessão do banco"""
+        total = 8
+        barreira = threading.Barrier(total)
+        erros = []
+
+        def usuario_simulado(i):
+            try:
+                client = app.test_client()
+                response = client.post('/auth/api/login', json={
+                    'email': f'paciente{i}@teste.com',
+                    'senha': 'senha123',
+                    'tipo_usuario': 'paciente'
+                })
+                assert response.status_code == 200
+
+                barreira.wait()
+                for _ in range(5):
+                    response = client.get('/paciente/perfil')
+                    assert response.status_code == 200
+                    html = response.get_data(as_text=True)
+                    assert f'paciente{i}@teste.com' in html
+                    outros = [j for j in range(total) if j != i and f'paciente{j}@teste.com' in html]
+                    assert outros == []
+            except Exception as e:
+                erros.append((i, e))
+
+        threads = [threading.Thread(target=usuario_simulado, args=(i,)) for i in range(total)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert erros == []
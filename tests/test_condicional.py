@@ -0,0 +1,113 @@
+import pytest
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import event
+from flask import g
+from app import db
+from app.models import Usuario, Psicologo, Paciente, Agendamento, HorarioAtendimento
+
+
+class TestRequisicoesCondicionais:
+    """Testes de ETag/304 nas APIs consultadas repetidamente pelos modais"""
+
+    @pytest.fixture
+    def dados(self, app):
+        """Psicólogo com horário às segundas e um paciente"""
+        usuario_psi = Usuario(nome_completo='Dra. Ana', email='ana@teste.com', tipo_usuario='psicologo')
+        usuario_psi.set_senha('senha123')
+        usuario_pac = Usuario(nome_completo='Paulo Paciente', email='paulo@teste.com', tipo_usuario='paciente')
+        usuario_pac.set_senha('senha123')
+        db.session.add_all([usuario_psi, usuario_pac])
+        db.session.flush()
+        psicologo = Psicologo(usuario_id=usuario_psi.id)
+        paciente = Paciente(usuario_id=usuario_pac.id)
+        db.session.add_all([psicologo, paciente])
+        db.session.flush()
+        db.session.add(HorarioAtendimento(psicologo_id=psicologo.id, dia_semana=0,
+                                          hora_inicio=time(9), hora_fim=time(12)))
+        db.session.commit()
+        segunda = date.today() + timedelta(days=7 - date.today().weekday())
+        return {'psicologo_id': psicologo.id, 'paciente_id': paciente.id, 'segunda': segunda}
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def contar_consultas(self, funcao):
+        consultas = []
+
+        def registrar(conn, cursor, statement, *args):
+            consultas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            response = funcao()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+        return response, consultas
+
+    def test_psicologos_304_com_uma_consulta(self, client, dados):
+        """Testa que a revalidação da lista de psicólogos custa uma consulta"""
+        self.login(client, 'paulo@teste.com', 'paciente')
+        response = client.get('/paciente/api/psicologos')
+        assert response.status_code == 200
+        assert 'private' in response.headers['Cache-Control']
+        etag = response.headers['ETag']
+
+        response, consultas = self.contar_consultas(
+            lambda: client.get('/paciente/api/psicologos', headers={'If-None-Match': etag}))
+        assert response.status_code == 304
+        assert response.data == b''
+        assert len(consultas) == 1
+
+    def test_horarios_mudam_com_novo_agendamento(self, client, dados):
+        """Testa que um agendamento do psicólogo invalida o ETag dos horários"""
+        self.login(client, 'paulo@teste.com', 'paciente')
+        url = f"/paciente/api/horarios-disponiveis?psicologo_id={dados['psicologo_id']}&data={dados['segunda'].isoformat()}"
+        response = client.get(url)
+        assert response.get_json()['horarios'] == ['09:00', '10:00', '11:00']
+        etag = response.headers['ETag']
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        db.session.add(Agendamento(paciente_id=dados['paciente_id'], psicologo_id=dados['psicologo_id'],
+                                   data_hora=datetime.combine(dados['segunda'], time(10)), status='agendado'))
+        db.session.commit()
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()['horarios'] == ['09:00', '11:00']
+        assert response.headers['ETag'] != etag
+
+    def test_etag_fraco_aceito(self, client, dados):
+        """Testa a revalidação com o ETag fraco produzido pela compressão"""
+        self.login(client, 'paulo@teste.com', 'paciente')
+        etag = client.get('/paciente/api/psicologos').headers['ETag']
+        response = client.get('/paciente/api/psicologos', headers={'If-None-Match': 'W/' + etag})
+        assert response.status_code == 304
+
+    def test_historico_muda_com_anotacao(self, client, dados):
+        """Testa o ETag do histórico do paciente antes e depois de uma nova anotação"""
+        db.session.add(Agendamento(paciente_id=dados['paciente_id'], psicologo_id=dados['psicologo_id'],
+                                   data_hora=datetime.combine(dados['segunda'], time(9)), status='agendado'))
+        db.session.commit()
+        self.login(client, 'ana@teste.com', 'psicologo')
+        url = f"/psicologo/paciente/{dados['paciente_id']}/historico"
+
+        etag = client.get(url).headers['ETag']
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        response = client.post(f"/psicologo/paciente/{dados['paciente_id']}/anotacao",
+                               json={'anotacoes': 'Primeira sessão'})
+        assert response.status_code == 200
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert len(response.get_json()['sessoes']) == 1
+
+    def test_exclusao_em_massa_de_horarios_incrementa_versao(self, client, dados):
+        """Testa que regravar os horários (exclusão em massa) muda a versão do psicólogo"""
+        versao = db.session.get(Psicologo, dados['psicologo_id']).versao
+        self.login(client, 'ana@teste.com', 'psicologo')
+        client.post('/psicologo/horarios-atendimento', data={})
+        db.session.expire_all()
+        assert db.session.get(Psicologo, dados['psicologo_id']).versao > versao
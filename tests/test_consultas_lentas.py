@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime, timedelta
+from flask import g
+from app import db
+from app.consultas_lentas import RegistroConsultasLentas, formato_parametros, normalizar_sql
+from app.models import Usuario, Psicologo, Paciente, Agendamento
+
+
+class TestRegistroConsultasLentas:
+    """Testes do buffer de consultas lentas"""
+
+    def test_normaliza_sql(self):
+        """Testa espaços e listas de IN expandidas"""
+        sql = 'SELECT id\n  FROM agendamentos\n WHERE status IN (?, ?,  ?) AND id = ?'
+        assert normalizar_sql(sql) == 'SELECT id FROM agendamentos WHERE status IN (...) AND id = ?'
+        assert normalizar_sql('WHERE id IN (%(id_1_1)s, %(id_1_2)s)') == 'WHERE id IN (...)'
+
+    def test_formato_dos_parametros_sem_valores(self):
+        """Testa que só os tipos dos parâmetros são guardados"""
+        assert formato_parametros(('ana@teste.com', 3)) == ['str', 'int']
+        assert formato_parametros({'email': 'ana@teste.com'}) == {'email': 'str'}
+        assert formato_parametros([(1,), (2,)], executemany=True) == {'execucoes': 2, 'parametros': ['int']}
+
+    def test_buffer_circular(self, app):
+        """Testa que só as últimas consultas ficam guardadas"""
+        registro = RegistroConsultasLentas(db.engine, capacidade=3, explicar=False)
+        for i in range(5):
+            registro.registrar(f'SELECT {i}', (), 0.5)
+        assert [entrada['sql'] for entrada in registro.entradas()] == ['SELECT 4', 'SELECT 3', 'SELECT 2']
+
+
+class TestPaginaConsultasLentas:
+    """Testes da captura com EXPLAIN e da página do admin"""
+
+    @pytest.fixture
+    def registro(self, app, admin_user):
+        usuario = Usuario(nome_completo='Dra. Ana', email='ana@teste.com', tipo_usuario='psicologo')
+        usuario.set_senha('senha123')
+        paciente_usuario = Usuario(nome_completo='Paulo', email='paulo@teste.com', tipo_usuario='paciente')
+        paciente_usuario.set_senha('senha123')
+        db.session.add_all([usuario, paciente_usuario])
+        db.session.flush()
+        psicologo = Psicologo(usuario_id=usuario.id)
+        paciente = Paciente(usuario_id=paciente_usuario.id)
+        db.session.add_all([psicologo, paciente])
+        db.session.flush()
+        db.session.add(Agendamento(paciente_id=paciente.id, psicologo_id=psicologo.id,
+                                   data_hora=datetime.now() + timedelta(days=1)))
+        db.session.commit()
+
+        registro = app.extensions['consultas_lentas']
+        registro.limpar()
+        registro.limite_ms = 0  # todas as consultas entram no registro
+        return registro
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def test_captura_rota_e_plano(self, client, registro):
+        """Testa que o filtro por data (func.date) aparece com o plano de varredura completa"""
+        self.login(client, 'admin@teste.com', 'admin')
+        client.get('/admin/agendamentos?data_inicio=2024-01-01').get_data()
+        registro.aguardar()
+
+        entradas = [e for e in registro.entradas() if 'date(agendamentos.data_hora)' in e['sql']]
+        assert entradas
+        entrada = entradas[0]
+        assert entrada['rota'] == 'GET /admin/agendamentos'
+        assert entrada['endpoint'] == 'admin.agendamentos'
+        assert 'SCAN agendamentos' in entrada['plano']
+        # O próprio EXPLAIN não entra no registro
+        assert not any(e['sql'].startswith('EXPLAIN') for e in registro.entradas())
+
+    def test_pagina_e_exportacao(self, client, registro):
+        """Testa a página do admin e o JSON exportado"""
+        self.login(client, 'admin@teste.com', 'admin')
+        html = client.get('/admin/consultas-lentas').get_data(as_text=True)
+        assert 'Consultas Lentas' in html
+        assert 'FROM usuarios' in html
+
+        response = client.get('/admin/consultas-lentas.json')
+        assert response.status_code == 200
+        assert 'attachment' in response.headers['Content-Disposition']
+        dados = response.get_json()
+        assert dados['dialeto'] == 'sqlite'
+        assert dados['consultas'] and all(c['plano'] or c['erro_plano'] or not c['sql'].startswith('SELECT')
+                                          for c in dados['consultas'])
+        # Valores dos parâmetros (como o e-mail do login) nunca são guardados
+        assert 'admin@teste.com' not in response.get_data(as_text=True)
+
+    def test_somente_admin(self, client, registro):
+        """Testa que outros perfis não acessam a página"""
+        self.login(client, 'ana@teste.com', 'psicologo')
+        assert client.get('/admin/consultas-lentas').status_code in (302, 403)
+        assert client.get('/admin/consultas-lentas.json').status_code in (302, 403)
@@ -0,0 +1,137 @@
+import logging
+import threading
+import pytest
+from datetime import datetime, timedelta
+from flask import g
+from app import db, contador_consultas
+from app.models import Usuario, Psicologo, Paciente, Agendamento
+
+
+class TestContadorConsultas:
+    """Testes da contagem de consultas SQL por requisição e da detecção de N+1"""
+
+    @pytest.fixture
+    def clinica(self, app):
+        """Um psicólogo com oito pacientes, cada um com consultas passadas e futuras"""
+        usuario = Usuario(nome_completo='Dra. Ana', email='ana@teste.com', tipo_usuario='psicologo')
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        psicologo = Psicologo(usuario_id=usuario.id)
+        db.session.add(psicologo)
+        db.session.flush()
+        agora = datetime.utcnow().replace(microsecond=0)
+        for i in range(8):
+            paciente_usuario = Usuario(nome_completo=f'Paciente {i}', email=f'p{i}@teste.com', tipo_usuario='paciente')
+            paciente_usuario.set_senha('senha123')
+            db.session.add(paciente_usuario)
+            db.session.flush()
+            paciente = Paciente(usuario_id=paciente_usuario.id)
+            db.session.add(paciente)
+            db.session.flush()
+            for semanas, status in ((-(i + 1) * 4, 'realizado'), (-1, 'realizado'), (1, 'agendado')):
+                if i % 2 and semanas > 0:
+                    continue
+                db.session.add(Agendamento(paciente_id=paciente.id, psicologo_id=psicologo.id,
+                                           data_hora=agora + timedelta(weeks=semanas, hours=i), status=status))
+        db.session.commit()
+        return psicologo
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def test_server_timing(self, client, clinica):
+        """Testa o cabeçalho Server-Timing com a quantidade e o tempo das consultas"""
+        self.login(client, 'ana@teste.com', 'psicologo')
+        response = client.get('/psicologo/prontuarios')
+        timing = response.headers['Server-Timing']
+        assert timing.startswith('db;dur=')
+        assert 'consultas"' in timing
+
+    def test_sem_server_timing_em_producao(self):
+        """Testa que a configuração de produção não expõe os tempos de banco"""
+        from config import ProductionConfig
+        assert ProductionConfig.CONSULTAS_SERVER_TIMING is False
+
+    def test_prontuarios_sem_n_mais_um(self, client, clinica, limite_consultas):
+        """Testa que a lista de prontuários não faz consultas por paciente"""
+        self.login(client, 'ana@teste.com', 'psicologo')
+        with limite_consultas(4):
+            html = client.get('/psicologo/prontuarios').get_data(as_text=True)
+        assert html.count('data-paciente-id=') == 16  # tabela e cartões
+        assert 'Paciente 7' in html
+
+    def test_prontuarios_status_e_sessoes(self, client, clinica):
+        """Testa última consulta, sessões realizadas e status calculados na consulta agregada"""
+        antigo = Agendamento.query.filter(Agendamento.data_hora < datetime.utcnow() - timedelta(weeks=20)).first()
+        antigo.paciente.agendamentos.filter(Agendamento.id != antigo.id).delete()
+        db.session.commit()
+        self.login(client, 'ana@teste.com', 'psicologo')
+        html = client.get('/psicologo/prontuarios').get_data(as_text=True)
+
+        def linha(nome):
+            return ' '.join(html.split(f'{nome}</strong>')[1].split('</tr>')[0].split())
+
+        ultima = (datetime.utcnow().replace(microsecond=0) - timedelta(weeks=1)).strftime('%d/%m/%Y')
+        assert ultima in linha('Paciente 0')
+        assert 'text-align: center;"> 2 </td>' in linha('Paciente 0')
+        assert 'Ativo' in linha('Paciente 0')
+        # Só uma consulta, há mais de 90 dias e nenhuma futura
+        inativo = linha(antigo.paciente.usuario.nome_completo)
+        assert 'text-align: center;"> 1 </td>' in inativo
+        assert 'Inativo' in inativo
+
+    def test_detecta_n_mais_um(self, app, clinica):
+        """Testa que o mesmo SQL com parâmetros diferentes é apontado como N+1"""
+        with contador_consultas.contar() as consultas:
+            for paciente in Paciente.query.all():
+                db.session.get(Usuario, paciente.usuario_id)
+        suspeitas = consultas.suspeitas_n_mais_um(5)
+        assert len(suspeitas) == 1
+        assert suspeitas[0][1] == 8
+        assert 'provável N+1 (8x)' in consultas.resumo()
+
+    def test_repeticao_com_mesmos_parametros_nao_e_n_mais_um(self, app, clinica):
+        """Testa que repetir a mesma consulta não é confundido com N+1"""
+        with contador_consultas.contar() as consultas:
+            for _ in range(8):
+                db.session.execute(db.select(Usuario.id).where(Usuario.email == 'ana@teste.com')).all()
+        assert consultas.total == 8
+        assert consultas.suspeitas_n_mais_um(5) == []
+
+    def test_registro_compartilhado_entre_threads(self):
+        """Testa que o resumo pode ser lido enquanto outras threads registram consultas"""
+        registro = contador_consultas.RegistroConsultas()
+
+        def registrar(thread):
+            for i in range(2000):
+                registro.registrar(f'SELECT {thread}, {i % 50}', (i,), 0.0)
+        threads = [threading.Thread(target=registrar, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            registro.suspeitas_n_mais_um(5)
+            registro.resumo()
+        for thread in threads:
+            thread.join()
+        assert registro.total == 8000
+        assert len(registro.suspeitas_n_mais_um(5)) == 200
+
+    def test_fixture_falha_acima_do_limite(self, app, clinica, limite_consultas):
+        """Testa que a fixture reprova um bloco com consultas demais"""
+        with pytest.raises(AssertionError, match='Mais de 1 consultas'):
+            with limite_consultas(1):
+                Paciente.query.all()
+                Usuario.query.all()
+
+    def test_log_acima_do_limite(self, app, client, clinica, caplog):
+        """Testa o aviso no log quando a requisição passa do limite de consultas"""
+        app.config['CONSULTAS_LIMITE_QUANTIDADE'] = 1
+        self.login(client, 'ana@teste.com', 'psicologo')
+        with caplog.at_level(logging.WARNING, logger='app.contador_consultas'):
+            client.get('/psicologo/prontuarios')
+        mensagens = [r.getMessage() for r in caplog.records if r.name == 'app.contador_consultas']
+        assert any('GET /psicologo/prontuarios (psicologo.prontuarios)' in m for m in mensagens)
@@ -0,0 +1,104 @@
+from datetime import datetime
+from flask import g
+from sqlalchemy import func, select
+from app import db, dados_sinteticos
+from app.models import Usuario, Paciente, Agendamento, Prontuario, Sessao, HorarioAtendimento
+
+
+class TestDadosSinteticos:
+    """Testes do gerador de dados sintéticos e do comando `flask seed`"""
+
+    def test_mesma_semente_mesmos_dados(self, app):
+        """Testa que a geração é determinística"""
+        def gerar():
+            totais = dados_sinteticos.gerar(3, 40, 1, semente=7)
+            agenda = db.session.execute(
+                select(Agendamento.psicologo_id, Agendamento.data_hora, Agendamento.status).order_by(Agendamento.id)
+            ).all()
+            db.session.remove()
+            db.drop_all()
+            db.create_all()
+            return totais, agenda
+
+        primeira, segunda = gerar(), gerar()
+        assert primeira == segunda
+        assert primeira[0]['agendamentos'] > 1000
+
+    def test_agenda_sem_conflitos_e_dentro_dos_turnos(self, app):
+        """Testa que cada psicólogo tem no máximo um agendamento por horário, sempre em um turno seu"""
+        dados_sinteticos.gerar(3, 40, 1)
+        conflitos = db.session.execute(
+            select(Agendamento.psicologo_id, Agendamento.data_hora)
+            .group_by(Agendamento.psicologo_id, Agendamento.data_hora).having(func.count() > 1)
+        ).all()
+        assert conflitos == []
+
+        turnos = {}
+        for horario in HorarioAtendimento.query.all():
+            turnos.setdefault((horario.psicologo_id, horario.dia_semana), []).append(horario)
+        for psicologo_id, data_hora in db.session.execute(select(Agendamento.psicologo_id, Agendamento.data_hora)):
+            assert any(h.hora_inicio <= data_hora.time() < h.hora_fim
+                       for h in turnos[(psicologo_id, data_hora.weekday())])
+
+    def test_status_e_sessoes(self, app):
+        """Testa a mistura de status e as sessões das consultas realizadas"""
+        totais = dados_sinteticos.gerar(2, 30, 1)
+        agora = datetime.now()
+        passado = dict(db.session.execute(
+            select(Agendamento.status, func.count()).where(Agendamento.data_hora < agora).group_by(Agendamento.status)
+        ).all())
+        futuro = dict(db.session.execute(
+            select(Agendamento.status, func.count()).where(Agendamento.data_hora > agora).group_by(Agendamento.status)
+        ).all())
+        assert passado['realizado'] > sum(passado.values()) * 0.6
+        assert passado['cancelado'] and passado['ausencia']
+        assert 'realizado' not in futuro and futuro['agendado'] and futuro['confirmado']
+
+        # Uma sessão por consulta realizada, no prontuário do próprio paciente
+        assert totais['sessoes'] == passado['realizado']
+        divergentes = db.session.execute(
+            select(func.count()).select_from(Sessao)
+            .join(Agendamento, Agendamento.id == Sessao.agendamento_id)
+            .join(Prontuario, Prontuario.id == Sessao.prontuario_id)
+            .where((Prontuario.paciente_id != Agendamento.paciente_id) | (Agendamento.status != 'realizado'))
+        ).scalar()
+        assert divergentes == 0
+        assert Prontuario.query.filter_by(recorrencia_ativa=True).count() > 0
+
+    def test_seed_pelo_cli_acrescenta_dados(self, app, client, runner):
+        """Testa o comando duas vezes no mesmo banco e o login de um usuário gerado"""
+        with app.app_context():
+            for _ in range(2):
+                resultado = runner.invoke(args=['seed', '--psicologos', '2', '--pacientes', '10', '--anos', '1'])
+                assert resultado.exit_code == 0, resultado.output
+                assert 'pacientes: 10' in resultado.output
+        assert Paciente.query.count() == 20
+
+        email = db.session.execute(
+            select(Usuario.email).where(Usuario.tipo_usuario == 'paciente', Usuario.ativo.is_(True))
+        ).scalars().first()
+        g.pop('_login_user', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': 'paciente'})
+        assert response.status_code == 200
+
+    def test_seed_recusa_banco_de_producao(self, app, runner, monkeypatch):
+        """Testa que o seed não roda no banco de produção sem --forcar"""
+        import config
+        argumentos = ['seed', '--psicologos', '1', '--pacientes', '2', '--anos', '1']
+        with app.app_context():
+            monkeypatch.setitem(app.config, 'BANCO_DE_PRODUCAO', True)
+            resultado = runner.invoke(args=argumentos)
+            assert resultado.exit_code != 0
+            assert 'banco de produção' in resultado.output
+            assert Paciente.query.count() == 0
+
+            # Config de desenvolvimento apontando para a DATABASE_URL de um servidor de produção
+            monkeypatch.setitem(app.config, 'BANCO_DE_PRODUCAO', False)
+            monkeypatch.setattr(config.ProductionConfig, 'SQLALCHEMY_DATABASE_URI', str(db.engine.url))
+            monkeypatch.setenv('FLASK_CONFIG', 'production')
+            assert runner.invoke(args=argumentos).exit_code != 0
+            assert Paciente.query.count() == 0
+
+            resultado = runner.invoke(args=argumentos + ['--forcar'])
+            assert resultado.exit_code == 0, resultado.output
+            assert Paciente.query.count() == 2
@@ -0,0 +1,131 @@
+import pytest
+from flask import g, render_template_string
+from app import db
+from app.fragmentos import CacheFragmentosLRU
+from app.models import Usuario, Psicologo
+
+
+class TestCacheFragmentos:
+    """Testes da tag {% cache %} e do LRU de fragmentos"""
+
+    def renderizar(self, app, fonte, **contexto):
+        with app.test_request_context('/'):
+            return render_template_string(fonte, **contexto)
+
+    def test_acerto_reutiliza_fragmento(self, app):
+        """Testa que o segundo render com a mesma chave devolve o fragmento guardado"""
+        fonte = "{% cache 'teste', versao %}{{ valor }}{% endcache %}"
+        assert self.renderizar(app, fonte, versao=1, valor='primeiro') == 'primeiro'
+        assert self.renderizar(app, fonte, versao=1, valor='segundo') == 'primeiro'
+        estatisticas = app.extensions['cache_fragmentos'].estatisticas()
+        assert estatisticas['acertos'] == 1
+        assert estatisticas['falhas'] == 1
+
+    def test_versao_nova_renderiza_de_novo(self, app):
+        """Testa que mudar uma parte da chave invalida o fragmento"""
+        fonte = "{% cache 'teste', versao %}{{ valor }}{% endcache %}"
+        assert self.renderizar(app, fonte, versao=1, valor='antigo') == 'antigo'
+        assert self.renderizar(app, fonte, versao=2, valor='novo') == 'novo'
+
+    def test_cache_desativado(self, app):
+        """Testa que sem o cache o bloco é sempre renderizado"""
+        cache = app.extensions.pop('cache_fragmentos')
+        try:
+            fonte = "{% cache 'teste', 1 %}{{ valor }}{% endcache %}"
+            assert self.renderizar(app, fonte, valor='a') == 'a'
+            assert self.renderizar(app, fonte, valor='b') == 'b'
+        finally:
+            app.extensions['cache_fragmentos'] = cache
+
+    def test_lru_descarta_o_mais_antigo(self):
+        """Testa que o cache respeita a capacidade e preserva os usados recentemente"""
+        cache = CacheFragmentosLRU(capacidade=2)
+        cache.guardar('a', 'A')
+        cache.guardar('b', 'B')
+        assert cache.obter('a') == 'A'
+        cache.guardar('c', 'C')
+        assert cache.obter('b') is None
+        assert cache.obter('a') == 'A'
+        assert cache.obter('c') == 'C'
+        assert cache.estatisticas()['fragmentos_em_cache'] == 2
+
+
+class TestFragmentosNasPaginas:
+    """Testes dos fragmentos usados no layout e nos dashboards"""
+
+    @pytest.fixture
+    def psicologo(self, app):
+        usuario = Usuario(nome_completo='Dra. Ana', email='ana@teste.com', tipo_usuario='psicologo')
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        psicologo = Psicologo(usuario_id=usuario.id)
+        db.session.add(psicologo)
+        db.session.commit()
+        return usuario
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def test_navbar_por_usuario(self, client, admin_user, psicologo):
+        """Testa que a navbar em cache não vaza o nome de outro usuário"""
+        self.login(client, 'ana@teste.com', 'psicologo')
+        assert 'Dra. Ana' in client.get('/psicologo/dashboard').get_data(as_text=True)
+
+        self.login(client, 'admin@teste.com', 'admin')
+        html = client.get('/').get_data(as_text=True)
+        assert 'Admin Teste' in html
+        assert 'Dra. Ana' not in html
+
+    def test_navbar_atualiza_com_o_cadastro(self, client, psicologo):
+        """Testa que alterar o nome do usuário gera uma navbar nova"""
+        self.login(client, 'ana@teste.com', 'psicologo')
+        client.get('/psicologo/dashboard')
+        psicologo.nome_completo = 'Dra. Ana Souza'
+        db.session.commit()
+        # A alteração do cadastro encerra as sessões antigas
+        self.login(client, 'ana@teste.com', 'psicologo')
+        assert 'Dra. Ana Souza' in client.get('/psicologo/dashboard').get_data(as_text=True)
+
+    def test_dashboard_reutiliza_agenda(self, app, client, psicologo):
+        """Testa que o segundo acesso ao dashboard encontra os fragmentos em cache"""
+        self.login(client, 'ana@teste.com', 'psicologo')
+        client.get('/psicologo/dashboard')
+        acertos = app.extensions['cache_fragmentos'].acertos
+        g.pop('_login_user', None)
+        client.get('/psicologo/dashboard')
+        # estilos, navbar, agenda e scripts
+        assert app.extensions['cache_fragmentos'].acertos - acertos == 4
+
+    def test_dashboard_admin_reutiliza_dados(self, app, client, admin_user, psicologo, monkeypatch):
+        """Testa que as consultas dos gráficos do admin só rodam de novo quando os dados mudam"""
+        from app.admin import routes
+        calculos = []
+        def dados_dashboard():
+            calculos.append(1)
+            return dict(total_pacientes=0, total_psicologos=1, total_agendamentos=0, agendamentos_por_mes=[],
+                        taxa_retencao=[], distribuicao_sessoes={}, taxa_ocupacao=[], taxa_noshow=[], casos_ativos=[])
+        monkeypatch.setattr(routes, '_dados_dashboard', dados_dashboard)
+        
+        self.login(client, 'admin@teste.com', 'admin')
+        assert client.get('/admin/dashboard').status_code == 200
+        g.pop('_login_user', None)
+        assert client.get('/admin/dashboard').status_code == 200
+        assert len(calculos) == 1
+        
+        psicologo.nome_completo = 'Dra. Ana Souza'
+        db.session.commit()
+        self.login(client, 'admin@teste.com', 'admin')
+        client.get('/admin/dashboard')
+        assert len(calculos) == 2
+
+    def test_tempos_de_renderizacao(self, app, client, psicologo):
+        """Testa que o tempo de renderização aparece no /api/status"""
+        self.login(client, 'ana@teste.com', 'psicologo')
+        client.get('/psicologo/dashboard')
+        templates = client.get('/api/status').get_json()['templates']
+        assert templates['psicologo/dashboard.html']['renderizacoes'] == 1
+        assert templates['psicologo/dashboard.html']['media_ms'] > 0
@@ -0,0 +1,165 @@
+import io
+import json
+import logging
+import sys
+import threading
+from flask import g
+from app import db
+from app.log_estruturado import FiltroRequisicao, FormatadorJSON, HandlerFila
+from app.models import Usuario, Paciente
+
+
+class TestFormatoEFila:
+    """Testes do formatador JSON e da fila não bloqueante"""
+
+    def registro(self, mensagem='ok', **extra):
+        logger = logging.getLogger('teste.log_estruturado')
+        return logger.makeRecord(logger.name, logging.INFO, __file__, 1, mensagem, (), None, extra=extra)
+
+    def test_json_com_campos_extras(self):
+        """Testa uma linha JSON com os campos passados em extra="""
+        linha = FormatadorJSON().format(self.registro('Olá %s', endpoint='main.index', total_ms=1.5))
+        dados = json.loads(linha)
+        assert '\n' not in linha
+        assert dados['nivel'] == 'INFO'
+        assert dados['logger'] == 'teste.log_estruturado'
+        assert dados['endpoint'] == 'main.index'
+        assert dados['total_ms'] == 1.5
+        assert 'msg' not in dados and 'args' not in dados
+
+    def test_json_com_excecao(self):
+        """Testa que o traceback vai em um campo (a linha continua única)"""
+        try:
+            raise ValueError('falhou')
+        except ValueError:
+            logger = logging.getLogger('teste.log_estruturado')
+            registro = logger.makeRecord(logger.name, logging.ERROR, __file__, 1, 'erro', (), sys.exc_info())
+        dados = json.loads(FormatadorJSON().format(registro))
+        assert 'ValueError: falhou' in dados['excecao']
+
+    def test_fila_nao_bloqueia_com_destino_travado(self):
+        """Testa que, com o destino travado, os registros excedentes são descartados sem esperar"""
+        liberar = threading.Event()
+        saida = io.StringIO()
+
+        class DestinoTravado(logging.StreamHandler):
+            def emit(self, record):
+                liberar.wait(5)
+                super().emit(record)
+
+        handler = HandlerFila(DestinoTravado(saida), capacidade=5)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        for i in range(50):
+            handler.handle(self.registro(f'linha {i}'))
+        assert handler.descartados >= 44
+
+        liberar.set()
+        handler.parar()
+        linhas = saida.getvalue().splitlines()
+        assert linhas[0] == 'linha 0'
+        assert len(linhas) == 50 - handler.descartados
+
+
+class TestLogRequisicoes:
+    """Testes da linha de log de cada requisição"""
+
+    def campos(self, caplog, endpoint):
+        registros = [r for r in caplog.records if r.name == 'app.requisicoes' and r.endpoint == endpoint]
+        assert len(registros) == 1
+        return registros[0]
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def test_uma_linha_por_requisicao(self, client, caplog):
+        """Testa id, endpoint, status, tempos, consultas e tamanho da resposta"""
+        caplog.set_level(logging.INFO, logger='app.requisicoes')
+        response = client.get('/')
+        registro = self.campos(caplog, 'main.index')
+
+        assert registro.request_id == response.headers['X-Request-ID']
+        assert len(registro.request_id) == 32
+        assert registro.metodo == 'GET' and registro.rota == '/' and registro.status == 200
+        assert registro.total_ms > 0
+        assert registro.templates_ms > 0
+        assert registro.bytes == len(response.get_data())
+        assert registro.consultas is not None and registro.db_ms is not None
+        assert registro.getMessage().startswith('GET / 200 ')
+
+    def test_request_id_recebido(self, client, caplog):
+        """Testa que um X-Request-ID válido é reaproveitado e um inválido é trocado"""
+        caplog.set_level(logging.INFO, logger='app.requisicoes')
+        assert client.get('/', headers={'X-Request-ID': 'abc-123'}).headers['X-Request-ID'] == 'abc-123'
+        assert client.get('/', headers={'X-Request-ID': 'x' * 200}).headers['X-Request-ID'] != 'x' * 200
+
+    def test_pagina_transmitida(self, client, caplog, admin_user):
+        """Testa perfil, consultas e bytes de uma página enviada em blocos"""
+        self.login(client, 'admin@teste.com', 'admin')
+        caplog.set_level(logging.INFO, logger='app.requisicoes')
+        response = client.get('/admin/listar-pacientes')
+        assert response.is_streamed
+        corpo = response.get_data()
+        registro = self.campos(caplog, 'admin.listar_pacientes')
+        assert registro.perfil == 'admin'
+        assert registro.bytes == len(corpo)
+        assert registro.consultas >= 1
+
+    def test_perfil_depois_do_commit_sem_consulta(self, client, caplog, admin_user):
+        """Testa que o perfil de uma requisição que faz commit não recarrega o usuário expirado"""
+        from sqlalchemy import event
+        self.login(client, 'admin@teste.com', 'admin')
+        caplog.set_level(logging.INFO, logger='app.requisicoes')
+        comandos = []
+        def registrar(conexao, cursor, sql, *args):
+            comandos.append(sql)
+        # Como numa requisição real, o usuário é carregado de novo a partir da sessão
+        g.pop('_login_user', None)
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            response = client.post('/auth/editar-perfil', data={'nome_completo': 'Admin Editado',
+                                                                'telefone': '(11) 90000-0000'})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+        assert response.status_code == 302
+        assert self.campos(caplog, 'auth.editar_perfil').perfil == 'admin'
+        atualizacao = next(i for i, sql in enumerate(comandos) if sql.startswith('UPDATE usuarios'))
+        assert not [sql for sql in comandos[atualizacao:] if 'FROM usuarios' in sql]
+
+    def test_erros_das_rotas_vao_para_o_log(self, client):
+        """Testa que uma falha na API do paciente sai em JSON, com traceback e o id da requisição"""
+        usuario = Usuario(nome_completo='Paulo', email='paulo@teste.com', tipo_usuario='paciente')
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        db.session.add(Paciente(usuario_id=usuario.id))
+        db.session.commit()
+        self.login(client, 'paulo@teste.com', 'paciente')
+
+        saida = io.StringIO()
+        destino = logging.StreamHandler(saida)
+        handler = HandlerFila(destino)
+        handler.setFormatter(FormatadorJSON())
+        handler.addFilter(FiltroRequisicao())
+        logger_app = logging.getLogger('app')
+        nivel = logger_app.level
+        logger_app.addHandler(handler)
+        logger_app.setLevel(logging.INFO)
+        try:
+            response = client.get('/paciente/api/horarios-disponiveis?psicologo_id=1&data=data-invalida')
+        finally:
+            logger_app.removeHandler(handler)
+            logger_app.setLevel(nivel)
+            handler.parar()
+
+        assert response.status_code == 500
+        linhas = [json.loads(linha) for linha in saida.getvalue().splitlines()]
+        erro, = [l for l in linhas if l['logger'] == 'app.paciente.routes']
+        requisicao, = [l for l in linhas if l['logger'] == 'app.requisicoes']
+        assert erro['mensagem'] == 'Erro na API de horários'
+        assert 'ValueError' in erro['excecao']
+        assert requisicao['status'] == 500
+        assert requisicao['perfil'] == 'paciente'
+        assert erro['request_id'] == requisicao['request_id'] == response.headers['X-Request-ID']
@@ -0,0 +1,125 @@
+import threading
+import tracemalloc
+import pytest
+from flask import g
+from app.models import Usuario
+from app.memoria import PerfilMemoria, mapas_identidade, memoria_processo
+
+# Objetos criados entre a base e a captura
+_vazamento = []
+
+class Vazamento:
+    pass
+
+
+class TestMemoria:
+    """Testes dos snapshots de memória do admin"""
+
+    @pytest.fixture(autouse=True)
+    def parar_tracemalloc(self, app):
+        yield
+        app.extensions['memoria'].parar()
+        _vazamento.clear()
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+
+    def test_diferenca_aponta_local_e_tipo(self):
+        """Testa o crescimento por linha, por pilha e por tipo entre a base e a captura"""
+        perfil = PerfilMemoria(frames=5, top=10)
+        perfil.iniciar()
+        assert tracemalloc.is_tracing()
+        _vazamento.extend(Vazamento() for _ in range(2000))
+        _vazamento.append(bytearray(512 * 1024))
+        perfil.capturar()
+
+        crescimento = perfil.crescimento()
+        assert crescimento[0]['crescimento_kb'] >= 512
+        assert crescimento[0]['local'].startswith(__file__)
+        assert crescimento == sorted(crescimento, key=lambda local: local['crescimento_kb'], reverse=True)
+        assert perfil.crescimento('traceback')[0]['pilha']
+        tipos = {tipo['tipo']: tipo['novos'] for tipo in perfil.tipos_crescimento()}
+        assert tipos[f'{__name__}.Vazamento'] == 2000
+
+        perfil.parar()
+        assert not tracemalloc.is_tracing() and not perfil.ativo
+
+    def test_captura_automatica_apos_n_requisicoes(self, app, client, admin_user):
+        """Testa a base pela página do admin e a captura depois de N requisições"""
+        self.login(client, 'admin@teste.com', 'admin')
+        response = client.post('/admin/memoria/base', data={'requisicoes': '3'})
+        assert response.status_code == 302
+        perfil = app.extensions['memoria']
+        assert perfil.ativo and perfil.alvo == 3
+
+        # As páginas de memória não contam
+        client.get('/admin/memoria')
+        for _ in range(2):
+            client.get('/')
+        assert perfil.atual is None and perfil.requisicoes == 2
+        client.get('/')
+        # A requisição que atinge o alvo só agenda a captura, feita em outra thread
+        assert perfil.alvo is None and perfil._thread is not None
+        perfil.aguardar_captura(timeout=30)
+        assert perfil.atual is not None and perfil.atual['requisicoes'] == 3
+
+        dados = client.get('/admin/memoria.json').get_json()
+        assert dados['base']['processo']['rss'] > 0
+        assert dados['atual']['requisicoes'] == 3
+        assert isinstance(dados['crescimento'], list) and isinstance(dados['tipos'], list)
+
+        pagina = client.get('/admin/memoria?agrupar=traceback')
+        assert pagina.status_code == 200
+        assert 'Locais que mais cresceram' in pagina.get_data(as_text=True)
+
+        client.post('/admin/memoria/parar')
+        assert not perfil.ativo and not tracemalloc.is_tracing()
+
+    def test_captura_agendada_fora_do_lock(self, monkeypatch):
+        """Testa que o contador não espera a captura e que parar() descarta a captura em andamento"""
+        perfil = PerfilMemoria()
+        perfil.iniciar(requisicoes=1)
+        liberar = threading.Event()
+        capturar = perfil._capturar
+
+        def capturar_devagar(requisicoes):
+            liberar.wait(5)
+            return capturar(requisicoes)
+        monkeypatch.setattr(perfil, '_capturar', capturar_devagar)
+
+        perfil.contar_requisicao()
+        # Com a captura parada, outras requisições seguem contando sem bloquear
+        assert perfil._lock.acquire(timeout=1)
+        perfil._lock.release()
+        perfil.contar_requisicao()
+        assert perfil.requisicoes == 2 and perfil.atual is None
+
+        perfil.parar()
+        liberar.set()
+        perfil.aguardar_captura(timeout=5)
+        assert perfil.atual is None and not perfil.ativo
+
+    def test_somente_admin(self, client, admin_user):
+        """Testa que visitantes não acessam nem ligam o tracemalloc"""
+        assert client.get('/admin/memoria').status_code == 302
+        assert client.post('/admin/memoria/base').status_code == 302
+        assert not tracemalloc.is_tracing()
+
+    def test_mapas_identidade(self, app, admin_user):
+        """Testa a listagem das sessões do ORM com mais objetos"""
+        # O identity map guarda referências fracas: os objetos precisam estar vivos
+        usuarios = Usuario.query.all()
+        sessoes = mapas_identidade()
+        assert sessoes[0]['objetos'] >= len(usuarios) >= 1
+        assert sessoes[0]['classes'][0][0] == 'Usuario'
+
+    def test_memoria_processo(self):
+        """Testa a leitura de RSS, PSS e memória privada"""
+        memoria = memoria_processo()
+        assert memoria['rss'] > 0
+        assert memoria['pss'] is None or 0 < memoria['privada'] <= memoria['rss']
@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+from flask import g
+from prometheus_client.parser import text_string_to_metric_families
+from app import create_app
+from app.contador_consultas import contar
+from config import TestingConfig
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def amostras(texto):
+    """{(nome, rótulos ordenados): valor} das linhas do formato de exposição"""
+    return {
+        (amostra.name, tuple(sorted(amostra.labels.items()))): amostra.value
+        for familia in text_string_to_metric_families(texto)
+        for amostra in familia.samples
+    }
+
+
+class TestMetricas:
+    """Testes do endpoint /metrics"""
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def test_latencia_por_endpoint_e_status(self, client):
+        """Testa o histograma de latência com endpoint, método e status"""
+        client.get('/')
+        client.get('/')
+        client.get('/nao-existe')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+
+        dados = amostras(response.get_data(as_text=True))
+        assert dados[('clinica_requisicao_segundos_count',
+                      (('endpoint', 'main.index'), ('metodo', 'GET'), ('status', '200')))] == 2
+        assert dados[('clinica_requisicao_segundos_count',
+                      (('endpoint', 'nenhum'), ('metodo', 'GET'), ('status', '404')))] == 1
+
+    def test_consultas_pool_caches_e_processo(self, client, admin_user):
+        """Testa as consultas por requisição, o pool, os caches, a memória e o uptime"""
+        self.login(client, 'admin@teste.com', 'admin')
+        with contar() as consultas:
+            for _ in range(2):
+                g.pop('_login_user', None)
+                g.pop('_perfil_atual', None)
+                # Página transmitida: as consultas acontecem enquanto o corpo é lido
+                client.get('/admin/listar-pacientes').get_data()
+        dados = amostras(client.get('/metrics').get_data(as_text=True))
+
+        rotulo = (('endpoint', 'admin.listar_pacientes'),)
+        assert dados[('clinica_consultas_por_requisicao_count', rotulo)] == 2
+        assert dados[('clinica_consultas_por_requisicao_sum', rotulo)] == consultas.total > 0
+        assert dados[('clinica_banco_segundos_por_requisicao_sum', rotulo)] <= consultas.tempo
+        assert dados[('clinica_pool_eventos_total', (('evento', 'checkouts'),))] >= 1
+        # A identidade do admin vem do cache na segunda página
+        assert dados[('clinica_cache_operacoes_total', (('cache', 'identidade'), ('resultado', 'acerto')))] >= 1
+        assert 0 < dados[('clinica_cache_taxa_acerto', (('cache', 'identidade'),))] <= 1
+        assert dados[('clinica_processo_rss_bytes', ())] > 10 * 1024 * 1024
+        assert dados[('clinica_processo_uptime_segundos', ())] > 0
+
+    def test_contadores_nao_repetem_totais(self, app, client):
+        """Testa que cada leitura acrescenta só a diferença desde a anterior"""
+        metricas = app.extensions['metricas']
+        primeira = amostras(client.get('/metrics').get_data(as_text=True))
+        segunda = amostras(client.get('/metrics').get_data(as_text=True))
+        chave = ('clinica_pool_eventos_total', (('evento', 'conexoes_criadas'),))
+        assert segunda[chave] == primeira[chave]
+        assert metricas.intervalo == app.config['METRICAS_INTERVALO']
+
+    def test_token(self, app, client):
+        """Testa que, com METRICAS_TOKEN, o endpoint exige o token"""
+        app.config['METRICAS_TOKEN'] = 'segredo'
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer errado'}).status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer segredo'}).status_code == 200
+
+    def test_desativado(self, monkeypatch):
+        """Testa que METRICAS_ATIVO=false não registra o endpoint"""
+        monkeypatch.setattr(TestingConfig, 'METRICAS_ATIVO', False)
+        app = create_app('testing')
+        assert 'metricas' not in app.extensions
+        assert not app.url_map.bind('localhost').test('/metrics')
+
+    def test_token_obrigatorio_sem_token(self, monkeypatch, caplog):
+        """Testa que, exigindo token (produção), /metrics não existe enquanto METRICAS_TOKEN não for definido"""
+        monkeypatch.setattr(TestingConfig, 'METRICAS_EXIGIR_TOKEN', True)
+        app = create_app('testing')
+        assert 'metricas' not in app.extensions
+        assert app.test_client().get('/metrics').status_code == 404
+        assert 'METRICAS_TOKEN não definido' in caplog.text
+
+        monkeypatch.setattr(TestingConfig, 'METRICAS_TOKEN', 'segredo')
+        cliente = create_app('testing').test_client()
+        assert cliente.get('/metrics').status_code == 401
+        assert cliente.get('/metrics', headers={'Authorization': 'Bearer segredo'}).status_code == 200
+
+    def test_multiprocesso_agrega_workers(self, tmp_path):
+        """Testa que /metrics soma as requisições de todos os processos da pasta compartilhada"""
+        worker = (
+            'from app import create_app, db\n'
+            'app = create_app("testing")\n'
+            'with app.app_context():\n'
+            '    db.create_all()\n'
+            '    cliente = app.test_client()\n'
+            '    for _ in range(3):\n'
+            '        cliente.get("/")\n'
+            '    print(cliente.get("/metrics").get_data(as_text=True))\n'
+        )
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+        saidas = [
+            subprocess.run([sys.executable, '-c', worker], cwd=RAIZ, env=env,
+                           capture_output=True, text=True, check=True).stdout
+            for _ in range(2)
+        ]
+        chave = ('clinica_requisicao_segundos_count',
+                 (('endpoint', 'main.index'), ('metodo', 'GET'), ('status', '200')))
+        # O segundo processo enxerga as requisições do primeiro (encerrado) e as suas
+        assert amostras(saidas[0])[chave] == 3
+        assert amostras(saidas[1])[chave] == 6
+        # Gauges de memória ficam por processo (rótulo pid)
+        pids = {dict(rotulos).get('pid') for nome, rotulos in amostras(saidas[1]) if nome == 'clinica_processo_rss_bytes'}
+        assert len(pids) == 2
@@ -0,0 +1,136 @@
+import json
+import pstats
+import time
+import pytest
+from flask import g
+from app import db, perfilador
+from app.perfilador import AmostradorPilha
+from app.models import Usuario, Psicologo
+
+
+class TestPerfilador:
+    """Testes do perfil de requisições sob demanda"""
+
+    @pytest.fixture
+    def pasta(self, app, tmp_path, admin_user):
+        usuario = Usuario(nome_completo='Dra. Ana', email='ana@teste.com', tipo_usuario='psicologo')
+        usuario.set_senha('senha123')
+        db.session.add(usuario)
+        db.session.flush()
+        db.session.add(Psicologo(usuario_id=usuario.id))
+        db.session.commit()
+        app.config['PERFIL_PASTA'] = str(tmp_path)
+        return tmp_path
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def traces(self, pasta):
+        return sorted(p.name for p in pasta.iterdir() if p.name.endswith('.json') and not p.name.endswith('.speedscope.json'))
+
+    def test_cabecalho_de_admin(self, client, pasta):
+        """Testa o perfil cProfile com o trace da rota e das consultas"""
+        self.login(client, 'admin@teste.com', 'admin')
+        g.pop('_login_user', None)
+        response = client.get('/admin/listar-pacientes', headers={'X-Perfil': '1'})
+        response.get_data()
+
+        nome = response.headers['X-Perfil-Arquivo']
+        assert self.traces(pasta) == [nome]
+        trace = json.loads((pasta / nome).read_text())
+        assert trace['endpoint'] == 'admin.listar_pacientes'
+        assert trace['motivo'] == 'admin' and trace['modo'] == 'cprofile'
+        assert trace['status'] == 200
+        assert trace['request_id'] == response.headers['X-Request-ID']
+        assert trace['consultas'] and all(c['duracao_ms'] >= 0 and c['sql'] for c in trace['consultas'])
+
+        estatisticas = pstats.Stats(str(pasta / trace['perfil']))
+        funcoes = {nome for _, _, nome in estatisticas.stats}
+        assert 'listar_pacientes' in funcoes
+        assert perfilador._ativos == 0
+
+    def test_cabecalho_ignorado_sem_admin(self, client, pasta):
+        """Testa que outros perfis e visitantes não conseguem perfilar"""
+        response = client.get('/', headers={'X-Perfil': '1'})
+        assert 'X-Perfil-Arquivo' not in response.headers
+        self.login(client, 'ana@teste.com', 'psicologo')
+        g.pop('_login_user', None)
+        response = client.get('/psicologo/dashboard', headers={'X-Perfil': '1'})
+        assert 'X-Perfil-Arquivo' not in response.headers
+        assert self.traces(pasta) == []
+
+    def test_token(self, app, client, pasta):
+        """Testa o PERFIL_TOKEN, que permite perfilar rotas de qualquer perfil"""
+        app.config['PERFIL_TOKEN'] = 'segredo'
+        assert 'X-Perfil-Arquivo' not in client.get('/', headers={'X-Perfil': 'errado'}).headers
+        response = client.get('/', headers={'X-Perfil': 'segredo'})
+        trace = json.loads((pasta / response.headers['X-Perfil-Arquivo']).read_text())
+        assert trace['motivo'] == 'token'
+
+    def test_amostragem_por_endpoint(self, app, client, pasta):
+        """Testa a amostragem restrita aos endpoints configurados"""
+        app.config.update(PERFIL_AMOSTRAGEM=1.0, PERFIL_ENDPOINTS=['main.index'])
+        client.get('/auth/login')
+        client.get('/')
+        traces = self.traces(pasta)
+        assert len(traces) == 1
+        trace = json.loads((pasta / traces[0]).read_text())
+        assert trace['endpoint'] == 'main.index' and trace['motivo'] == 'amostragem'
+
+    def test_modo_amostragem_speedscope(self, app, client, pasta):
+        """Testa o modo de amostragem de pilha, gravado no formato do speedscope"""
+        app.config.update(PERFIL_AMOSTRAGEM=1.0, PERFIL_ENDPOINTS=['main.index'], PERFIL_MODO='amostragem')
+        client.get('/')
+        trace = json.loads((pasta / self.traces(pasta)[0]).read_text())
+        assert trace['perfil'].endswith('.speedscope.json')
+        documento = json.loads((pasta / trace['perfil']).read_text())
+        assert documento['profiles'][0]['type'] == 'sampled'
+
+    def test_amostrador_de_pilha(self):
+        """Testa que as amostras trazem a pilha da thread perfilada, da raiz à folha"""
+        def trabalho_lento():
+            fim = time.perf_counter() + 0.05
+            while time.perf_counter() < fim:
+                pass
+
+        amostrador = AmostradorPilha(intervalo=0.002)
+        amostrador.iniciar()
+        trabalho_lento()
+        amostrador.parar()
+
+        documento = amostrador.speedscope('teste')
+        perfil = documento['profiles'][0]
+        assert len(perfil['samples']) == len(perfil['weights']) >= 5
+        nomes = [f['name'] for f in documento['shared']['frames']]
+        folhas = [nomes[amostra[-1]] for amostra in perfil['samples']]
+        assert any(folha.endswith('trabalho_lento') for folha in folhas)
+        assert 40 <= perfil['endValue'] <= 500
+
+    def test_limite_de_arquivos(self, app, client, pasta):
+        """Testa que só os PERFIL_MAXIMO_ARQUIVOS perfis mais recentes ficam na pasta"""
+        app.config.update(PERFIL_AMOSTRAGEM=1.0, PERFIL_ENDPOINTS=['main.index'], PERFIL_MAXIMO_ARQUIVOS=2)
+        for _ in range(4):
+            client.get('/')
+        assert len(self.traces(pasta)) == 2
+        assert len(list(pasta.glob('*.pstats'))) == 2
+
+    def test_pagina_do_admin(self, app, client, pasta):
+        """Testa a lista de perfis e o download dos arquivos"""
+        app.config.update(PERFIL_AMOSTRAGEM=1.0, PERFIL_ENDPOINTS=['main.index'])
+        client.get('/')
+        app.config['PERFIL_AMOSTRAGEM'] = 0
+        self.login(client, 'admin@teste.com', 'admin')
+        html = client.get('/admin/perfis').get_data(as_text=True)
+        assert 'GET /' in html and 'main.index' in html
+
+        nome = self.traces(pasta)[0]
+        response = client.get(f'/admin/perfis/{nome}')
+        assert response.status_code == 200
+        assert json.loads(response.get_data())['endpoint'] == 'main.index'
+        assert client.get('/admin/perfis/..%2Fconfig.py').status_code == 404
+
+        self.login(client, 'ana@teste.com', 'psicologo')
+        assert client.get(f'/admin/perfis/{nome}').status_code in (302, 403)
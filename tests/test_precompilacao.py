@@ -0,0 +1,76 @@
+import os
+from jinja2 import Environment, FileSystemLoader
+from app import create_app, precompilacao
+
+
+class TestPrecompilacaoTemplates:
+    """Testes do cache de bytecode dos templates e do comando `flask templates compilar`"""
+
+    def criar_app(self, pasta):
+        app = create_app('testing')
+        app.config['JINJA_BYTECODE_CACHE'] = True
+        app.config['JINJA_BYTECODE_PASTA'] = str(pasta)
+        precompilacao.init_app(app)
+        return app
+
+    def contar_compilacoes(self, app, monkeypatch):
+        compilacoes = []
+        compilar = app.jinja_env.compile
+
+        def compilar_contando(source, name=None, filename=None, raw=False, defer_init=False):
+            compilacoes.append(name)
+            return compilar(source, name, filename, raw, defer_init)
+
+        monkeypatch.setattr(app.jinja_env, 'compile', compilar_contando)
+        return compilacoes
+
+    def test_comando_grava_bytecode(self, tmp_path):
+        """Testa que o comando compila todos os templates para a pasta configurada"""
+        app = self.criar_app(tmp_path)
+        with app.app_context():
+            resultado = app.test_cli_runner().invoke(args=['templates', 'compilar'])
+        assert resultado.exit_code == 0, resultado.output
+        total = len(app.jinja_env.list_templates())
+        assert f'{total} templates compilados' in resultado.output
+        assert len(os.listdir(tmp_path)) == total
+
+    def test_worker_novo_reaproveita_bytecode(self, tmp_path, monkeypatch):
+        """Testa que um processo novo (worker reciclado) não recompila nenhum template"""
+        precompilacao.carregar_templates(self.criar_app(tmp_path))
+
+        app = self.criar_app(tmp_path)
+        compilacoes = self.contar_compilacoes(app, monkeypatch)
+        assert app.test_client().get('/').status_code == 200
+        precompilacao.carregar_templates(app)
+        assert compilacoes == []
+
+    def test_template_alterado_e_recompilado(self, tmp_path):
+        """Testa que o checksum do código-fonte invalida um bytecode antigo"""
+        fontes = tmp_path / 'templates'
+        fontes.mkdir()
+        (fontes / 'pagina.html').write_text('versão 1')
+        cache = precompilacao.BytecodeCacheArquivos(str(tmp_path))
+
+        def ambiente():
+            return Environment(loader=FileSystemLoader(str(fontes)), bytecode_cache=cache)
+
+        assert ambiente().get_template('pagina.html').render() == 'versão 1'
+        (fontes / 'pagina.html').write_text('versão 2')
+        assert ambiente().get_template('pagina.html').render() == 'versão 2'
+
+    def test_pasta_somente_leitura_nao_quebra_a_pagina(self, tmp_path, monkeypatch):
+        """Testa que uma falha ao gravar o bytecode apenas gera um aviso"""
+        app = self.criar_app(tmp_path)
+
+        def falhar(*args, **kwargs):
+            raise OSError('somente leitura')
+
+        monkeypatch.setattr('tempfile.NamedTemporaryFile', falhar)
+        assert app.test_client().get('/').status_code == 200
+        assert os.listdir(tmp_path) == []
+
+    def test_desativado_nos_testes(self, runner):
+        """Testa que a configuração de testes não grava bytecode"""
+        resultado = runner.invoke(args=['templates', 'compilar'])
+        assert resultado.exit_code != 0
+        assert 'desativado' in resultado.output
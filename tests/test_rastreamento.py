@@ -0,0 +1,124 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from flask import g
+from app import db, rastreamento
+from app.models import Usuario, Psicologo, Paciente, Prontuario
+
+
+class TestRastreamento:
+    """Testes do rastreamento de requisições em spans"""
+
+    @pytest.fixture
+    def pasta(self, app, tmp_path, admin_user):
+        for email, tipo in (('ana@teste.com', 'psicologo'), ('joao@teste.com', 'paciente')):
+            usuario = Usuario(nome_completo=email, email=email, tipo_usuario=tipo)
+            usuario.set_senha('senha123')
+            db.session.add(usuario)
+            db.session.flush()
+            db.session.add(Psicologo(usuario_id=usuario.id) if tipo == 'psicologo' else Paciente(usuario_id=usuario.id))
+        db.session.commit()
+        app.config['RASTREAMENTO_PASTA'] = str(tmp_path)
+        return tmp_path
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+
+    def rastros(self, pasta):
+        return sorted(p.name for p in pasta.iterdir())
+
+    def test_cabecalho_de_admin_gera_trace_chrome(self, client, pasta):
+        """Testa a árvore requisição → template → SQL no formato Chrome trace"""
+        self.login(client, 'admin@teste.com', 'admin')
+        response = client.get('/admin/listar-pacientes', headers={'X-Rastro': '1'})
+        response.get_data()
+
+        nome = response.headers['X-Rastro-Arquivo']
+        assert nome.endswith('.trace.json') and self.rastros(pasta) == [nome]
+        trace = json.loads((pasta / nome).read_text())
+        assert trace['otherData']['origem'] == 'admin'
+        eventos = trace['traceEvents']
+        raiz = eventos[0]
+        assert raiz['cat'] == 'requisicao' and raiz['args']['parent_id'] is None
+        assert raiz['args']['endpoint'] == 'admin.listar_pacientes'
+        assert raiz['args']['http.status_code'] == 200
+        assert raiz['args']['request_id'] == response.headers['X-Request-ID']
+
+        por_id = {evento['args']['span_id']: evento for evento in eventos}
+        template = next(e for e in eventos if e['cat'] == 'template')
+        assert template['args']['parent_id'] == raiz['args']['span_id']
+        sql = [e for e in eventos if e['cat'] == 'sql']
+        assert sql and all(e['args']['db.statement'] and e['dur'] >= 0 for e in sql)
+        assert all(e['args']['parent_id'] in por_id for e in eventos[1:])
+        # Filhos dentro do intervalo do pai
+        for evento in eventos[1:]:
+            pai = por_id[evento['args']['parent_id']]
+            assert pai['ts'] <= evento['ts'] and evento['ts'] + evento['dur'] <= pai['ts'] + pai['dur'] + 0.01
+        assert rastreamento._ativos == 0
+
+    def test_sem_rastro_nao_grava_nada(self, client, pasta):
+        """Testa que visitantes e outros perfis não disparam o rastreamento"""
+        assert 'X-Rastro-Arquivo' not in client.get('/', headers={'X-Rastro': '1'}).headers
+        self.login(client, 'ana@teste.com', 'psicologo')
+        assert 'X-Rastro-Arquivo' not in client.get('/psicologo/dashboard', headers={'X-Rastro': '1'}).headers
+        assert self.rastros(pasta) == []
+
+    def test_span_nulo_fora_de_rastro(self, app):
+        """Testa que span() não mede nada quando a requisição não é rastreada"""
+        with rastreamento.span('qualquer') as span:
+            span.definir(x=1)
+        assert span is rastreamento._NULO
+        with app.test_request_context('/'):
+            assert rastreamento.span('qualquer') is rastreamento._NULO
+
+    def test_agendamento_com_prontuario_automatico(self, app, client, pasta):
+        """Testa o rastro de agendar_modal amostrado por endpoint: SQL e prontuário automático"""
+        app.config.update(RASTREAMENTO_AMOSTRAGEM=1.0, RASTREAMENTO_ENDPOINTS=['paciente.agendar_modal'])
+        self.login(client, 'joao@teste.com', 'paciente')
+        assert self.rastros(pasta) == []
+        psicologo = Psicologo.query.first()
+        data = datetime.now() + timedelta(days=3)
+        response = client.post('/paciente/agendar_modal', data={
+            'psicologo_id': str(psicologo.id), 'data': data.strftime('%Y-%m-%d'), 'horario': '10:00'})
+        assert response.status_code == 302
+        assert Prontuario.query.count() == 1
+
+        trace = json.loads((pasta / response.headers['X-Rastro-Arquivo']).read_text())
+        assert trace['otherData']['origem'] == 'amostragem'
+        eventos = trace['traceEvents']
+        prontuario = next(e for e in eventos if e['name'] == 'prontuário automático')
+        filhos = [e for e in eventos if e['args']['parent_id'] == prontuario['args']['span_id']]
+        assert any(e['cat'] == 'sql' and 'prontuarios' in e['args']['db.statement'] for e in filhos)
+        commit = next(e for e in eventos if e['name'] == 'commit')
+        assert any(e['args']['parent_id'] == commit['args']['span_id'] and e['name'] == 'INSERT' for e in eventos)
+        assert any(e['cat'] == 'cache' and e['name'] == 'cache identidade' for e in eventos)
+
+    def test_formato_otlp(self, app, client, pasta):
+        """Testa o documento OTLP/JSON com ids de trace e de span consistentes"""
+        app.config.update(RASTREAMENTO_FORMATO='otlp', RASTREAMENTO_TOKEN='segredo')
+        response = client.get('/', headers={'X-Rastro': 'segredo'})
+        response.get_data()
+        nome = response.headers['X-Rastro-Arquivo']
+        assert nome.endswith('.otlp.json')
+        documento = json.loads((pasta / nome).read_text())
+        spans = documento['resourceSpans'][0]['scopeSpans'][0]['spans']
+        raiz = spans[0]
+        assert raiz['kind'] == 2 and raiz['parentSpanId'] == ''
+        assert len({span['traceId'] for span in spans}) == 1 and len(raiz['traceId']) == 32
+        assert all(int(s['endTimeUnixNano']) >= int(s['startTimeUnixNano']) for s in spans)
+        atributos = {a['key']: a['value'] for a in raiz['attributes']}
+        assert atributos['http.status_code'] == {'intValue': '200'}
+        assert atributos['endpoint'] == {'stringValue': 'main.index'}
+        assert all(s['parentSpanId'] in {o['spanId'] for o in spans} for s in spans[1:])
+
+    def test_limite_de_arquivos(self, app, client, pasta):
+        """Testa que só os rastros mais recentes são mantidos"""
+        app.config.update(RASTREAMENTO_TOKEN='segredo', RASTREAMENTO_MAXIMO_ARQUIVOS=2)
+        for _ in range(4):
+            client.get('/auth/login', headers={'X-Rastro': 'segredo'}).get_data()
+        assert len(self.rastros(pasta)) == 2
@@ -0,0 +1,69 @@
+import logging
+import signal
+import time
+from app import reciclagem
+from app.reciclagem import MB, ReciclagemPorMemoria
+
+
+class WorkerFalso:
+    def __init__(self):
+        self.pid = 4321
+        self.alive = True
+        self.log = logging.getLogger('gunicorn.error.teste')
+
+
+class TestReciclagem:
+    """Testes da reciclagem de workers do gunicorn pela memória"""
+
+    def reciclagem(self, rss_mb, **opcoes):
+        self.rss = rss_mb * MB
+        return ReciclagemPorMemoria(350, 450, medir=lambda: self.rss, **opcoes)
+
+    def test_abaixo_do_limite_suave(self):
+        """Testa que o worker continua vivo enquanto o RSS está abaixo dos limites"""
+        worker, controle = WorkerFalso(), self.reciclagem(200, minimo_requisicoes=1)
+        for _ in range(50):
+            controle.registrar(worker, 'GET', '/', 200)
+        assert worker.alive and not controle.reciclando
+
+    def test_limite_suave_recicla_com_rotas_recentes(self, caplog):
+        """Testa a saída graciosa acima do limite suave, com as últimas rotas no log"""
+        worker, controle = WorkerFalso(), self.reciclagem(360, historico=3, minimo_requisicoes=2)
+        controle.registrar(worker, 'GET', '/inicio', 200)
+        # Antes do mínimo de requisições o worker não é reciclado
+        assert worker.alive
+        with caplog.at_level(logging.WARNING, logger='gunicorn.error.teste'):
+            for caminho in ('/a', '/b', '/c'):
+                controle.registrar(worker, 'GET', caminho, 200)
+        assert not worker.alive and controle.reciclando
+        assert len(caplog.records) == 1
+        mensagem = caplog.records[0].getMessage()
+        assert 'limite suave de 350 MB após 2 requisições' in mensagem
+        assert mensagem.endswith('GET /inicio 200 | GET /a 200')
+
+    def test_limite_rigido_sai_na_hora(self, monkeypatch, caplog):
+        """Testa a saída imediata (SIGQUIT) acima do limite rígido, sem esperar o mínimo"""
+        sinais = []
+        monkeypatch.setattr(reciclagem.os, 'kill', lambda pid, sinal: sinais.append((pid, sinal)))
+        worker, controle = WorkerFalso(), self.reciclagem(500)
+        with caplog.at_level(logging.ERROR, logger='gunicorn.error.teste'):
+            controle.registrar(worker, 'POST', '/paciente/agendar_modal', 302)
+            controle.registrar(worker, 'GET', '/', 200)
+        assert sinais == [(4321, signal.SIGQUIT)]
+        assert 'limite rígido' in caplog.records[0].getMessage()
+
+    def test_vigia_confere_o_limite_rigido(self, monkeypatch):
+        """Testa que a thread do worker pega o limite rígido mesmo sem requisições"""
+        sinais = []
+        monkeypatch.setattr(reciclagem.os, 'kill', lambda pid, sinal: sinais.append(sinal))
+        worker, controle = WorkerFalso(), self.reciclagem(400, intervalo=0.01)
+        controle.vigiar(worker)
+        time.sleep(0.05)
+        assert sinais == []
+        self.rss = 460 * MB
+        for _ in range(100):
+            if sinais:
+                break
+            time.sleep(0.01)
+        assert sinais == [signal.SIGQUIT]
+        worker.alive = False
@@ -0,0 +1,137 @@
+import time
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db, saude
+from app.contador_consultas import contar
+from app.saude import JanelaErros
+
+
+class TestSaude:
+    """Testes das sondas /healthz e /readyz"""
+
+    @pytest.fixture(autouse=True)
+    def token(self, app):
+        app.config['METRICAS_TOKEN'] = 'segredo'
+
+    def readyz(self, client):
+        """/readyz com os detalhes (token das métricas)"""
+        return client.get('/readyz', headers={'Authorization': 'Bearer segredo'})
+
+    def test_healthz_sem_io(self, client):
+        """Testa que a sonda de liveness não consulta o banco"""
+        with contar() as consultas:
+            response = client.get('/healthz')
+        assert response.status_code == 200
+        assert response.get_json()['status'] == 'ok'
+        assert consultas.total == 0
+
+    def test_readyz(self, client):
+        """Testa o ping do banco, o pool, os caches, as migrações e a taxa de erros"""
+        client.get('/')
+        client.get('/nao-existe')
+        response = self.readyz(client)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'no-store'
+        dados = response.get_json()
+        assert dados['status'] == 'pronto'
+        assert dados['banco']['ok'] and dados['banco']['latencia_ms'] >= 0
+        assert 'checkouts' in dados['pool']
+        assert 'usuarios_em_cache' in dados['caches']['identidade']
+        assert dados['caches']['templates_carregados'] >= 1
+        assert dados['migracoes'] == {'status': 'sem_migracoes'}
+        # As sondas não entram na contagem
+        assert dados['erros']['requisicoes'] == 2 and dados['erros']['respostas_5xx'] == 0
+
+    def test_resultado_reaproveitado_por_um_segundo(self, app, client):
+        """Testa que sondas seguidas não consultam o banco de novo"""
+        primeira = self.readyz(client).get_json()
+        with contar() as consultas:
+            segunda = self.readyz(client).get_json()
+        assert consultas.total == 0 and segunda == primeira
+
+        app.extensions['saude'].validade = 0
+        with contar() as consultas:
+            self.readyz(client)
+        assert consultas.total == 1
+
+    def test_banco_fora_do_ar(self, client, monkeypatch):
+        """Testa a resposta 503 quando o ping do banco falha"""
+        def falhar(self, engine, com_migracoes):
+            raise OperationalError('SELECT 1', {}, Exception('conexão recusada'))
+        monkeypatch.setattr(saude.VerificadorProntidao, '_consultar_banco', falhar)
+        response = self.readyz(client)
+        assert response.status_code == 503
+        dados = response.get_json()
+        assert dados['status'] == 'indisponivel'
+        assert not dados['banco']['ok'] and 'OperationalError' in dados['banco']['erro']
+
+    def test_timeout_do_ping(self, app, client, monkeypatch):
+        """Testa que um banco travado responde 503 no prazo e não empilha pings"""
+        liberar = []
+        def travar(self, engine, com_migracoes):
+            while not liberar:
+                time.sleep(0.01)
+            return 1.0, None
+        # Fora do StaticPool o ping roda na thread do verificador, com timeout
+        monkeypatch.setattr(saude, 'StaticPool', type('OutroPool', (), {}))
+        monkeypatch.setattr(saude.VerificadorProntidao, '_consultar_banco', travar)
+        verificador = app.extensions['saude']
+        verificador.timeout, verificador.validade = 0.1, 0
+
+        inicio = time.perf_counter()
+        dados = self.readyz(client).get_json()
+        assert time.perf_counter() - inicio < 1
+        assert dados['banco'] == {'ok': False, 'erro': 'sem resposta em 0.1 s'}
+        assert self.readyz(client).get_json()['banco']['erro'] == 'ping anterior ainda sem resposta'
+
+        liberar.append(True)
+        verificador._ping.result(timeout=1)
+        assert self.readyz(client).status_code == 200
+
+    def test_migracoes(self, app, client, tmp_path, monkeypatch):
+        """Testa a comparação da revisão do banco com a head das migrações"""
+        versoes = tmp_path / 'migrations' / 'versions'
+        versoes.mkdir(parents=True)
+        (versoes / 'a1b2c3_inicial.py').write_text("revision = 'a1b2c3'\ndown_revision = None\n")
+        monkeypatch.chdir(tmp_path)
+        verificador = app.extensions['saude']
+        verificador.validade = 0
+
+        response = self.readyz(client)
+        assert response.status_code == 503
+        assert response.get_json()['migracoes'] == {'head': 'a1b2c3', 'atual': None, 'status': 'pendente'}
+
+        db.session.execute(text('CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)'))
+        db.session.execute(text("INSERT INTO alembic_version VALUES ('a1b2c3')"))
+        db.session.commit()
+        response = self.readyz(client)
+        assert response.status_code == 200
+        assert response.get_json()['migracoes']['status'] == 'em_dia'
+
+    def test_readyz_publico_so_com_status(self, client, admin_user, monkeypatch):
+        """Testa que, sem token nem admin, o /readyz não expõe o erro do banco nem o estado interno"""
+        def falhar(self, engine, com_migracoes):
+            raise OperationalError('SELECT 1', {}, Exception('host db-interno.render.com recusou'))
+        monkeypatch.setattr(saude.VerificadorProntidao, '_consultar_banco', falhar)
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json() == {'status': 'indisponivel'}
+        assert client.get('/readyz', headers={'Authorization': 'Bearer errado'}).get_json() == {'status': 'indisponivel'}
+
+        # Um admin logado vê os detalhes
+        response = client.post('/auth/api/login', json={'email': 'admin@teste.com', 'senha': 'senha123',
+                                                        'tipo_usuario': 'admin'})
+        assert response.status_code == 200
+        assert 'db-interno' in client.get('/readyz').get_json()['banco']['erro']
+
+    def test_janela_de_erros(self):
+        """Testa que só os últimos segundos entram na taxa de erros"""
+        janela = JanelaErros(10)
+        for segundo, erro in ((100, False), (100, True), (105, False), (109, True)):
+            janela.registrar(erro, agora=segundo)
+        assert janela.resumo(agora=109) == {'janela_segundos': 10, 'requisicoes': 4, 'respostas_5xx': 2, 'taxa': 0.5}
+        assert janela.resumo(agora=112)['requisicoes'] == 2
+        # O balde do segundo 100 é reaproveitado pelo 110
+        janela.registrar(False, agora=110)
+        assert janela.resumo(agora=110)['requisicoes'] == 3
@@ -0,0 +1,117 @@
+import sys
+import pytest
+from datetime import date, datetime, timedelta
+from flask import g
+from app import db
+from app.models import Usuario, Psicologo, Paciente, Agendamento, Prontuario, Sessao
+
+
+class TestListasTransmitidas:
+    """Testes das páginas de listas longas enviadas em blocos"""
+
+    @pytest.fixture
+    def dados(self, app, admin_user):
+        """Dois psicólogos e três pacientes: com responsável, só com agendamento e sem agendamentos"""
+        usuarios = {}
+        for email, nome, tipo in (('ana@teste.com', 'Dra. Ana', 'psicologo'), ('bia@teste.com', 'Dra. Bia', 'psicologo'),
+                                  ('p1@teste.com', 'Paulo Um', 'paciente'), ('p2@teste.com', 'Pedro Dois', 'paciente'),
+                                  ('p3@teste.com', 'Priscila Tres', 'paciente')):
+            usuario = Usuario(nome_completo=nome, email=email, tipo_usuario=tipo)
+            usuario.set_senha('senha123')
+            db.session.add(usuario)
+            usuarios[email] = usuario
+        db.session.flush()
+        ana = Psicologo(usuario_id=usuarios['ana@teste.com'].id)
+        bia = Psicologo(usuario_id=usuarios['bia@teste.com'].id)
+        db.session.add_all([ana, bia])
+        db.session.flush()
+        p1 = Paciente(usuario_id=usuarios['p1@teste.com'].id, psicologo_id=ana.id)
+        p2 = Paciente(usuario_id=usuarios['p2@teste.com'].id)
+        p3 = Paciente(usuario_id=usuarios['p3@teste.com'].id)
+        db.session.add_all([p1, p2, p3])
+        db.session.flush()
+        ontem = datetime.now() - timedelta(days=1)
+        db.session.add_all([
+            Agendamento(paciente_id=p1.id, psicologo_id=bia.id, data_hora=ontem, status='realizado'),
+            Agendamento(paciente_id=p2.id, psicologo_id=bia.id, data_hora=ontem, status='realizado',
+                        observacoes='Primeira consulta'),
+            Agendamento(paciente_id=p2.id, psicologo_id=bia.id, data_hora=ontem + timedelta(days=7), status='agendado'),
+        ])
+        prontuario = Prontuario(paciente_id=p2.id, psicologo_id=bia.id, observacoes_gerais='')
+        db.session.add(prontuario)
+        db.session.flush()
+        db.session.add(Sessao(prontuario_id=prontuario.id, data_sessao=date.today(), anotacoes='Evolução boa'))
+        db.session.commit()
+        return {'p2': p2.id}
+
+    def login(self, client, email, tipo):
+        g.pop('_login_user', None)
+        g.pop('_perfil_atual', None)
+        response = client.post('/auth/api/login', json={'email': email, 'senha': 'senha123', 'tipo_usuario': tipo})
+        assert response.status_code == 200
+
+    def test_listar_pacientes_transmitida(self, client, dados):
+        """Testa a lista de pacientes enviada em blocos, com o psicólogo calculado na consulta"""
+        self.login(client, 'admin@teste.com', 'admin')
+        response = client.get('/admin/listar-pacientes')
+        assert response.status_code == 200
+        assert response.is_streamed
+        html = response.get_data(as_text=True)
+        assert '3 pacientes encontrados' in html
+        # Responsável tem prioridade sobre o psicólogo do agendamento
+        assert 'Dra. Ana' in html.split('Paulo Um')[1].split('</tr>')[0]
+        assert 'Dra. Bia' in html.split('Pedro Dois')[1].split('</tr>')[0]
+        assert 'Sem agendamentos' in html.split('Priscila Tres')[1].split('</tr>')[0]
+
+    def test_agendamentos_transmitidos(self, client, dados):
+        """Testa a lista de agendamentos com contagem e filtro"""
+        self.login(client, 'admin@teste.com', 'admin')
+        html = client.get('/admin/agendamentos').get_data(as_text=True)
+        assert '3 agendamentos encontrados' in html
+        assert 'Pedro Dois' in html and 'Dra. Bia' in html
+
+        html = client.get('/admin/agendamentos?status=agendado').get_data(as_text=True)
+        assert '1 agendamentos encontrados' in html
+
+        html = client.get('/admin/agendamentos?paciente_nome=ninguem').get_data(as_text=True)
+        assert 'Nenhum agendamento encontrado' in html
+
+    def test_prontuario_transmitido(self, client, dados):
+        """Testa o histórico do paciente: consultas realizadas e sessões"""
+        self.login(client, 'bia@teste.com', 'psicologo')
+        response = client.get(f"/psicologo/prontuario/{dados['p2']}")
+        assert response.is_streamed
+        html = response.get_data(as_text=True)
+        assert 'Primeira consulta' in html
+        assert 'Evolução boa' in html
+        assert 'Nenhuma consulta realizada' not in html
+
+    def test_memoria_constante_com_100_mil_linhas(self, app, client, dados):
+        """Testa que a memória não cresce com o número de linhas transmitidas"""
+        total = 100_000
+        p1 = db.session.query(Paciente.id).order_by(Paciente.id).first()[0]
+        bia = db.session.query(Psicologo.id).order_by(Psicologo.id.desc()).first()[0]
+        inicio = datetime(2020, 1, 1)
+        db.session.execute(Agendamento.__table__.insert(), [
+            {'paciente_id': p1, 'psicologo_id': bia, 'data_hora': inicio + timedelta(minutes=i),
+             'status': 'realizado', 'data_criacao': inicio, 'data_atualizacao': inicio}
+            for i in range(total)
+        ])
+        db.session.commit()
+        self.login(client, 'admin@teste.com', 'admin')
+
+        # Blocos de memória alocados pelo Python (sys.getallocatedblocks), amostrados a cada bloco enviado
+        referencia = sys.getallocatedblocks()
+        response = client.get('/admin/agendamentos', buffered=False)
+        assert response.is_streamed
+        enviados = 0
+        amostras = []
+        for bloco in response.response:
+            enviados += len(bloco)
+            amostras.append(sys.getallocatedblocks())
+        response.close()
+
+        # Dezenas de MB de HTML enviados; os objetos vivos não crescem com as linhas já enviadas
+        assert enviados > 30 * 1024 * 1024
+        # Com .all() o pico passa de 500 mil blocos; transmitindo, fica em torno de um lote
+        assert max(amostras) - referencia < 50_000
@@ -1,15 +1,20 @@
+import logging
 import os
+from app.inicializacao import configurar_logging
+
+configurar_logging(os.environ.get('LOG_NIVEL', 'INFO'), os.environ.get('LOG_FORMATO', 'json'))
+
 from app import create_app
 
+logger = logging.getLogger(__name__)
+
 # Criar a instância da aplicação para o Gunicorn
 app = create_app(os.getenv('FLASK_CONFIG') or 'production')
 
 # CONFIGURAÇÃO CRÍTICA PARA RENDER
 # O Render precisa que a aplicação responda em 0.0.0.0:PORT
 if os.getenv('FLASK_CONFIG') == 'production':
-    port = int(os.environ.get('PORT', 10000))
-    print(f"🚀 RENDER: Aplicação configurada para porta {port}")
-    print(f"🌐 RENDER: Binding configurado para 0.0.0.0:{port}")
+    logger.debug('Aplicação configurada para 0.0.0.0:%s', os.environ.get('PORT', 10000))
     
     # Configurações críticas do Flask para Render
     app.config.update({
@@ -21,5 +26,5 @@ if os.getenv('FLASK_CONFIG') == 'production':
 # Para execução direta (desenvolvimento local)
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 10000))
-    print(f"🚀 DESENVOLVIMENTO: Iniciando aplicação em 0.0.0.0:{port}")
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    logger.info('Iniciando servidor de desenvolvimento em 0.0.0.0:%s', port)
+    app.run(host='0.0.0.0', port=port, debug=False)